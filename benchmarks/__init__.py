@@ -0,0 +1,9 @@
+# benchmarks - performance benchmarks for pyinsim
+#
+# This software may be used and distributed according to the terms of the
+# GNU Lesser General Public License version 3 or any later version.
+#
+# Run a benchmark from the repository root, E.G.:
+#
+#   python -m benchmarks.bench_framing
+#
@@ -0,0 +1,107 @@
+"""Benchmark the packets and bytes sent for a live timing overlay.
+
+Shows 40 players a 40 row overlay of position, name and gap, each with
+their own row highlighted, refreshed at 2 Hz for a minute. Gaps change on
+most refreshes, positions now and then, and cars leave the race so their
+rows are deleted. Compares resending every IS_BTN on each refresh with
+pyinsim9.buttons.ButtonManager, and times the refreshes.
+
+"""
+
+import random
+import time
+
+from pyinsim9 import buttons
+from pyinsim9.core import insim_
+
+PLAYERS = 40
+RATE = 2
+SECONDS = 60
+
+
+class Counter(object):
+    """Stands in for an InSim connection, counting what is sent."""
+    connected = True
+
+    def __init__(self):
+        self.packets = 0
+        self.bytes = 0
+        self.writes = 0
+
+    def bind(self, evt, callback):
+        pass
+
+    def unbind(self, evt, callback):
+        pass
+
+    def sendp(self, *packets):
+        self.writes += 1
+        self.packets += len(packets)
+        self.bytes += sum(len(packet.pack()) for packet in packets)
+        return True
+
+
+def frames(players=PLAYERS, count=RATE * SECONDS):
+    rand = random.Random(1)
+    order = list(range(1, players + 1))
+    gaps = dict((plid, 0.0) for plid in order)
+    result = []
+    for i in range(count):
+        if rand.random() < 0.1:
+            j = rand.randrange(1, len(order))
+            order[j - 1], order[j] = order[j], order[j - 1]
+        if i and i % 30 == 0:
+            order.pop()
+        for plid in order:
+            gaps[plid] += rand.uniform(-0.1, 0.15) * order.index(plid)
+        result.append([(pos, plid, '%.1f' % max(gaps[plid], 0.0)) for pos, plid in enumerate(order, 1)])
+    return result
+
+
+def rows(viewer, frame):
+    buttons = {}
+    for pos, plid, gap in frame:
+        style = insim_.ISB_LIGHT if plid == viewer else insim_.ISB_DARK
+        top = 20 + pos * 4
+        buttons[(plid, 'pos')] = dict(L=0, T=top, W=6, H=4, BStyle=style, Text=b'%d' % pos)
+        buttons[(plid, 'name')] = dict(L=6, T=top, W=24, H=4, BStyle=style | insim_.ISB_LEFT,
+                                       Text=b'^7Driver %d' % plid)
+        buttons[(plid, 'gap')] = dict(L=30, T=top, W=10, H=4, BStyle=style | insim_.ISB_RIGHT, Text=gap.encode())
+    return buttons
+
+
+def legacy(insim, stream):
+    shown = dict((ucid, {}) for ucid in range(1, PLAYERS + 1))
+    for frame in stream:
+        for ucid, ids in shown.items():
+            packets = []
+            wanted = rows(ucid, frame)
+            for key in [key for key in ids if key not in wanted]:
+                packets.append(insim_.IS_BFN(SubT=insim_.BFN_DEL_BTN, UCID=ucid, ClickID=ids.pop(key)))
+            for key, fields in wanted.items():
+                click_id = ids.setdefault(key, len(ids))
+                packets.append(insim_.IS_BTN(ReqI=1, UCID=ucid, ClickID=click_id, **fields))
+            insim.sendp(*packets)
+
+
+def managed(insim, stream):
+    manager = buttons.ButtonManager(insim)
+    for frame in stream:
+        for ucid in range(1, PLAYERS + 1):
+            manager.show(ucid, rows(ucid, frame))
+
+
+def main():
+    stream = frames()
+    print('%-10s %10s %12s %12s %12s' % ('Overlay', 'writes', 'packets', 'KB', 'ms/refresh'))
+    for label, run in (('resend', legacy), ('manager', managed)):
+        insim = Counter()
+        start = time.perf_counter()
+        run(insim, stream)
+        elapsed = time.perf_counter() - start
+        print('%-10s %10d %12d %12.0f %12.2f' % (label, insim.writes, insim.packets, insim.bytes / 1024,
+                                                  elapsed / len(stream) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
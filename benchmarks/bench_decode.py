@@ -0,0 +1,42 @@
+"""Benchmark packet decoding for every received packet type.
+
+Compares the class unpack() methods with the decoders compiled by
+pyinsim9.decoders, which are what _InSim uses to decode packets. When NumPy
+is installed the array decoders for IS_MCI and IS_NLP are compared too.
+
+"""
+
+import timeit
+
+from pyinsim9 import decoders
+from pyinsim9.core import _DECODERS, _PACKET_MAP
+
+from benchmarks import samples
+
+
+def rate(func, number):
+    return number / min(timeit.repeat(func, number=number, repeat=3))
+
+
+def main(number=20000):
+    print('%-8s %14s %14s %8s' % ('Packet', 'unpack()/s', 'decoder/s', 'speedup'))
+    for ptype, data in sorted(samples.received().items()):
+        cls = _PACKET_MAP[ptype]
+        decode = _DECODERS[ptype]
+        data = memoryview(data)
+        old = rate(lambda: cls().unpack(data), number)
+        new = rate(lambda: decode(data), number)
+        print('%-8s %14.0f %14.0f %7.2fx' % (cls.__name__, old, new, new / old))
+    if decoders.numpy is None:
+        return
+    print()
+    print('%-8s %14s %14s %8s' % ('Packet', 'objects/s', 'array/s', 'speedup'))
+    for ptype, decode in sorted(decoders.array_decoders().items()):
+        data = memoryview(samples.received()[ptype])
+        old = rate(lambda: _DECODERS[ptype](data), number)
+        new = rate(lambda: decode(data), number)
+        print('%-8s %14.0f %14.0f %7.2fx' % (_PACKET_MAP[ptype].__name__, old, new, new / old))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Benchmark per-packet dispatch overhead with 0, 1 and 10 handlers.
+
+Feeds a recorded race stream through _InSim._handle_insim_packet with no-op
+handlers bound to ISP_MCI, and compares it with the previous dispatch, which
+looked up the packet type and EVT_ALL callbacks for every packet.
+
+"""
+
+import functools
+import timeit
+import warnings
+
+warnings.simplefilter('ignore', DeprecationWarning)
+
+from pyinsim9 import core
+
+from benchmarks import samples
+
+
+def legacy_dispatch(insim, data):
+    ptype = data[1]
+    bound = insim._callbacks.get(ptype)
+    all_ = insim._callbacks.get(core.EVT_ALL)
+    if bound or all_:
+        packet = core._DECODERS[ptype](data)
+        if bound:
+            [c(insim, packet) for c in bound]
+        if all_:
+            [c(insim, packet) for c in all_]
+
+
+def handler(insim, packet):
+    pass
+
+
+def main(number=20):
+    packets = [memoryview(packet) for packet in samples.race_stream(200)]
+    print('%d packets, %d IS_MCI' % (len(packets), sum(1 for p in packets if p[1] == core.insim_.ISP_MCI)))
+    print('%-10s %14s %14s %8s' % ('Handlers', 'before ns/pkt', 'after ns/pkt', 'speedup'))
+    for count in (0, 1, 10):
+        insim = core._InSim()
+        for _ in range(count):
+            insim.bind(core.insim_.ISP_MCI, handler)
+        times = []
+        for dispatch in (functools.partial(legacy_dispatch, insim), insim._handle_insim_packet):
+            def run():
+                for data in packets:
+                    dispatch(data)
+            times.append(min(timeit.repeat(run, number=number, repeat=5)) / number / len(packets) * 1e9)
+        print('%-10d %14.0f %14.0f %7.2fx' % (count, times[0], times[1], times[0] / times[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""End-to-end load benchmark against pyinsim9.fakehost.
+
+Runs the fake host in its own process and connects core.insim(), relay()
+and outsim2() to it with an EVT_ALL or OutSim2 handler, raising the update
+rate until this process stops keeping up. A row falls behind when fewer
+packets arrive than the host meant to send, or the host's sends are held up
+because the connection is not reading fast enough (late).
+
+"""
+
+import multiprocessing
+import time
+import warnings
+
+warnings.simplefilter('ignore', DeprecationWarning)
+
+from pyinsim9 import core, fakehost
+
+DURATION = 2.0
+CARS = 40
+OUTSIM_PORT = 30555
+
+
+def serve(pipe, cars, interval, outsim_rate):
+    host = fakehost.fake_host(cars=cars, interval=interval)
+    if outsim_rate:
+        host.add_outsim2(port=OUTSIM_PORT, rate=outsim_rate, mode=0x1ff)
+    pipe.send(host.port)
+    pipe.recv()
+    host.close()
+    pipe.send((host.sent, host.late))
+
+
+def measure(kind, cars=CARS, interval=None, outsim_rate=0):
+    pipe, child = multiprocessing.Pipe()
+    proc = multiprocessing.Process(target=serve, args=(child, cars, interval, outsim_rate), daemon=True)
+    proc.start()
+    port = pipe.recv()
+    received = [0]
+    deadline = time.monotonic() + DURATION
+    def count(conn, packet):
+        received[0] += 1
+        # Close from the loop, closing from another thread races select().
+        if time.monotonic() >= deadline:
+            conn.close()
+    if kind == 'insim':
+        conn = core.insim('127.0.0.1', port, Flags=core.insim_.ISF_MCI | core.insim_.ISF_NLP)
+        conn.bind(core.EVT_ALL, count)
+    elif kind == 'relay':
+        conn = core.relay('127.0.0.1', port, HName=b'pyinsim')
+        conn.bind(core.EVT_ALL, count)
+    else:
+        conn = core.outsim2('127.0.0.1', OUTSIM_PORT, count, mode=0x1ff)
+    cpu = time.process_time()
+    core.run()
+    cpu = time.process_time() - cpu
+    pipe.send(None)
+    sent, late = pipe.recv()
+    proc.join()
+    return received[0], sent, late, cpu
+
+
+def main():
+    print('%-8s %10s %12s %12s %8s %8s' % ('Mode', 'Rate', 'sent pkt/s', 'recv pkt/s', 'CPU%', 'late'))
+    rows = [('insim', 'interval', interval) for interval in (0.1, 0.02, 0.01, 0.005, 0.002, 0.001)]
+    rows.append(('relay', 'interval', 0.01))
+    rows.extend(('outsim2', 'rate', rate) for rate in (100, 1000, 5000, 20000))
+    for kind, param, value in rows:
+        if param == 'interval':
+            received, sent, late, cpu = measure(kind, interval=value)
+            rate = '%gHz' % (1 / value)
+        else:
+            received, sent, late, cpu = measure(kind, outsim_rate=value)
+            rate = '%dHz' % value
+        print('%-8s %10s %12.0f %12.0f %7.1f%% %8d' % (kind, rate, sent / DURATION, received / DURATION,
+                                                      100 * cpu / DURATION, late))
+
+
+if __name__ == '__main__':
+    main()
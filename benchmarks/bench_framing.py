@@ -0,0 +1,64 @@
+"""Benchmark TCP packet framing with a recorded race stream.
+
+Compares the _PacketBuffer framer used by _TcpSocket against the previous
+bytes concatenation framer, reporting packets/s and the number of bytes each
+one copies.
+
+"""
+
+import time
+
+from pyinsim9.core import _PacketBuffer
+
+from benchmarks import samples
+
+
+def legacy_framer(chunks):
+    recv_buff = b''
+    packets = 0
+    copied = 0
+    for data in chunks:
+        copied += len(recv_buff) + len(data)
+        recv_buff += data
+        while recv_buff and len(recv_buff) >= recv_buff[0]*4:
+            size = recv_buff[0]*4
+            packet = recv_buff[:size]
+            recv_buff = recv_buff[size:]
+            copied += size + len(recv_buff)
+            packets += 1
+    return packets, copied
+
+
+def buffer_framer(chunks):
+    buff = _PacketBuffer()
+    packets = 0
+    for data in chunks:
+        view = buff.get_buffer()
+        view[:len(data)] = data # Stands in for socket.recv_into().
+        buff.buffer_updated(len(data))
+        for packet in buff.packets():
+            packets += 1
+    return packets, buff.copied
+
+
+def run(framer, chunks, repeat=5):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        packets, copied = framer(chunks)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return packets, copied, best
+
+
+def main():
+    chunks = samples.chunked(samples.race_stream())
+    total = sum(len(c) for c in chunks)
+    print('Stream: %d bytes in %d reads' % (total, len(chunks)))
+    for name, framer in (('bytes', legacy_framer), ('_PacketBuffer', buffer_framer)):
+        packets, copied, elapsed = run(framer, chunks)
+        print('%-14s %8d packets %12.0f packets/s %12d bytes copied' % (name, packets, packets / elapsed, copied))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Benchmark lazy decoding on a race start burst.
+
+A race start on a full server sends an IS_NCN and IS_NPL for every driver and
+an IS_RES for every finisher, plus chat. Compares the default decoders with
+pyinsim9.decoders.lazy_decoders() for a handler that reads only the IDs and
+for one that reads every field.
+
+"""
+
+import timeit
+
+from pyinsim9 import decoders
+from pyinsim9.core import _DECODERS, insim_
+
+from benchmarks import samples
+
+
+def burst(drivers=40):
+    packets = []
+    for i in range(1, drivers + 1):
+        packets.append(samples.ncn(i))
+        packets.append(samples.npl(i, i))
+        packets.append(samples.mso(b'^7Player %d ^8: gl hf' % i))
+    packets.extend(samples.res(i) for i in range(1, drivers + 1))
+    return [memoryview(packet) for packet in packets]
+
+
+def ids(packet):
+    if packet.Type == insim_.ISP_RES:
+        return packet.PLID
+    return packet.UCID
+
+
+def every_field(packet):
+    return [getattr(packet, name, None) for name in getattr(packet, '_fields', packet.__slots__)]
+
+
+def main(number=200):
+    packets = burst()
+    eager = _DECODERS
+    lazy = dict(_DECODERS)
+    lazy.update(decoders.lazy_decoders())
+    print('%d packets per burst' % len(packets))
+    print('%-12s %14s %14s %8s' % ('Handler', 'eager pkt/s', 'lazy pkt/s', 'speedup'))
+    for handler in (ids, every_field):
+        rates = []
+        for table in (eager, lazy):
+            def run():
+                for data in packets:
+                    handler(table[data[1]](data))
+            rates.append(number * len(packets) / min(timeit.repeat(run, number=number, repeat=9)))
+        print('%-12s %14.0f %14.0f %7.2fx' % (handler.__name__, rates[0], rates[1], rates[1] / rates[0]))
+
+
+if __name__ == '__main__':
+    main()
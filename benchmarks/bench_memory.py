@@ -0,0 +1,72 @@
+"""Benchmark memory retained per decoded packet.
+
+Uses tracemalloc to measure the bytes held by each decoded packet, including
+its sub-records and strings. The "dict" column decodes with the class
+unpack() methods after temporarily replacing every packet class with an
+equivalent class without __slots__, which is how packets were stored before.
+
+"""
+
+import contextlib
+import gc
+import tracemalloc
+
+from pyinsim9.core import _DECODERS, _PACKET_MAP, insim_
+
+from benchmarks import samples
+
+
+def unslotted(cls):
+    slots = set(cls.__slots__)
+    attrs = dict((k, v) for k, v in vars(cls).items() if k not in slots and k != '__slots__')
+    return type(cls.__name__, cls.__bases__, attrs)
+
+
+@contextlib.contextmanager
+def dict_classes():
+    saved = dict((k, v) for k, v in vars(insim_).items() if isinstance(v, type) and hasattr(v, '__slots__'))
+    for name, cls in saved.items():
+        setattr(insim_, name, unslotted(cls))
+    try:
+        yield
+    finally:
+        for name, cls in saved.items():
+            setattr(insim_, name, cls)
+
+
+def retained(decode, data, number):
+    keep = [None] * number
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    for i in range(number):
+        keep[i] = decode(data)
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return used / number
+
+
+def cases():
+    mode = 0x1ff
+    yield 'IS_MCI', lambda: insim_.IS_MCI(), _DECODERS[insim_.ISP_MCI], samples.mci(8)
+    yield 'IS_NLP', lambda: insim_.IS_NLP(), _DECODERS[insim_.ISP_NLP], samples.nlp(40)
+    for ptype in (insim_.ISP_NPL, insim_.ISP_RES, insim_.ISP_LAP, insim_.ISP_MSO, insim_.ISP_CON):
+        name = _PACKET_MAP[ptype].__name__
+        yield name, lambda name=name: getattr(insim_, name)(), _DECODERS[ptype], samples.received()[ptype]
+    size = insim_.OutSimPack2(mode).pack_s.size
+    yield 'OutSim2', lambda: insim_.OutSimPack2(mode), None, bytes(size)
+    yield 'OutGauge', lambda: insim_.OutGaugePack(), None, bytes(96)
+
+
+def main(number=2000):
+    print('%-10s %12s %12s %13s %8s' % ('Packet', 'dict B/pkt', 'slots B/pkt', 'decoder B/pkt', 'saving'))
+    for name, new, decode, data in cases():
+        with dict_classes():
+            old = retained(lambda data: new().unpack(data), data, number)
+        slots = retained(lambda data: new().unpack(data), data, number)
+        fast = retained(decode, memoryview(data), number) if decode else slots
+        print('%-10s %12.0f %12.0f %13.0f %7.0f%%' % (name, old, slots, fast, 100.0 * (old - min(slots, fast)) / old))
+
+
+if __name__ == '__main__':
+    main()
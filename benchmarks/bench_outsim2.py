@@ -0,0 +1,74 @@
+"""Benchmark OutSim2 decoding for mode 0x1ff at 100 Hz from N sources.
+
+Reports the share of one CPU spent decoding a second of packets with the
+previous OutSimPack2, which built its struct for every packet, a new
+OutSimPack2 per packet using the cached layout, and one reused OutSimPack2.
+
+"""
+
+import random
+import struct
+import timeit
+
+from pyinsim9.core import insim_
+
+MODE = 0x1ff
+RATE = 100
+
+
+def legacy_unpack(mode, data):
+    s = ''
+    for bit, name, format, count in insim_._OUTSIM2_SECTIONS:
+        if mode & bit:
+            s = s + format
+    t = struct.Struct(s).unpack(data)
+    packet = {}
+    if mode & insim_.OSO_HEADER:
+        packet['L'], packet['F'], packet['S'], packet['T'] = t[:4]
+        t = t[4:]
+    if mode & insim_.OSO_ID:
+        packet['ID'] = t[0]
+        t = t[1:]
+    if mode & insim_.OSO_TIME:
+        packet['Time'] = t[0]
+        t = t[1:]
+    if mode & insim_.OSO_MAIN:
+        packet['OSMain'] = insim_.OutSimMain().unpack(t[:15])
+        t = t[15:]
+    if mode & insim_.OSO_INPUTS:
+        packet['OSInputs'] = insim_.OutSimInputs().unpack(t[:5])
+        t = t[5:]
+    if mode & insim_.OSO_DRIVE:
+        packet['Drive'] = t[:6]
+        t = t[6:]
+    if mode & insim_.OSO_DISTANCE:
+        packet['Distance'] = t[:2]
+        t = t[2:]
+    if mode & insim_.OSO_WHEELS:
+        packet['OSWheels'] = [insim_.OutSimWheel().unpack(t[13*i:13*(i+1)]) for i in range(4)]
+        t = t[13*4:]
+    if mode & insim_.OSO_EXTRA_1:
+        packet['Extra'] = t[:2]
+    return packet
+
+
+def datagrams(count):
+    size = insim_.OutSimPack2(MODE).pack_s.size
+    return [b'LFST' + bytes(random.getrandbits(8) for _ in range(size - 4)) for _ in range(count)]
+
+
+def main():
+    print('%-8s %14s %14s %14s' % ('Sources', 'legacy CPU%', 'cached CPU%', 'reused CPU%'))
+    for sources in (1, 10, 30, 100):
+        packets = datagrams(sources * RATE)
+        reused = insim_.OutSimPack2(MODE)
+        funcs = (lambda: [legacy_unpack(MODE, d) for d in packets],
+                 lambda: [insim_.OutSimPack2(MODE).unpack(d) for d in packets],
+                 lambda: [reused.unpack(d) for d in packets])
+        # Seconds to decode one second of packets, as a percentage of a CPU.
+        usage = [100 * min(timeit.repeat(func, number=1, repeat=5)) for func in funcs]
+        print('%-8d %13.2f%% %13.2f%% %13.2f%%' % ((sources,) + tuple(usage)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Benchmark projecting the cars of IS_MCI updates onto a path.
+
+Builds a synthetic 1500 node path with a crossover and drives 40 cars
+around it, projecting every car of every update. Compares the previous
+approach of checking every node for every car in Python with
+pth.PathProjector, one car at a time and with NumPy, and checks that
+they find the same nodes.
+
+"""
+
+import math
+import random
+import time
+
+from pyinsim9 import pth
+from pyinsim9.core import insim_
+
+NODES = 1500
+CARS = 40
+UPDATES = 50
+UNIT = 65536
+
+
+class Node(object):
+    pass
+
+
+class SyntheticPth(object):
+    """A figure of eight, 7 km long and 10 m wide, with a bridge where it crosses."""
+    def __init__(self, count=NODES):
+        self.finishLine = 0
+        self.nodes = []
+        for i in range(count):
+            a = 2 * math.pi * i / count
+            x, y = 1100 * math.sin(a), 550 * math.sin(2 * a)
+            dx, dy = 1100 * math.cos(a), 1100 * math.cos(2 * a)
+            size = math.hypot(dx, dy)
+            node = Node()
+            node.X, node.Y, node.Z = int(x * UNIT), int(y * UNIT), int(8 * math.cos(a) * UNIT)
+            node.DirX, node.DirY, node.DirZ = dx / size, dy / size, 0.0
+            node.LimitLeft, node.LimitRight, node.DriveLeft, node.DriveRight = -5.0, 5.0, -4.0, 4.0
+            self.nodes.append(node)
+
+
+def updates(path, cars=CARS, count=UPDATES):
+    rand = random.Random(1)
+    place = [rand.uniform(0, len(path.nodes)) for _ in range(cars)]
+    speed = [rand.uniform(0.5, 2.5) for _ in range(cars)]
+    result = []
+    for _ in range(count):
+        info = []
+        for plid in range(cars):
+            place[plid] = (place[plid] + speed[plid]) % len(path.nodes)
+            node = path.nodes[int(place[plid])]
+            side = rand.uniform(-7, 7)
+            car = insim_.CompCar(bytes(28), 0)
+            car.PLID, car.Node = plid + 1, int(place[plid])
+            car.X = node.X + int(side * node.DirY * UNIT)
+            car.Y = node.Y - int(side * node.DirX * UNIT)
+            car.Z = node.Z
+            info.append(car)
+        result.append(info)
+    return result
+
+
+def legacy_nearest(path, car):
+    best, nearest = None, None
+    for i, node in enumerate(path.nodes):
+        distance = (car.X - node.X) ** 2 + (car.Y - node.Y) ** 2 + (car.Z - node.Z) ** 2
+        if best is None or distance < best:
+            best, nearest = distance, i
+    return nearest
+
+
+def main():
+    path = SyntheticPth()
+    stream = updates(path)
+    expected = [[legacy_nearest(path, car) for car in info] for info in stream[:5]]
+    modes = [('python', False)]
+    if pth.numpy is not None:
+        modes.append(('numpy', True))
+    print('%-20s %14s' % ('Projection', 'updates/s'))
+    start = time.perf_counter()
+    for info in stream[:5]:
+        [legacy_nearest(path, car) for car in info]
+    print('%-20s %14.0f' % ('legacy all nodes', 5 / (time.perf_counter() - start)))
+    for label, vectorized in modes:
+        for hints in (False, True):
+            projector = pth.PathProjector(path, vectorized=vectorized)
+            found = [[p.Node for p in projector.project(info)] for info in stream[:5]]
+            assert found == expected, label
+            start = time.perf_counter()
+            for info in stream:
+                if not hints:
+                    projector.reset()
+                    for car in info:
+                        car.Node = 0xffff
+                projector.project(info)
+            elapsed = time.perf_counter() - start
+            print('%-20s %14.0f' % ('%s %s' % (label, 'hints' if hints else 'grid'), len(stream) / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Benchmark loading path files.
+
+Writes synthetic .pth files the size of the largest LFS paths and larger,
+and compares func.Pth, which reads an object per node, with
+pth.load_pth() backed by NumPy or by array.array, uncached and cached. The
+memory column is what tracemalloc sees retained by the loaded path; with
+NumPy the nodes stay in the memory-mapped file and are paged in on use.
+
+"""
+
+import gc
+import os
+import random
+import tempfile
+import timeit
+import tracemalloc
+
+from pyinsim9 import func, pth
+
+SIZES = (1500, 4000, 20000)
+
+
+def write_pth(path, count):
+    rand = random.Random(count)
+    with open(path, 'wb') as f:
+        f.write(func._PTH_HEADER_STRUCT.pack(func._PTH_HEADER, func._PTH_VERSION, func._PTH_REVISION, count, 0))
+        for i in range(count):
+            f.write(func._PTH_NODE_STRUCT.pack(i * 65536, rand.randrange(1 << 24), 0, 1.0, 0.0, 0.0,
+                                               -6.0, 6.0, -5.0, 5.0))
+
+
+def retained(load):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    keep = load()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del keep
+    return size
+
+
+def main(number=5):
+    modes = [('func.Pth', None, lambda path: func.Pth(path))]
+    if pth.numpy is not None:
+        modes.append(('load_pth numpy', pth.numpy, lambda path: pth.load_pth(path, cache=False)))
+    modes.append(('load_pth array', None, lambda path: pth.load_pth(path, cache=False)))
+    modes.append(('load_pth cached', pth.numpy, pth.load_pth))
+    numpy = pth.numpy
+    directory = tempfile.mkdtemp()
+    print('%-16s %8s %12s %12s' % ('Loader', 'nodes', 'load ms', 'memory KB'))
+    try:
+        for count in SIZES:
+            path = os.path.join(directory, 'T%d.pth' % count)
+            write_pth(path, count)
+            for label, module, load in modes:
+                pth.numpy = module
+                pth.clear_pth_cache()
+                if label.endswith('cached'):
+                    load(path)
+                elapsed = min(timeit.repeat(lambda: load(path), number=number, repeat=3)) / number
+                memory = retained(lambda: load(path)) if not label.endswith('cached') else 0
+                print('%-16s %8d %12.3f %12.1f' % (label, count, elapsed * 1e3, memory / 1024))
+            os.remove(path)
+    finally:
+        pth.numpy = numpy
+        pth.clear_pth_cache()
+        os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Benchmark supervised connections through repeated host restarts.
+
+Connects 50 supervised InSim connections, each with a StateStore, to a
+pyinsim9.fakehost host sending IS_MCI every 50 ms, and answers every
+IS_MCI with a TINY_PING. The host refuses connections for the first half
+second, then restarts three times, dropping every connection and refusing
+new ones for half a second. Compares reconnecting after a fixed delay with
+the jittered backoff of _InSim.supervise(), reporting the connection
+attempts made, the most made in any 50 ms and the time until the last
+connection was back. Exits with an error unless each connection came back
+once per drop, the host got one IS_ISI per login, every connection
+resynced once per login and each ends with a full connection list.
+
+"""
+
+import bisect
+import sys
+import threading
+import time
+import warnings
+
+warnings.simplefilter('ignore', DeprecationWarning)
+
+from pyinsim9 import core, fakehost, state
+from pyinsim9.core import insim_
+
+CONNECTIONS = 50
+CARS = 20
+DROPS = 3
+PERIOD = 4.0
+DOWNTIME = 0.5
+DELAY = 0.2
+MAX_DELAY = 2.0
+WINDOW = 0.05
+
+
+def fixed(attempts):
+    """Reconnect after the same delay every time, as apps tend to."""
+    return DELAY
+
+
+def jittered(attempts):
+    """The default backoff of _InSim.supervise()."""
+    return core._backoff(DELAY, MAX_DELAY, attempts)
+
+
+def recorded(backoff, due):
+    # Note when each attempt is due.
+    def wait(attempts):
+        delay = backoff(attempts)
+        due.append(time.monotonic() + delay)
+        return delay
+    return wait
+
+
+def run(backoff):
+    arrivals = {insim_.ISP_ISI: [], insim_.TINY_NCN: []}
+    def received(host, data):
+        if data[1] == insim_.ISP_ISI:
+            arrivals[insim_.ISP_ISI].append(time.monotonic())
+        elif data[1] == insim_.ISP_TINY and data[3] == insim_.TINY_NCN:
+            arrivals[insim_.TINY_NCN].append(time.monotonic())
+    host = fakehost.fake_host(cars=CARS, interval=0.05, callback=received)
+    end = time.monotonic() + PERIOD * (DROPS + 1)
+    conns = []
+    supervisors = []
+    stores = []
+    due = []
+    def update(insim, mci):
+        if time.monotonic() > end:
+            core.closeall()
+            return
+        insim.send(insim_.ISP_TINY, ReqI=9, SubT=insim_.TINY_PING)
+    # Start with the host down, so the first attempts fail with IS_ISI queued.
+    threading.Thread(target=host.restart, args=(DOWNTIME,), daemon=True).start()
+    time.sleep(WINDOW)
+    for i in range(CONNECTIONS):
+        insim = core.insim('127.0.0.1', host.port, Flags=insim_.ISF_MCI, Interval=50)
+        supervisors.append(insim.supervise(delay=DELAY, max_delay=MAX_DELAY, backoff=recorded(backoff, due)))
+        insim.bind(insim_.ISP_MCI, update)
+        stores.append(state.StateStore(insim))
+        conns.append(insim)
+    drops = []
+    def restart():
+        for i in range(DROPS):
+            time.sleep(PERIOD)
+            drops.append(time.monotonic())
+            host.restart(DOWNTIME)
+    threading.Thread(target=restart, daemon=True).start()
+    core.run()
+    host.close()
+    due.sort()
+    peak = 0
+    for i, t in enumerate(due):
+        peak = max(peak, bisect.bisect_left(due, t + WINDOW) - i)
+    isi = arrivals[insim_.ISP_ISI][CONNECTIONS:]
+    back = max(max(t for t in isi if drop <= t < drop + PERIOD) - drop for drop in drops)
+    reconnects = sum(supervisor.reconnects for supervisor in supervisors)
+    # One login at the start and one after each drop.
+    extra = len(arrivals[insim_.ISP_ISI]) - CONNECTIONS * (DROPS + 1)
+    resyncs = len(arrivals[insim_.TINY_NCN])
+    complete = sum(1 for store in stores if len(store.connections) == CARS + 1)
+    return len(due), peak, back, reconnects, extra, resyncs, complete
+
+
+def check(label, reconnects, extra, resyncs, complete):
+    # Every connection comes back once per drop, logs in once each time,
+    # resyncs once at the start and once per drop, and ends up complete.
+    failures = []
+    if reconnects != CONNECTIONS * DROPS:
+        failures.append('%s: %d reconnects, expected %d' % (label, reconnects, CONNECTIONS * DROPS))
+    if extra:
+        failures.append('%s: %d extra IS_ISI' % (label, extra))
+    if resyncs != CONNECTIONS * (DROPS + 1):
+        failures.append('%s: %d resyncs, expected %d' % (label, resyncs, CONNECTIONS * (DROPS + 1)))
+    if complete != CONNECTIONS:
+        failures.append('%s: %d of %d stores complete' % (label, complete, CONNECTIONS))
+    return failures
+
+
+def main():
+    print('%d connections, %d drops' % (CONNECTIONS, DROPS))
+    print('%-10s %10s %10s %10s %12s %10s %10s %10s' % ('Reconnect', 'attempts', 'peak', 'back ms', 'reconnects',
+                                                        'extra ISI', 'resyncs', 'complete'))
+    failures = []
+    for label, backoff in (('fixed', fixed), ('jittered', jittered)):
+        attempts, peak, back, reconnects, extra, resyncs, complete = run(backoff)
+        print('%-10s %10d %10d %10.0f %12d %10d %10d %10d' % (label, attempts, peak, back * 1e3, reconnects, extra,
+                                                              resyncs, complete))
+        failures.extend(check(label, reconnects, extra, resyncs, complete))
+    for failure in failures:
+        print('FAILED ' + failure)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
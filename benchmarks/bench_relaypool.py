@@ -0,0 +1,68 @@
+"""Benchmark taking a snapshot of 200 hosts through the InSim relay.
+
+A pyinsim9.fakehost host stands in for the relay and answers IR_SEL for
+200 host names. The old way, as in examples/multiple_hosts.py, opens a
+relay connection per host, selects it and requests IS_STA, IS_NCN and
+IS_NPL. pyinsim9.relaypool.RelayPool takes turns over a few connections
+instead. Reports the connections used and the time until every host has
+been seen once.
+
+"""
+
+import time
+import warnings
+
+warnings.simplefilter('ignore', DeprecationWarning)
+
+from pyinsim9 import core, fakehost, relaypool
+from pyinsim9.core import insim_
+
+HOSTS = 200
+CARS = 8
+
+
+def legacy(port, names):
+    seen = set()
+    relays = []
+    def ncn(relay, packet):
+        seen.add(relay.name)
+        if len(seen) == len(names):
+            core.closeall()
+    for hname in names:
+        relay = core.relay('127.0.0.1', port, HName=hname, name=hname)
+        relay.bind(insim_.ISP_NCN, ncn)
+        relay.sendp(*[insim_.IS_TINY(ReqI=1, SubT=subt) for subt in relaypool._SNAPSHOT])
+        relays.append(relay)
+    core.run()
+    return len(relays), len(seen)
+
+
+def pooled(port, names, size):
+    seen = set()
+    pool = relaypool.RelayPool('127.0.0.1', port, size=size)
+    def snapshot(pool, hname, replies):
+        seen.add(hname)
+        if len(seen) == len(names):
+            pool.close()
+    pool.bind(relaypool.EVT_SNAPSHOT, snapshot)
+    for hname in names:
+        pool.watch(hname)
+    core.run()
+    return size, len(seen)
+
+
+def main():
+    names = [b'^7Host %d' % i for i in range(HOSTS)]
+    host = fakehost.fake_host(cars=CARS, hname=names)
+    print('%-12s %12s %8s %10s' % ('Relay', 'connections', 'hosts', 'ms'))
+    runs = [('per host', lambda: legacy(host.port, names))]
+    runs.extend(('pool of %d' % size, lambda size=size: pooled(host.port, names, size)) for size in (4, 16))
+    for label, run in runs:
+        start = time.perf_counter()
+        connections, seen = run()
+        print('%-12s %12d %8d %10.0f' % (label, connections, seen, (time.perf_counter() - start) * 1e3))
+    host.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark capture and replay of a recorded race stream.
+
+Records a race stream into a capture file and replays it at maximum speed
+through _InSim._handle_insim_packet with no handlers, one ISP_MCI handler
+and one EVT_ALL handler. The packets and their order are fixed, so the
+replay rate is a repeatable end-to-end throughput number for decoding and
+dispatch. Also times seeking to the middle of the capture.
+
+"""
+
+import os
+import tempfile
+import timeit
+import warnings
+
+warnings.simplefilter('ignore', DeprecationWarning)
+
+from pyinsim9 import core, replay
+
+from benchmarks import samples
+
+RATE = 100
+
+
+def handler(insim, packet):
+    pass
+
+
+def record(path, packets, repeat):
+    insim = core._InSim(b'race')
+    with replay.Recorder(path) as recorder:
+        for i in range(repeat):
+            for j, data in enumerate(packets):
+                recorder.write(insim, replay.CHANNEL_TCP, data, timestamp=(i * len(packets) + j) / RATE)
+
+
+def main(repeat=50):
+    packets = samples.race_stream(200)
+    fd, path = tempfile.mkstemp(suffix='.cap')
+    os.close(fd)
+    try:
+        count = len(packets) * repeat
+        elapsed = min(timeit.repeat(lambda: record(path, packets, repeat), number=1, repeat=3))
+        size = os.path.getsize(path)
+        print('%d packets, %.1f MB capture, %.1f s of traffic' % (count, size / 1e6, count / RATE))
+        print('%-20s %12.0f packets/s' % ('record', count / elapsed))
+        with replay.Replayer(path) as replayer:
+            for name, evt in (('no handlers', None), ('ISP_MCI', core.insim_.ISP_MCI), ('EVT_ALL', core.EVT_ALL)):
+                insim = core._InSim(b'race')
+                if evt is not None:
+                    insim.bind(evt, handler)
+                elapsed = min(timeit.repeat(lambda: replayer.replay(insim, speed=None), number=1, repeat=3))
+                print('%-20s %12.0f packets/s' % ('replay ' + name, count / elapsed))
+            middle = replayer.duration / 2
+            elapsed = min(timeit.repeat(lambda: next(replayer.records(start=middle)), number=100, repeat=3))
+            print('%-20s %12.1f us' % ('seek', elapsed / 100 * 1e6))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
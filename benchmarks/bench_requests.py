@@ -0,0 +1,74 @@
+"""Benchmark resyncing the connections and players of many hosts at startup.
+
+Connects to 40 hosts of pyinsim9.fakehost with pyinsim9.aio and gets the
+IS_NCN and IS_NPL lists of each. The old way sends the IS_TINY requests to
+one host at a time and waits for the replies to stop for a while, guessing
+the list is complete. _InSim.request() sends every request at once and each
+completes when its last reply, or the TINY_REPLY sent after it, arrives.
+
+"""
+
+import asyncio
+import time
+import warnings
+
+warnings.simplefilter('ignore', DeprecationWarning)
+
+from pyinsim9 import aio, fakehost
+from pyinsim9.core import insim_
+
+HOSTS = 40
+CARS = 20
+QUIET = 0.05
+
+
+async def legacy(hosts):
+    # Bind handlers, send the requests and wait until nothing has arrived for QUIET seconds.
+    result = []
+    for insim in hosts:
+        replies = []
+        last = [time.monotonic()]
+        def reply(insim, packet):
+            replies.append(packet)
+            last[0] = time.monotonic()
+        insim.bind(insim_.ISP_NCN, reply)
+        insim.bind(insim_.ISP_NPL, reply)
+        insim.sendp(insim_.IS_TINY(ReqI=2, SubT=insim_.TINY_NCN), insim_.IS_TINY(ReqI=2, SubT=insim_.TINY_NPL))
+        while time.monotonic() - last[0] < QUIET:
+            await asyncio.sleep(QUIET / 5)
+        insim.unbind(insim_.ISP_NCN, reply)
+        insim.unbind(insim_.ISP_NPL, reply)
+        result.append(len(replies))
+    return result
+
+
+async def pipelined(hosts):
+    requests = []
+    for insim in hosts:
+        requests.append(insim.request(insim_.ISP_TINY, SubT=insim_.TINY_NCN))
+        requests.append(insim.request(insim_.ISP_TINY, SubT=insim_.TINY_NPL))
+    replies = await asyncio.gather(*requests)
+    return [len(replies[i]) + len(replies[i + 1]) for i in range(0, len(replies), 2)]
+
+
+async def run():
+    servers = [fakehost.fake_host(cars=CARS) for i in range(HOSTS)]
+    hosts = [await aio.insim('127.0.0.1', server.port) for server in servers]
+    print('%-10s %10s %10s' % ('Resync', 'replies', 'ms'))
+    for label, resync in (('one by one', legacy), ('pipelined', pipelined)):
+        start = time.perf_counter()
+        counts = await resync(hosts)
+        elapsed = time.perf_counter() - start
+        print('%-10s %10d %10.1f' % (label, sum(counts), elapsed * 1e3))
+    for insim in hosts:
+        insim.close()
+    for server in servers:
+        server.close()
+
+
+def main():
+    aio.run(run())
+
+
+if __name__ == '__main__':
+    main()
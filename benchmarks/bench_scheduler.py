@@ -0,0 +1,139 @@
+"""Benchmark the outbound rate limit under a burst of messages and buttons.
+
+Simulates 20 seconds of a host sending to LFS at 100 packets a second: a
+40 player overlay of 8 buttons each refreshed at 2 Hz, a burst of race
+control messages every few seconds and a command now and then. Compares one
+first-in first-out token bucket with the scheduler of
+_InSim.set_rate_limit(), reporting how long commands and messages waited,
+how many packets were sent and what was left queued at the end.
+
+"""
+
+import collections
+import random
+import time
+
+from pyinsim9 import core
+from pyinsim9.core import insim_
+
+RATE = 100
+SECONDS = 20
+TICK = 0.01
+PLAYERS = 40
+BUTTONS = 8
+
+
+class Clock(object):
+    """Simulated time."""
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class LegacyBucket(object):
+    """A token bucket with one queue and no priorities."""
+    def __init__(self, rate, burst, clock):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.stamp = clock()
+        self.queue = collections.deque()
+        self.sent = 0
+
+    def __len__(self):
+        return len(self.queue)
+
+    def put(self, packet, priority=None):
+        self.queue.append(packet.pack())
+
+    def get(self):
+        now = self.clock()
+        tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        chunks = []
+        while self.queue and tokens >= 1:
+            chunks.append(self.queue.popleft())
+            tokens -= 1
+        self.tokens = tokens
+        self.sent += len(chunks)
+        return chunks, None
+
+
+def schedule(seconds=SECONDS):
+    # (time, packet) in the order they are sent.
+    rand = random.Random(1)
+    events = []
+    for i in range(int(seconds * 2)):
+        t = i * 0.5
+        for ucid in range(1, PLAYERS + 1):
+            for click_id in range(BUTTONS):
+                text = b'%.1f' % rand.uniform(0, 30)
+                events.append((t, insim_.IS_BTN(ReqI=1, UCID=ucid, ClickID=click_id, L=0, T=20 + click_id * 5,
+                                                W=20, H=5, Text=text)))
+    for i in range(int(seconds / 4)):
+        t = i * 4 + 1.0
+        for ucid in range(1, PLAYERS + 1):
+            events.append((t, insim_.IS_MTC(UCID=ucid, Msg=b'^3Blue flag, let the leader through')))
+    for i in range(int(seconds * 2)):
+        t = rand.uniform(0, seconds)
+        events.append((t, insim_.IS_MST(Msg=b'/spec Driver %d' % i)))
+    events.sort(key=lambda event: event[0])
+    return events
+
+
+def simulate(make, events, seconds=SECONDS):
+    clock = Clock()
+    queue = make(clock)
+    put = dict((kind, collections.deque()) for kind in (insim_.ISP_MST, insim_.ISP_MTC))
+    waits = dict((kind, []) for kind in put)
+    i = 0
+    steps = int(seconds / TICK)
+    for step in range(steps + 1):
+        clock.now = step * TICK
+        while i < len(events) and events[i][0] <= clock.now:
+            packet = events[i][1]
+            if packet.Type in put:
+                put[packet.Type].append(clock.now)
+            queue.put(packet)
+            i += 1
+        for data in queue.get()[0]:
+            if data[1] in put:
+                waits[data[1]].append(clock.now - put[data[1]].popleft())
+    return queue, waits
+
+
+def cost(events):
+    # Wall time to queue and send every packet with no rate limit.
+    clock = Clock()
+    scheduler = core._Scheduler(float('inf'), float('inf'), core._SCHEDULER_BUDGET, clock)
+    start = time.perf_counter()
+    for t, packet in events:
+        scheduler.put(packet)
+        scheduler.get()
+    return (time.perf_counter() - start) / len(events) * 1e6
+
+
+def average(values):
+    return sum(values) / len(values) if values else float('nan')
+
+
+def main():
+    events = schedule()
+    print('%d packets over %d seconds at %d packets/s' % (len(events), SECONDS, RATE))
+    print('%-10s %8s %8s %8s %8s %12s %12s' % ('Queue', 'sent', 'queued', 'merged', 'dropped', 'command ms',
+                                             'message ms'))
+    makers = (('fifo', lambda clock: LegacyBucket(RATE, RATE // 5, clock)),
+              ('scheduler', lambda clock: core._Scheduler(RATE, RATE // 5, core._SCHEDULER_BUDGET, clock)))
+    for label, make in makers:
+        queue, waits = simulate(make, events)
+        print('%-10s %8d %8d %8d %8d %12.0f %12.0f' % (
+            label, queue.sent, len(queue), getattr(queue, 'coalesced', 0), getattr(queue, 'dropped', 0),
+            average(waits[insim_.ISP_MST]) * 1e3, average(waits[insim_.ISP_MTC]) * 1e3))
+    print('put and get: %.2f us/packet' % cost(events))
+
+
+if __name__ == '__main__':
+    main()
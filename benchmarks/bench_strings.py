@@ -0,0 +1,158 @@
+"""Benchmark decoding LFS encoded names, encoding messages and colours.
+
+Decodes 40 player names that are ASCII only, mixed Latin codepages and CJK,
+comparing a Python 3 port of the previous character by character toUnicode
+loop with the 'lfs' codec and the cached toUnicode().
+
+Encodes localized messages the same way, comparing a port of the previous
+fromUnicode, which searched every codepage table for each character, with
+the indexed encoder and the cached fromUnicode(), as if each message was
+sent to 40 players.
+
+Renders player names and a long MSO text as HTML, comparing a port of the
+previous lfs_color_to_html(), which wrote a <span> per character, with the
+colour run tokenizer and the cached lfs_color_to_html().
+
+"""
+
+import timeit
+
+from pyinsim9 import func, strmanip
+
+ASCII_NAMES = [b'^7Player ^1%d ^8[TEAM]' % i for i in range(40)]
+LATIN_NAMES = [b'^1Pi^Eot\xbf %d ^L^3J\xfcrgen ^Ez\xb3o' % i for i in range(40)]
+CJK_NAMES = [b'^7^J\x82\xa0\x82\xa2 %d ^L^2team ^S\xd6\xd0\xce\xc4' % i for i in range(40)]
+
+MESSAGES = {
+    'ASCII': ['^3Race starts in %d seconds, ^7good luck!' % i for i in range(10)],
+    'Latin': ['^3Wy\u015bcig za %d sekund, ^7powodzenia! Gr\xfc\xdfe' % i for i in range(10)],
+    'Cyrillic': ['^3\u0413\u043e\u043d\u043a\u0430 \u0447\u0435\u0440\u0435\u0437 %d \u0441\u0435\u043a\u0443\u043d\u0434' % i
+                 for i in range(10)],
+    'CJK': ['^3\u30ec\u30fc\u30b9\u958b\u59cb\u307e\u3067 %d \u79d2 ^7\u4e2d\u6587 \ud55c\uad6d\uc5b4' % i
+            for i in range(10)],
+}
+
+
+def legacy_to_unicode(str_, default='L', cols=True):
+    output = u''
+    accum = b''
+    codec = strmanip._ENCODING_MAP[default][0]
+    ctrl = False
+    for c in str_:
+        c = chr(c)
+        if c == '\x00':
+            break
+        if ctrl:
+            if c in strmanip._ENCODING_MAP:
+                codec = strmanip._ENCODING_MAP[c][0]
+            elif c in strmanip._UNESCAPE_MAP:
+                accum += strmanip._UNESCAPE_MAP[c].encode('latin-1')
+            elif cols:
+                accum += b'^' + c.encode('latin-1')
+            ctrl = False
+        else:
+            if c == '^':
+                output += accum.decode(codec)
+                accum = b''
+                ctrl = True
+            else:
+                accum += c.encode('latin-1')
+    if len(accum):
+        output += accum.decode(codec)
+    return output
+
+
+def legacy_from_unicode(ustr, default='L'):
+    output = b''
+    accum = u''
+    codec = strmanip._ENCODING_MAP[default]
+    identifier = b''
+    for c in ustr:
+        if (ord(c) <= 127) or (c in codec[1]):
+            accum += c
+        else:
+            for (key, charset) in strmanip._ENCODING_MAP.items():
+                if c in charset[1]:
+                    if len(accum) == 1:
+                        if not accum[-1] in charset[1]:
+                            output += identifier + accum.encode(codec[0])
+                            accum = u''
+                    else:
+                        output += identifier + accum.encode(codec[0])
+                        accum = u''
+                    identifier = b'^' + key.encode('ascii')
+                    codec = charset
+                    accum += c
+                    break
+    if len(accum):
+        output += identifier + accum.encode(codec[0])
+    return output
+
+
+def legacy_color_to_html(text):
+    result = ""
+    current_color = '#FFFFFF'
+    i = 0
+    while i < len(text):
+        if text[i] == '^' and i + 1 < len(text) and text[i+1] in func._COLOR_MAP:
+            current_color = func._COLOR_MAP[text[i+1]]
+            i += 2
+        else:
+            safe_char = text[i].replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+            result += f'<span style="color:{current_color}">{safe_char}</span>'
+            i += 1
+    return result
+
+
+def colours(number=20):
+    names = [strmanip.toUnicode(n) for n in LATIN_NAMES]
+    mso = ''.join(names) * 4
+    print('%-9s %14s %14s %14s %12s' % ('HTML', 'legacy str/s', 'runs str/s', 'cached str/s', 'chars'))
+    for label, texts in (('names', names), ('MSO', [mso])):
+        def runs():
+            func.colour_runs.cache_clear()
+            return [func.lfs_color_to_html.__wrapped__(t) for t in texts]
+        funcs = (lambda: [legacy_color_to_html(t) for t in texts],
+                 runs,
+                 lambda: [func.lfs_color_to_html(t) for t in texts])
+        rates = [number * len(texts) / min(timeit.repeat(f, number=number, repeat=5)) for f in funcs]
+        size = '%d/%d' % (len(legacy_color_to_html(texts[0])), len(func.lfs_color_to_html(texts[0])))
+        print('%-9s %14.0f %14.0f %14.0f %12s' % ((label,) + tuple(rates) + (size,)))
+
+
+def encode(number=5, players=40):
+    print('%-9s %15s %15s %15s %12s' % ('Messages', 'legacy msg/s', 'indexed msg/s', 'cached msg/s', 'bytes'))
+    for label, messages in MESSAGES.items():
+        for message in messages:
+            assert strmanip.toUnicode(strmanip.fromUnicode(message)) == message
+        sends = [m for m in messages for _ in range(players)]
+        funcs = (lambda: [legacy_from_unicode(m) for m in sends],
+                 lambda: [strmanip._encode(m) for m in sends],
+                 lambda: [strmanip.fromUnicode(m) for m in sends])
+        rates = [number * len(sends) / min(timeit.repeat(f, number=number, repeat=5)) for f in funcs]
+        size = '%d/%d' % (len(legacy_from_unicode(messages[0])), len(strmanip.fromUnicode(messages[0])))
+        print('%-9s %15.0f %15.0f %15.0f %12s' % ((label,) + tuple(rates) + (size,)))
+
+
+def decode(number=200):
+    print('%-8s %14s %14s %14s' % ('Names', 'legacy name/s', 'codec name/s', 'cached name/s'))
+    for label, names in (('ASCII', ASCII_NAMES), ('Latin', LATIN_NAMES), ('CJK', CJK_NAMES)):
+        assert [legacy_to_unicode(n) for n in names] == [n.decode('lfs') for n in names] == \
+               [strmanip.toUnicode(n) for n in names]
+        funcs = (lambda: [legacy_to_unicode(n) for n in names],
+                 lambda: [n.decode('lfs') for n in names],
+                 lambda: [strmanip.toUnicode(n) for n in names])
+        rates = [number * len(names) / min(timeit.repeat(f, number=number, repeat=5)) for f in funcs]
+        print('%-8s %14.0f %14.0f %14.0f' % ((label,) + tuple(rates)))
+
+
+def main():
+    decode()
+    print()
+    encode()
+    print()
+    colours()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Benchmark live timing of IS_NLP updates.
+
+Feeds pyinsim9.timing.Timing the IS_NLP updates of 40 cars lapping a 1000
+node path at different speeds, on several hosts, and compares it with a
+port of the usual approach of keeping each car's history and recomputing
+every gap on every update. Also times snapshot() at 10 Hz.
+
+"""
+
+import bisect
+import random
+import timeit
+
+from pyinsim9 import timing
+from pyinsim9.core import insim_
+
+NODES = 1000
+CARS = 40
+UPDATES = 600
+HOSTS = 4
+
+
+class Host(object):
+    connected = False
+
+    def bind(self, evt, callback):
+        pass
+
+    def unbind(self, evt, callback):
+        pass
+
+
+def stream(cars=CARS, count=UPDATES, seed=1):
+    rand = random.Random(seed)
+    place = [-rand.uniform(0, 30) for _ in range(cars)]
+    speed = [rand.uniform(8, 10) for _ in range(cars)]
+    packets = []
+    for i in range(count):
+        info = []
+        for plid in range(cars):
+            place[plid] += speed[plid] * rand.uniform(0.9, 1.1)
+            lap, node = divmod(int(place[plid]), NODES)
+            car = insim_.NodeLap(bytes(6), 0)
+            car.Node, car.Lap, car.PLID, car.Position = node, lap + 1, plid + 1, 0
+            info.append(car)
+        packet = insim_.IS_NLP()
+        packet.Info = info
+        packets.append((i * 0.5, packet))
+    return packets
+
+
+class LegacyTiming(object):
+    def __init__(self):
+        self.history = {}
+
+    def update(self, now, packet):
+        for car in packet.Info:
+            point = car.Lap * NODES + car.Node
+            points, times = self.history.setdefault(car.PLID, ([], []))
+            if not points or point > points[-1]:
+                points.append(point)
+                times.append(now)
+        leader = max(self.history, key=lambda plid: self.history[plid][0][-1])
+        points, times = self.history[leader]
+        gaps = {}
+        for plid, (car_points, car_times) in self.history.items():
+            i = bisect.bisect_left(points, car_points[-1])
+            gaps[plid] = car_times[-1] - times[min(i, len(times) - 1)]
+        return sorted(gaps.items(), key=lambda item: item[1])
+
+
+def main():
+    rst = insim_.IS_RST()
+    rst.NumNodes, rst.Finish = NODES, 0
+    hosts = [Host() for _ in range(HOSTS)]
+    streams = [stream(seed=i) for i in range(HOSTS)]
+    clock = [0.0]
+
+    def run_timing():
+        engine = timing.Timing(clock=lambda: clock[0])
+        for host in hosts:
+            engine.attach(host)
+            engine._handle_rst(host, rst)
+        for i in range(UPDATES):
+            for host, packets in zip(hosts, streams):
+                clock[0], packet = packets[i]
+                engine._handle_cars(host, packet)
+        return engine
+
+    def run_legacy():
+        engines = [LegacyTiming() for _ in hosts]
+        for i in range(UPDATES):
+            for engine, packets in zip(engines, streams):
+                engine.update(*packets[i])
+
+    count = UPDATES * HOSTS
+    print('%-24s %14s' % ('Timing', 'rate'))
+    elapsed = min(timeit.repeat(run_legacy, number=1, repeat=3))
+    print('%-24s %12.0f/s' % ('legacy updates', count / elapsed))
+    elapsed = min(timeit.repeat(run_timing, number=1, repeat=3))
+    print('%-24s %12.0f/s' % ('Timing updates', count / elapsed))
+    engine = run_timing()
+    snapshot = engine.snapshot(hosts[0])
+    print('leader %d lap %d, last car %.1f s behind' % (snapshot[0].PLID, snapshot[0].Lap, snapshot[-1].Gap))
+
+    def snapshots():
+        for host, packets in zip(hosts, streams):
+            engine._handle_cars(host, packets[-1][1])
+            engine.snapshot(host)
+    elapsed = min(timeit.repeat(snapshots, number=100, repeat=3)) / 100
+    print('%-24s %12.0f us' % ('snapshot %d hosts' % HOSTS, elapsed * 1e6))
+    elapsed = min(timeit.repeat(lambda: engine.snapshots(), number=1000, repeat=3)) / 1000
+    print('%-24s %12.1f us' % ('cached snapshots', elapsed * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark OutSim2 decoding in worker processes.
+
+Feeds mode 0x1ff datagrams from 30 rigs through pyinsim9.workers with a
+reduce function that summarises each batch, sweeping the worker count, and
+compares it with decoding and summarising on this thread. The sweep only
+scales on a machine with more than one CPU.
+
+"""
+
+import math
+import os
+import random
+import struct
+import time
+
+from pyinsim9 import workers
+from pyinsim9.core import insim_
+
+MODE = 0x1ff
+
+
+def datagrams(count, rigs=30):
+    size = insim_.OutSimPack2(MODE).pack_s.size
+    packets = []
+    for i in range(count):
+        data = bytearray(random.getrandbits(8) for _ in range(size))
+        data[0:4] = b'LFST'
+        struct.pack_into('I', data, 4, i % rigs)
+        packets.append(bytes(data))
+    return packets
+
+
+def summarise(packets):
+    """Fastest speed seen from each rig in the batch."""
+    speeds = {}
+    for packet in packets:
+        vel = packet.OSMain.Vel
+        speed = math.sqrt(sum(v * v for v in vel if v == v and abs(v) < 1e6))
+        if speed > speeds.get(packet.ID, -1.0):
+            speeds[packet.ID] = speed
+    return speeds
+
+
+def in_process(packets, batch):
+    results = []
+    for i in range(0, len(packets), batch):
+        results.append(summarise([insim_.OutSimPack2(MODE).unpack(d) for d in packets[i:i + batch]]))
+    return results
+
+
+def pooled(packets, nworkers, reduce):
+    results = []
+    pool = workers.outsim2_pool(port=None, mode=MODE, workers=nworkers, reduce=reduce,
+                                callback=lambda pool, result: results.append(result))
+    start = time.perf_counter()
+    for data in packets:
+        pool.feed(data)
+    pool.close()
+    return time.perf_counter() - start, results
+
+
+def main(count=50000, batch=workers._BATCH_SIZE):
+    packets = datagrams(count)
+    print('%d packets of %d bytes, %d CPUs' % (count, len(packets[0]), os.cpu_count()))
+    print('%-22s %12s' % ('Mode', 'packets/s'))
+    start = time.perf_counter()
+    expected = in_process(packets, batch)
+    print('%-22s %12.0f' % ('in process', count / (time.perf_counter() - start)))
+    sweep = sorted(set((1, 2, 4, os.cpu_count() or 1)))
+    for nworkers in sweep:
+        elapsed, results = pooled(packets, nworkers, summarise)
+        assert results == expected
+        print('%-22s %12.0f' % ('%d workers' % nworkers, count / elapsed))
+    elapsed, results = pooled(packets, sweep[-1], None)
+    assert len(results) == count
+    print('%-22s %12.0f' % ('%d workers, no reduce' % sweep[-1], count / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Synthetic InSim traffic used by the benchmarks.
+
+The packets are built from the struct layouts in pyinsim9.insim, so they have
+the same sizes and field layout as a real race night capture.
+
+"""
+
+import random
+import struct
+
+from pyinsim9.core import insim_
+
+
+def tiny(subt=insim_.TINY_NONE, reqi=0):
+    return struct.pack('4B', 1, insim_.ISP_TINY, reqi, subt)
+
+
+def mci(numc=8, first_plid=1):
+    cars = b''.join(insim_.CompCar.pack_s.pack(
+        random.randint(0, 500), random.randint(0, 30), first_plid + i, i + 1, 0, 0,
+        random.randint(-10**7, 10**7), random.randint(-10**7, 10**7), random.randint(0, 10**5),
+        random.randint(0, 20000), random.randint(0, 65535), random.randint(0, 65535),
+        random.randint(-5000, 5000)) for i in range(numc))
+    return struct.pack('4B', (4 + len(cars)) // 4, insim_.ISP_MCI, 0, numc) + cars
+
+
+def nlp(nump=40):
+    cars = b''.join(insim_.NodeLap.pack_s.pack(random.randint(0, 500), random.randint(0, 30), i + 1, i + 1)
+                    for i in range(nump))
+    if nump % 2:
+        cars += b'\x00\x00'
+    return struct.pack('4B', (4 + len(cars)) // 4, insim_.ISP_NLP, 0, nump) + cars
+
+
+def mso(msg=b'^7Player ^8: hello everyone'):
+    text = msg + b'\x00' * (4 - len(msg) % 4)
+    return struct.pack('8B', (8 + len(text)) // 4, insim_.ISP_MSO, 0, 0, 1, 1, insim_.MSO_USER, 9) + text
+
+
+def lap(plid=1):
+    return insim_.IS_LAP.pack_s.pack(5, insim_.ISP_LAP, 0, plid, 92345, 1234567, 12, 0, 0, 0, 1, 100)
+
+
+def spx(plid=1):
+    return insim_.IS_SPX.pack_s.pack(4, insim_.ISP_SPX, 0, plid, 31234, 1200000, 1, 0, 0, 100)
+
+
+def ncn(ucid=1):
+    return insim_.IS_NCN.pack_s.pack(14, insim_.ISP_NCN, 0, ucid, b'user%d' % ucid,
+                                     b'^1Play^7er %d' % ucid, 0, 40, 0, 0)
+
+
+def npl(plid=1, ucid=1):
+    return insim_.IS_NPL.pack_s.pack(19, insim_.ISP_NPL, 0, plid, ucid, 0, 0, b'^4Player %d' % plid,
+                                     b'PLATE', b'XRG', b'skin_%d' % plid, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0,
+                                     0, 0, 0, plid, 0, 50)
+
+
+def res(plid=1):
+    return insim_.IS_RES.pack_s.pack(21, insim_.ISP_RES, 0, plid, b'user%d' % plid, b'^3Player %d' % plid,
+                                     b'PLATE', b'XRG', 1234567, 92345, 0, 1, 2, 0, 20, 0, plid, 40, 0)
+
+
+def race_stream(updates=500, cars=40):
+    """A list of packets like the ones received during a race with MCI and
+    NLP updates switched on."""
+    packets = []
+    for i in range(updates):
+        for first in range(0, cars, 8):
+            packets.append(mci(min(8, cars - first), first + 1))
+        packets.append(nlp(cars))
+        plid = i % cars + 1
+        packets.append(spx(plid) if i % 2 else lap(plid))
+        if i % 10 == 0:
+            packets.append(mso())
+        if i % 25 == 0:
+            packets.append(tiny())
+    return packets
+
+
+def chunked(packets, size=4096):
+    """Join packets into a byte stream and cut it into socket sized reads."""
+    stream = b''.join(packets)
+    return [stream[i:i + size] for i in range(0, len(stream), size)]
+
+
+def axm(numo=30):
+    objects = b''.join(insim_.ObjectInfo.pack_s.pack(i * 16, -i * 16, 8, 0, 20, i) for i in range(numo))
+    return struct.pack('8B', (8 + len(objects)) // 4, insim_.ISP_AXM, 0, numo, 0, insim_.PMO_ADD_OBJECTS, 0, 0) + objects
+
+
+def plh(nump=40):
+    hcaps = b''.join(insim_.PlayerHCap.pack_s.pack(i + 1, 3, 20, 10) for i in range(nump))
+    return struct.pack('4B', (4 + len(hcaps)) // 4, insim_.ISP_PLH, 0, nump) + hcaps
+
+
+def hos(numhosts=6):
+    hosts = b''.join(insim_.HInfo.pack_s.pack(b'^1Host %d' % i, b'BL1', insim_.HOS_LICENSED, 12)
+                     for i in range(numhosts))
+    return struct.pack('4B', (4 + len(hosts)) // 4, insim_.IRP_HOS, 0, numhosts) + hosts
+
+
+def fixed(ptype, cls):
+    """A zero filled packet of a fixed size type, with its header set."""
+    data = bytearray(cls.pack_s.size)
+    data[0] = len(data) // 4
+    data[1] = ptype
+    return bytes(data)
+
+
+def received():
+    """Dict of packet type to sample data for every packet type that
+    pyinsim decodes without error."""
+    from pyinsim9.core import _PACKET_MAP
+    packets = {}
+    for ptype, cls in _PACKET_MAP.items():
+        if hasattr(cls, 'unpack') and hasattr(cls, 'pack_s'):
+            packets[ptype] = fixed(ptype, cls)
+    packets.update({
+        insim_.ISP_TINY: tiny(),
+        insim_.ISP_MSO: mso(),
+        insim_.ISP_NCN: ncn(),
+        insim_.ISP_NPL: npl(),
+        insim_.ISP_LAP: lap(),
+        insim_.ISP_SPX: spx(),
+        insim_.ISP_RES: res(),
+        insim_.ISP_NLP: nlp(),
+        insim_.ISP_MCI: mci(),
+        insim_.ISP_AXM: axm(),
+        insim_.ISP_PLH: plh(),
+        insim_.IRP_HOS: hos(),
+        insim_.ISP_CON: fixed(insim_.ISP_CON, insim_.IS_CON) + bytes(32),
+        insim_.ISP_UCO: fixed(insim_.ISP_UCO, insim_.IS_UCO) + bytes(8),
+    })
+    for ptype, data in list(packets.items()):
+        try:
+            _PACKET_MAP[ptype]().unpack(data)
+        except Exception:
+            del packets[ptype]
+    return packets
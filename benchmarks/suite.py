@@ -0,0 +1,226 @@
+"""Benchmark suite with JSON results and baseline comparison.
+
+Times packet unpacking for every received type, pack() for every sendable
+type, TCP framing, dispatch, OutSim/OutGauge decoding and the string helpers,
+as nanoseconds per call. Save the results of one revision and compare a later
+one against them to catch regressions:
+
+    python -m benchmarks.suite --output baseline.json
+    python -m benchmarks.suite --baseline baseline.json
+
+The comparison lists every case that got slower by more than --threshold and
+exits with status 1 if there are any. Cases that raise are reported as
+errors rather than timed. Use --filter to run the cases whose name contains
+a string.
+
+"""
+
+import argparse
+import contextlib
+import inspect
+import json
+import os
+import platform
+import sys
+import time
+import warnings
+
+warnings.simplefilter('ignore', DeprecationWarning)
+
+from pyinsim9 import core, func, strmanip
+from pyinsim9.core import insim_
+
+from benchmarks import samples
+
+REPEAT = 5
+MIN_TIME = 0.02
+THRESHOLD = 0.20
+
+LFS_TEXT = b'^7Player ^1Name ^8: ^3ready? ^Eza\xbf\xf3\xb3\xe6 ^Jgo\x82\xa0 ^L^vok^v'
+UNICODE_TEXT = '^7Player ^1Name ^8: ^3ready? zaż\xf3łć goあ |ok|'
+
+# Arguments for the sendable packets that carry a variable part.
+PACK_ARGS = {
+    'IS_BTN': dict(ClickID=1, BStyle=insim_.ISB_LIGHT, L=10, T=10, W=40, H=8, Text=b'^7Click ^3me'),
+    'IS_MTC': dict(UCID=255, Msg=b'^3Welcome to the server ^7player'),
+    'IS_MST': dict(Msg=b'/msg hello'),
+    'IS_MSX': dict(Msg=b'^3A longer message for everyone on the server'),
+    'IS_PLH': dict(NumP=8, HCaps=[insim_.PlayerHCap(i + 1, 20, 10) for i in range(8)]),
+    'IS_AIC': dict(PLID=1, Inputs=[insim_.AIInputVal(insim_.CS_THROTTLE, 0, 65535),
+                                   insim_.AIInputVal(insim_.CS_BRAKE, 0, 0)]),
+}
+
+
+def unpack_cases():
+    cases = {}
+    for ptype, data in samples.received().items():
+        cls = core._PACKET_MAP[ptype]
+        cases['unpack.' + cls.__name__] = lambda cls=cls, data=data: cls().unpack(data)
+        decoder = core._DECODERS[ptype]
+        cases['decode.' + cls.__name__] = lambda decoder=decoder, data=memoryview(data): decoder(data)
+    return cases
+
+
+def pack_cases():
+    cases = {}
+    for name, cls in sorted(vars(insim_).items()):
+        if (name.startswith('IS_') or name.startswith('IR_')) and inspect.isclass(cls) and hasattr(cls, 'pack'):
+            cases['pack.' + name] = lambda cls=cls, kwargs=PACK_ARGS.get(name, {}): cls(**kwargs).pack()
+    return cases
+
+
+def framing_cases():
+    chunks = samples.chunked(samples.race_stream(50))
+    def frame():
+        buff = core._PacketBuffer()
+        for data in chunks:
+            view = buff.get_buffer()
+            view[:len(data)] = data # Stands in for socket.recv_into().
+            buff.buffer_updated(len(data))
+            for packet in buff.packets():
+                pass
+    return {'framing.race_stream': frame}
+
+
+def dispatch_cases():
+    cases = {}
+    packet = core._DECODERS[insim_.ISP_MCI](memoryview(samples.mci()))
+    for count in (0, 1, 10):
+        insim = core._InSim()
+        for _ in range(count):
+            insim.bind(insim_.ISP_MCI, lambda insim, packet: None)
+        cases['dispatch.bound_%d' % count] = lambda insim=insim: insim.dispatch(insim_.ISP_MCI, packet)
+    insim = core._InSim()
+    insim.bind(insim_.ISP_MCI, lambda insim, packet: None)
+    data = memoryview(samples.mci())
+    cases['dispatch.handle_insim_packet'] = lambda: insim._handle_insim_packet(data)
+    return cases
+
+
+def outsim_cases():
+    outsim2 = bytearray(insim_.OutSimPack2(0x1ff).pack_s.size)
+    outsim2[0:4] = b'LFST'
+    outsim2 = bytes(outsim2)
+    reused = insim_.OutSimPack2(0x1ff)
+    outsim = bytes(68)
+    outgauge = insim_.OutGaugePack.pack_s.pack(1, b'XRG', 0, 3, 1, *([1.0] * 7 + [0, 0] + [1.0] * 3 + [b'', b''])) + bytes(4)
+    return {
+        'outsim.OutSimPack2': lambda: insim_.OutSimPack2(0x1ff).unpack(outsim2),
+        'outsim.OutSimPack2_reused': lambda: reused.unpack(outsim2),
+        'outsim.OutSimPack': lambda: insim_.OutSimPack().unpack(outsim),
+        'outgauge.OutGaugePack': lambda: insim_.OutGaugePack().unpack(outgauge),
+    }
+
+
+def string_cases():
+    text = LFS_TEXT.decode('latin-1')
+    return {
+        'strmanip.toUnicode': lambda: strmanip.toUnicode(LFS_TEXT),
+        'strmanip.fromUnicode': lambda: strmanip.fromUnicode(UNICODE_TEXT),
+        'func.lfs_color_to_html': lambda: func.lfs_color_to_html(text),
+        'func.stripcols': lambda: func.stripcols(text),
+        'func.stripenc': lambda: func.stripenc(text),
+    }
+
+
+def all_cases():
+    cases = {}
+    for group in (unpack_cases, pack_cases, framing_cases, dispatch_cases, outsim_cases, string_cases):
+        cases.update(group())
+    return cases
+
+
+def measure(case):
+    """Best time of REPEAT runs in nanoseconds per call."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            case()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_TIME:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(MIN_TIME / elapsed) + 1))
+    best = elapsed
+    for _ in range(REPEAT - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            case()
+        best = min(best, time.perf_counter() - start)
+    return best / number * 1e9
+
+
+def run(pattern=None):
+    results = {}
+    errors = {}
+    with open(os.devnull, 'w') as devnull:
+        for name, case in sorted(all_cases().items()):
+            if pattern and pattern not in name:
+                continue
+            try:
+                # IS_AIC.pack() prints the packet.
+                with contextlib.redirect_stdout(devnull):
+                    case()
+                    results[name] = measure(case)
+            except Exception as e:
+                errors[name] = '%s: %s' % (type(e).__name__, e)
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'unit': 'ns/call',
+        'results': results,
+        'errors': errors,
+    }
+
+
+def compare(report, baseline, threshold=THRESHOLD):
+    """Print the change of every case against the baseline and return the
+    names of the cases that regressed."""
+    regressions = []
+    print('%-40s %12s %12s %9s' % ('Case', 'baseline ns', 'current ns', 'change'))
+    for name, ns in sorted(report['results'].items()):
+        base = baseline['results'].get(name)
+        if base is None:
+            print('%-40s %12s %12.0f %9s' % (name, '-', ns, 'new'))
+            continue
+        change = ns / base - 1.0
+        flag = ''
+        if change > threshold:
+            flag = ' REGRESSED'
+            regressions.append(name)
+        print('%-40s %12.0f %12.0f %+8.1f%%%s' % (name, base, ns, change * 100, flag))
+    for name, error in sorted(report['errors'].items()):
+        if name in baseline['results']:
+            regressions.append(name)
+            print('%-40s %12.0f %12s %9s %s' % (name, baseline['results'][name], '-', 'ERROR', error))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the pyinsim benchmark suite.')
+    parser.add_argument('--output', help='file to write the JSON results to')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='slow down that counts as a regression (default %(default)s)')
+    parser.add_argument('--filter', help='only run cases whose name contains this')
+    args = parser.parse_args(argv)
+    report = run(args.filter)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        print('%d regressions' % len(regressions))
+        return 1 if regressions else 0
+    if not args.output:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,23 @@
+"""Example 7: Run InSim on asyncio and iterate over the received packets."""
+
+import pyinsim9 as pyinsim
+from pyinsim9 import aio
+
+def new_connection(insim, ncn):
+    # Bound callbacks work the same as with pyinsim.run().
+    print('New connection:', ncn.UName)
+
+async def main():
+    # Connect and initialize InSim.
+    insim = await aio.insim('127.0.0.1', 29999, Admin=b'')
+    insim.bind(pyinsim.ISP_NCN, new_connection)
+
+    # Request the connection list.
+    insim.send(pyinsim.ISP_TINY, ReqI=255, SubT=pyinsim.TINY_NCN)
+
+    # Loop until the connection is closed.
+    async for packet in insim:
+        print(type(packet).__name__)
+
+# Start pyinsim on uvloop, if it is installed.
+aio.run(main())
@@ -14,7 +14,7 @@ def error(insim):
     traceback.print_exc()
 
 def all(insim, packet):
-    print vars(packet)
+    print dict((k, getattr(packet, k)) for k in packet.__slots__ if hasattr(packet, k))
 
 insim = pyinsim.insim('127.0.0.1', 29999, Admin='')
 
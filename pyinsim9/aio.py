@@ -0,0 +1,504 @@
+# aio.py - asyncio connection engine for pyinsim
+#
+# This software may be used and distributed according to the terms of the
+# GNU Lesser General Public License version 3 or any later version.
+#
+
+# Dependencies
+import asyncio
+import time
+import traceback
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# Libraries
+import pyinsim9.core as core
+from pyinsim9.core import insim_ # pyinsim9.insim is shadowed by core.insim()
+
+__all__ = [
+    'insim',
+    'outgauge',
+    'outsim',
+    'outsim2',
+    'relay',
+    'run',
+]
+
+
+async def insim(host='127.0.0.1', port=29999, ReqI=0, UDPPort=0, Flags=0,
+                Prefix=b'\x00', Interval=0, Admin=b'', IName=b'pyinsim',
+                name=b'localhost', high_water=core._SEND_HIGH_WATER):
+    """Initialize a new InSim connection on the running event loop.
+
+    Args:
+        host - Host IP to connect to.
+        port - Port to connect through.
+        ReqI - Initialization request ID.
+        UDPPort - UDP port to use for MCI and NLP packets.
+        Flags - InSim initialization flags.
+        Prefix - Host command prefix.
+        Interval - Interval between MCI and NLP updates.
+        Admin - LFS game admin password.
+        IName - Short name for your program.
+        name - An optional name for the connection.
+        high_water - Queued bytes at which EVT_PAUSE is dispatched.
+
+    Returns:
+        The connected InSim object.
+
+    """
+    insim = _InSim(name, high_water)
+    await insim._connect(host, port, UDPPort)
+    insim._hello = insim.send(insim_.ISP_ISI,
+               ReqI=ReqI,
+               UDPPort=UDPPort,
+               Flags=Flags,
+               Prefix=Prefix,
+               Interval=Interval,
+               Admin=Admin,
+               IName=IName)
+    return insim
+
+
+async def relay(host='isrelay.lfs.net', port=47474, ReqI=0, HName=b'', Admin=b'',
+                Spec=b'', name=b'localhost', high_water=core._SEND_HIGH_WATER):
+    """Initialize a new InSim relay connection on the running event loop.
+
+    Args:
+        host - The InSim relay host.
+        port - The InSim relay port.
+        ReqI - Initialization request ID.
+        HName - The name of the host to select.
+        Admin - The host admin password.
+        Spec - The host spectator password.
+        name - An optional name for the relay connection.
+        high_water - Queued bytes at which EVT_PAUSE is dispatched.
+
+    Returns:
+        The connected relay host.
+
+    """
+    relay = _InSim(name, high_water)
+    await relay._connect(host, port)
+    if HName:
+        relay._hello = relay.send(insim_.IRP_SEL, ReqI=ReqI, HName=HName, Admin=Admin, Spec=Spec)
+    return relay
+
+
+async def outgauge(host='127.0.0.1', port=30000, callback=None, timeout=30.0, name=b'localhost'):
+    """Initialize a new OutGauge connection on the running event loop.
+
+    Args:
+        host - The host to connect to.
+        port - The port to connect to the host through.
+        callback - An optional function to call when an OutGauge packet is received.
+        timeout - Number of seconds to wait for a packet before timing out.
+        name - An optional name for the connection.
+
+    Returns:
+        The bound OutGauge host.
+
+    """
+    outgauge = _OutSim(name, timeout)
+    await outgauge._connect(host, port)
+    if callback:
+        outgauge.bind(core.EVT_OUTGAUGE, callback)
+    return outgauge
+
+
+async def outsim(host='127.0.0.1', port=30000, callback=None, timeout=30.0, name=b'localhost'):
+    """Initialize a new OutSim connection on the running event loop.
+
+    Args:
+        host - The host to connect to.
+        port - The port to connect to the host through.
+        callback - An optional function to call when an OutSim packet is received.
+        timeout - Number of seconds to wait for a packet before timing out.
+        name - An optional name for the connection.
+
+    Returns:
+        The bound OutSim host.
+
+    """
+    outsim_ = _OutSim(name, timeout)
+    await outsim_._connect(host, port)
+    if callback:
+        outsim_.bind(core.EVT_OUTSIM, callback)
+    return outsim_
+
+
+async def outsim2(host='127.0.0.1', port=30000, callback=None, timeout=30.0, mode=1, name=b'localhost',
+                  reuse=False):
+    """Initialize a new OutSim2 connection on the running event loop.
+
+    Args:
+        host - The host to connect to.
+        port - The port to connect to the host through.
+        callback - An optional function to call when an OutSim packet is received.
+        timeout - Number of seconds to wait for a packet before timing out.
+        mode - The OutSim Opts value set in the LFS cfg.txt.
+        name - An optional name for the connection.
+        reuse - Set true to decode every packet into the same OutSimPack2
+                object, so copy any values you want to keep.
+
+    Returns:
+        The bound OutSim host.
+
+    """
+    outsim_ = _OutSim(name, timeout, mode, reuse)
+    await outsim_._connect(host, port)
+    if callback:
+        outsim_.bind(core.EVT_OUTSIM2, callback)
+    return outsim_
+
+
+def run(main):
+    """Run a coroutine until it completes, using uvloop if it is installed.
+
+    Args:
+        main - The coroutine to run (E.G. your program's main()).
+
+    Returns:
+        The result of the coroutine.
+
+    """
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return asyncio.run(main)
+
+
+class _TcpProtocol(asyncio.BufferedProtocol):
+    """Class to handle a TCP transport."""
+    def __init__(self, dispatch_to, high_water=core._SEND_HIGH_WATER, backlog=None):
+        self._dispatch_to = dispatch_to
+        self._transport = None
+        self._closing = False
+        self._paused = False
+        self._high_water = high_water
+        self._recv_buff = core._PacketBuffer()
+        self._backlog = None
+        if backlog is not None:
+            # Packets sent before the connection is made.
+            self._backlog = core._SendQueue(high_water)
+            self._backlog.limit = backlog
+
+    def __len__(self):
+        return len(self._recv_buff)
+
+    def connection_made(self, transport):
+        self._transport = transport
+        transport.set_write_buffer_limits(high=self._high_water)
+        self._dispatch_to._handle_connect()
+        if self._backlog is not None and not self._closing:
+            self.send_first(b'')
+
+    def connection_lost(self, exc):
+        self._transport = None
+        if self._closing:
+            return
+        if exc is None:
+            self._dispatch_to._handle_close()
+        else:
+            self._dispatch_to._handle_error(exc)
+
+    def get_buffer(self, sizehint):
+        return self._recv_buff.get_buffer(sizehint)
+
+    def buffer_updated(self, nbytes):
+        self._recv_buff.buffer_updated(nbytes)
+        self._dispatch_to._handle_tcp_read()
+
+    def pause_writing(self):
+        self._paused = True
+        self._dispatch_to._handle_pause()
+
+    def resume_writing(self):
+        self._paused = False
+        self._dispatch_to._handle_resume()
+
+    def send(self, *chunks):
+        if self._transport is not None:
+            self._transport.writelines(chunks)
+        elif self._backlog is not None:
+            self._backlog.put(chunks)
+        return not self._paused
+
+    def send_first(self, chunk):
+        # Called once connected, write the chunk and then the backlog.
+        backlog, self._backlog = self._backlog, None
+        if chunk:
+            self._transport.write(chunk)
+        if backlog is not None:
+            self._transport.writelines(backlog.take())
+
+    def take_backlog(self, other):
+        if other._backlog is not None:
+            self._backlog = other._backlog
+
+    def queued(self):
+        if self._transport is None:
+            return 0
+        return self._transport.get_write_buffer_size()
+
+    def close(self):
+        self._closing = True
+        if self._transport is not None:
+            self._transport.close()
+
+    def get_packets(self):
+        return self._recv_buff.packets()
+
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+    """Class to handle a UDP transport."""
+    def __init__(self, dispatch_to, timeout):
+        self._dispatch_to = dispatch_to
+        self._transport = None
+        self._closing = False
+        self._recv_buff = b''
+        self._timeout = timeout
+        self._timer = None
+        self._next_packet = 0.0
+
+    def connection_made(self, transport):
+        self._transport = transport
+        if self._timeout:
+            self._next_packet = time.monotonic() + self._timeout
+            self._timer = asyncio.get_running_loop().call_later(self._timeout, self._check_timeout)
+
+    def connection_lost(self, exc):
+        self._transport = None
+        if self._timer is not None:
+            self._timer.cancel()
+        if not self._closing:
+            self._dispatch_to._handle_close()
+
+    def datagram_received(self, data, addr):
+        self._recv_buff = data
+        try:
+            # Check received packet is multiple of four.
+            if len(data) % 4 > 0:
+                raise core.InSimError('UDP packet not a multiple of four')
+            self._dispatch_to._handle_udp_read()
+        except Exception as exc:
+            self._dispatch_to._handle_error(exc)
+        else:
+            if self._timeout:
+                self._next_packet = time.monotonic() + self._timeout
+
+    def error_received(self, exc):
+        self._dispatch_to._handle_error(exc)
+
+    def _check_timeout(self):
+        # Rescheduled lazily, so a steady packet stream costs no timer churn.
+        remaining = self._next_packet - time.monotonic()
+        if remaining > 0:
+            self._timer = asyncio.get_running_loop().call_later(remaining, self._check_timeout)
+        else:
+            self._timer = None
+            self._dispatch_to._handle_timeout()
+
+    def close(self):
+        self._closing = True
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._transport is not None:
+            self._transport.close()
+
+    def has_packet(self):
+        return bool(self._recv_buff)
+
+    def get_packet(self):
+        return self._recv_buff
+
+
+class _PacketStream(object):
+    """Mixin to iterate over received packets with ``async for``."""
+    _stream_events = ()
+
+    def __aiter__(self):
+        return self._stream()
+
+    async def _stream(self):
+        if self._closed:
+            return
+        queue = asyncio.Queue()
+        def put(conn, packet=None):
+            if packet is None and not conn._closed:
+                return # Dropped, but supervised and reconnecting.
+            queue.put_nowait(packet)
+        ends = (core.EVT_CLOSE, core.EVT_ERROR, core.EVT_TIMEOUT)
+        for evt in self._stream_events + ends:
+            self.bind(evt, put)
+        try:
+            while True:
+                packet = await queue.get()
+                if packet is None:
+                    return
+                yield packet
+        finally:
+            for evt in self._stream_events + ends:
+                self.unbind(evt, put)
+
+
+class _Request(core._Request):
+    """A request that can be awaited for the list of its replies."""
+    def __await__(self):
+        future = asyncio.get_running_loop().create_future()
+        def done(insim, request):
+            if future.done():
+                return
+            if request.error is not None:
+                future.set_exception(request.error)
+            else:
+                future.set_result(request.replies)
+        self.add_callback(done)
+        return future.__await__()
+
+
+class _InSim(_PacketStream, core._InSim):
+    """Class to manage an InSim connection with LFS on an asyncio loop."""
+    _tcp_class = _TcpProtocol
+    _udp_class = _UdpProtocol
+    _request_class = _Request
+    _stream_events = (core.EVT_ALL,)
+
+    def __init__(self, name=b'localhost', high_water=core._SEND_HIGH_WATER):
+        """Create a new InSim object.
+
+        Args:
+            name - An optional name for the connection.
+            high_water - Queued bytes at which EVT_PAUSE is dispatched.
+
+        """
+        core._InSim.__init__(self, name, high_water)
+        self._closed = False
+        self._pump = None
+        self._reconnect_timer = None
+        self._reconnect_task = None
+
+    async def _connect(self, host, port, udpport=0):
+        loop = asyncio.get_running_loop()
+        self.hostaddr = (host, port)
+        await loop.create_connection(lambda: self._tcp, host, port)
+        if udpport:
+            await loop.create_datagram_endpoint(lambda: self._udp, local_addr=(host, udpport))
+
+    def close(self):
+        """Close the InSim connection."""
+        self._closed = True
+        if self._pump is not None:
+            self._pump.cancel()
+            self._pump = None
+        if self._reconnect_timer is not None:
+            self._reconnect_timer.cancel()
+            self._reconnect_timer = None
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        core._InSim.close(self)
+
+    def _schedule_reconnect(self, delay):
+        self._reconnect_timer = asyncio.get_running_loop().call_later(delay, self._handle_reconnect)
+
+    def _handle_reconnect(self):
+        self._reconnect_timer = None
+        self._reconnect_task = asyncio.ensure_future(self._reconnect())
+
+    async def _reconnect(self):
+        try:
+            await asyncio.wait_for(asyncio.get_running_loop().create_connection(lambda: self._tcp, *self.hostaddr),
+                                   core._CONNECT_TIMEOUT)
+        except (OSError, asyncio.TimeoutError):
+            # The protocol was not used, keep it and its backlog for the next attempt.
+            if self._supervisor is not None and not self._closed:
+                self._schedule_reconnect(self._supervisor.next_delay())
+        finally:
+            if self._reconnect_task is asyncio.current_task():
+                self._reconnect_task = None
+
+    def _handle_connect(self):
+        if self._closed:
+            # The attempt completed as the connection was closed.
+            self._tcp.close()
+            return
+        core._InSim._handle_connect(self)
+
+    def _handle_writable(self):
+        # There is no loop polling the scheduler, so wake up when the next
+        # queued packet can be sent.
+        chunks, delay = self._scheduler.get()
+        if delay is not None and self._pump is None and not self._closed:
+            self._pump = asyncio.get_running_loop().call_later(delay, self._handle_pump)
+        return self._tcp.send(*chunks)
+
+    def _watch_request(self, request):
+        if request.deadline is not None:
+            delay = request.deadline - time.monotonic()
+            request._timer = asyncio.get_running_loop().call_later(delay, self._handle_request_timeout, request)
+
+    def _call_later(self, delay, callback):
+        return asyncio.get_running_loop().call_later(delay, callback)
+
+    def _handle_request_timeout(self, request):
+        request._timer = None
+        self._finish_request(request, core.InSimError('Request %d timed out' % request.ReqI))
+
+    def _handle_pump(self):
+        self._pump = None
+        if self._scheduler is not None:
+            self._handle_writable()
+
+    def _handle_error(self, exc=None):
+        if self._supervisor is not None:
+            if self.connected:
+                self._print_error(exc)
+            self._handle_drop(core.EVT_ERROR)
+            return
+        self.close()
+        self.dispatch(core.EVT_ERROR)
+        self._print_error(exc)
+
+    def _print_error(self, exc):
+        if exc is None:
+            traceback.print_exc()
+        else:
+            traceback.print_exception(type(exc), exc, exc.__traceback__)
+
+
+class _OutSim(_PacketStream, core._OutSim):
+    """Class to manage an OutGauge or OutSim connection on an asyncio loop."""
+    _udp_class = _UdpProtocol
+    _stream_events = tuple(set((core.EVT_OUTGAUGE, core.EVT_OUTSIM, core.EVT_OUTSIM2)))
+
+    def __init__(self, name=b'localhost', timeout=0.0, mode=1, reuse=False):
+        """Create a new OutGauge or OutSim object.
+
+        Args:
+            name - An optional name for the connection.
+            reuse - Set true to decode OutSim2 packets into one object.
+
+        """
+        core._OutSim.__init__(self, name, timeout, mode, reuse)
+        self._closed = False
+
+    async def _connect(self, host, port):
+        self.hostaddr = (host, port)
+        await asyncio.get_running_loop().create_datagram_endpoint(lambda: self._udp, local_addr=(host, port))
+
+    def close(self):
+        """Close the connection."""
+        self._closed = True
+        core._OutSim.close(self)
+
+    def _handle_error(self, exc=None):
+        self.close()
+        self.dispatch(core.EVT_ERROR)
+        if exc is None:
+            traceback.print_exc()
+        else:
+            traceback.print_exception(type(exc), exc, exc.__traceback__)
@@ -0,0 +1,243 @@
+# buttons.py - differential button manager for pyinsim
+#
+# This software may be used and distributed according to the terms of the
+# GNU Lesser General Public License version 3 or any later version.
+#
+
+# Libraries
+import pyinsim9.core as core
+import pyinsim9.strmanip as strmanip
+from pyinsim9.core import insim_ # pyinsim9.insim is shadowed by core.insim()
+
+__all__ = [
+    'ButtonManager',
+]
+
+# Constants.
+_MAX_CLICK_ID = 239
+_REQI = 1
+
+
+class ButtonManager(object):
+    """Send buttons to LFS only when they change.
+
+    Buttons are named by a key of the caller's choosing for each UCID and
+    given the lowest ClickID free on the screens they show on, so buttons for
+    UCID 255 (all) never share a ClickID with those for one UCID. set() and remove() queue changes and
+    flush() sends them in one write: an IS_BTN for each button whose text,
+    style or geometry differs from what was last sent, and an IS_BFN
+    BFN_DEL_BTN for each range of ClickIDs removed. show() does the same for
+    the whole set of buttons a UCID should see. IS_BTC and IS_BTT for
+    buttons with a callback are passed to it.
+
+    """
+    def __init__(self, insim, ReqI=_REQI):
+        """Create a new ButtonManager and bind it to a connection.
+
+        Args:
+            insim - The InSim connection.
+            ReqI - The ReqI of the buttons, which IS_BTC and IS_BTT return.
+
+        """
+        self.insim = insim
+        self.ReqI = ReqI
+        self._wanted = {}     # (UCID, ClickID) -> fields to show
+        self._sent = {}       # (UCID, ClickID) -> fields last sent
+        self._pending = set() # (UCID, ClickID) to send
+        self._deleted = set() # (UCID, ClickID) to delete
+        self._ids = {}        # UCID -> {key: ClickID}
+        self._used = {}       # UCID -> set of ClickIDs in use
+        self._callbacks = {}  # (UCID, ClickID) -> (on_click, on_type)
+        self._handlers = ((insim_.ISP_BTC, self._handle_btc), (insim_.ISP_BTT, self._handle_btt),
+                          (insim_.ISP_BFN, self._handle_bfn), (insim_.ISP_CNL, self._handle_cnl),
+                          (core.EVT_INIT, self._handle_init))
+        for evt, callback in self._handlers:
+            insim.bind(evt, callback)
+
+    def close(self):
+        """Unbind the manager from its connection."""
+        for evt, callback in self._handlers:
+            self.insim.unbind(evt, callback)
+
+    def click_id(self, UCID, key):
+        """Get the ClickID of a button, or None."""
+        return self._ids.get(UCID, {}).get(key)
+
+    def set(self, UCID, key, L, T, W, H, Text=b'', BStyle=0, Inst=0, TypeIn=0, on_click=None, on_type=None):
+        """Queue a button to be shown, if it is new or has changed.
+
+        Args:
+            UCID - The connection to show the button to (255 = all).
+            key - Any hashable name for the button, unique for the UCID.
+            L, T, W, H - The position and size, 0 to 200.
+            Text - The button text, unicode strings are encoded for LFS.
+            BStyle - Style flags from ISB_*.
+            Inst - Flags from INST_*.
+            TypeIn - Max characters to type in.
+            on_click - Function called with (insim, btc) when it is clicked.
+            on_type - Function called with (insim, btt) when text is typed.
+
+        Returns:
+            The ClickID of the button.
+
+        """
+        if isinstance(Text, str):
+            Text = strmanip.fromUnicode(Text)
+        ids = self._ids.get(UCID)
+        if ids is None:
+            ids = self._ids[UCID] = {}
+        click_id = ids.get(key)
+        if click_id is None:
+            click_id = ids[key] = self._allocate(UCID)
+        slot = (UCID, click_id)
+        if on_click is not None or on_type is not None:
+            self._callbacks[slot] = (on_click, on_type)
+        else:
+            self._callbacks.pop(slot, None)
+        fields = (Inst, BStyle, TypeIn, L, T, W, H, Text)
+        self._wanted[slot] = fields
+        if self._sent.get(slot) != fields:
+            self._pending.add(slot)
+        else:
+            self._pending.discard(slot)
+        return click_id
+
+    def remove(self, UCID, key):
+        """Queue a button to be deleted.
+
+        Args:
+            UCID - The connection the button was shown to.
+            key - The name of the button.
+
+        """
+        click_id = self._ids.get(UCID, {}).pop(key, None)
+        if click_id is None:
+            return
+        slot = (UCID, click_id)
+        del self._wanted[slot]
+        self._callbacks.pop(slot, None)
+        self._pending.discard(slot)
+        if slot in self._sent:
+            self._deleted.add(slot)
+        self._used[UCID].discard(click_id)
+
+    def show(self, UCID, buttons):
+        """Make a UCID see exactly these buttons and send the changes.
+
+        Args:
+            UCID - The connection to show the buttons to.
+            buttons - Dict of key to a dict of set() arguments.
+
+        """
+        for key in [key for key in self._ids.get(UCID, ()) if key not in buttons]:
+            self.remove(UCID, key)
+        for key, fields in buttons.items():
+            self.set(UCID, key, **fields)
+        self.flush()
+
+    def clear(self, UCID):
+        """Queue every button of a UCID to be deleted."""
+        for key in list(self._ids.get(UCID, ())):
+            self.remove(UCID, key)
+
+    def flush(self):
+        """Send the queued changes.
+
+        Returns:
+            The number of packets sent.
+
+        """
+        packets = self._deletions()
+        sent = self._sent
+        for slot in self._pending:
+            fields = self._wanted[slot]
+            Inst, BStyle, TypeIn, L, T, W, H, Text = fields
+            packets.append(insim_.IS_BTN(ReqI=self.ReqI, UCID=slot[0], ClickID=slot[1], Inst=Inst, BStyle=BStyle,
+                                         TypeIn=TypeIn, L=L, T=T, W=W, H=H, Text=Text))
+            sent[slot] = fields
+        self._pending.clear()
+        if packets:
+            self.insim.sendp(*packets)
+        return len(packets)
+
+    def _allocate(self, UCID):
+        # LFS has one set of ClickIDs per screen, shared by the buttons sent to
+        # that UCID and to 255, so a 255 button needs an ID no UCID uses.
+        used = self._used.setdefault(UCID, set())
+        shared = set().union(*self._used.values()) if UCID == 255 else self._used.get(255, ())
+        for click_id in range(_MAX_CLICK_ID + 1):
+            if click_id not in used and click_id not in shared:
+                break
+        else:
+            raise core.InSimError('No free ClickID for UCID %d' % UCID)
+        used.add(click_id)
+        # A ClickID reused before the flush is overwritten rather than deleted.
+        self._deleted.discard((UCID, click_id))
+        return click_id
+
+    def _deletions(self):
+        # Delete each run of ClickIDs with one IS_BFN, running over IDs that
+        # show nothing on the screens it reaches so runs separated only by
+        # gaps are joined.
+        packets = []
+        by_ucid = {}
+        for ucid, click_id in self._deleted:
+            by_ucid.setdefault(ucid, []).append(click_id)
+            del self._sent[(ucid, click_id)]
+        self._deleted.clear()
+        for ucid, click_ids in by_ucid.items():
+            if ucid == 255:
+                shown = set(click_id for slot_ucid, click_id in self._sent)
+            else:
+                shown = set(click_id for slot_ucid, click_id in self._sent if slot_ucid in (ucid, 255))
+            click_ids.sort()
+            start = end = click_ids[0]
+            for click_id in click_ids[1:]:
+                if any(i in shown for i in range(end + 1, click_id)):
+                    packets.append(insim_.IS_BFN(SubT=insim_.BFN_DEL_BTN, UCID=ucid, ClickID=start, ClickMax=end))
+                    start = click_id
+                end = click_id
+            packets.append(insim_.IS_BFN(SubT=insim_.BFN_DEL_BTN, UCID=ucid, ClickID=start, ClickMax=end))
+        return packets
+
+    def _forget(self, UCID):
+        # LFS no longer shows the buttons, send them again on the next flush.
+        for slot in [slot for slot in self._sent if slot[0] == UCID]:
+            del self._sent[slot]
+        self._deleted = set(slot for slot in self._deleted if slot[0] != UCID)
+        self._pending.update(slot for slot in self._wanted if slot[0] == UCID)
+
+    def _callback(self, packet, index):
+        callbacks = self._callbacks.get((packet.UCID, packet.ClickID))
+        if callbacks is None:
+            callbacks = self._callbacks.get((255, packet.ClickID))
+        if callbacks is not None and callbacks[index] is not None:
+            callbacks[index](self.insim, packet)
+
+    def _handle_btc(self, insim, btc):
+        if btc.ReqI == self.ReqI:
+            self._callback(btc, 0)
+
+    def _handle_btt(self, insim, btt):
+        if btt.ReqI == self.ReqI:
+            self._callback(btt, 1)
+
+    def _handle_bfn(self, insim, bfn):
+        if bfn.SubT == insim_.BFN_USER_CLEAR:
+            self._forget(bfn.UCID)
+
+    def _handle_cnl(self, insim, cnl):
+        # LFS drops the buttons of a connection that leaves.
+        UCID = cnl.UCID
+        self._forget(UCID)
+        for click_id in self._ids.pop(UCID, {}).values():
+            slot = (UCID, click_id)
+            del self._wanted[slot]
+            self._callbacks.pop(slot, None)
+            self._pending.discard(slot)
+        self._used.pop(UCID, None)
+
+    def _handle_init(self, insim):
+        self._sent.clear()
+        self._deleted.clear()
+        self._pending = set(self._wanted)
@@ -6,14 +6,25 @@
 # GNU Lesser General Public License version 3 or any later version.
 #
 
-import asyncore
 # Dependencies
+import collections
+import errno
+import itertools
+import os
+import random
 import socket
 import threading
 import time
 import traceback
 
+try:
+    import asyncore
+except ImportError:
+    # Removed in Python 3.12, only the pyinsim9.aio engine is available there.
+    asyncore = None
+
 # Libraries
+import pyinsim9.decoders as decoders
 import pyinsim9.insim as insim_
 
 __all__ = [
@@ -24,9 +35,14 @@ __all__ = [
     'EVT_OUTGAUGE',
     'EVT_OUTSIM',
     'EVT_OUTSIM2',
+    'EVT_PAUSE',
+    'EVT_RESUME',
     'EVT_TIMEOUT',
     'INSIM_VERSION',
     'InSimError',
+    'PRIORITY_COSMETIC',
+    'PRIORITY_CONTROL',
+    'PRIORITY_RACE',
     'PYINSIM_VERSION',
     'closeall',
     'insim',
@@ -46,11 +62,26 @@ __all__ = [
 PYINSIM_VERSION = '3.1.0'
 INSIM_VERSION = 9
 _TCP_BUFFER_SIZE = 4096
+_TCP_RING_SIZE = 65536
+_SEND_HIGH_WATER = 65536
+_SEND_JOIN_SIZE = 65536
+_IOV_MAX = os.sysconf('SC_IOV_MAX') if hasattr(os, 'sysconf') else 1024
+_DISCONNECTED = frozenset((errno.ECONNRESET, errno.ENOTCONN, errno.ESHUTDOWN,
+                           errno.ECONNABORTED, errno.EPIPE, errno.EBADF))
+_WOULDBLOCK = frozenset((errno.EWOULDBLOCK, errno.EAGAIN))
 _UDP_BUFFER_SIZE = 1024
+_SCHEDULER_BUDGET = 1000
+_REQUEST_TIMEOUT = 10.0
+_RECONNECT_DELAY = 1.0
+_RECONNECT_MAX_DELAY = 60.0
+_CONNECT_TIMEOUT = 10.0
+_REQUEST_REQI = range(0x80, 0xfd) # 0xfd and 0xfe are used by pyinsim9.state and pyinsim9.timing.
 _TIMEOUT = 0.05
 _OUTGAUGE_SIZE = (92, 96)
 _OUTSIM_SIZE = (64, 68)
 _OUTSIM2_HEADER = b'LFST'
+_CHANNEL_TCP = 1 # Recorder channels, see pyinsim9.replay.
+_CHANNEL_UDP = 2
 _PACKET_MAP = {
     insim_.ISP_ISI: insim_.IS_ISI,
     insim_.ISP_VER: insim_.IS_VER,
@@ -128,6 +159,7 @@ _PACKET_MAP = {
     insim_.ISP_AIC: insim_.IS_AIC,
     insim_.ISP_AII: insim_.IS_AII,
 }
+_DECODERS = decoders.compile_decoders(_PACKET_MAP)
 
 
 # Event constants.
@@ -139,6 +171,70 @@ EVT_OUTGAUGE = 260
 EVT_OUTSIM = 261
 EVT_TIMEOUT = 262
 EVT_OUTSIM2 = 261
+EVT_PAUSE = 263
+EVT_RESUME = 264
+
+
+# Send priority constants.
+PRIORITY_CONTROL = 0
+PRIORITY_RACE = 1
+PRIORITY_COSMETIC = 2
+_PRIORITIES = {
+    insim_.ISP_MTC: PRIORITY_RACE,
+    insim_.ISP_MSX: PRIORITY_RACE,
+    insim_.ISP_MSL: PRIORITY_RACE,
+    insim_.ISP_BFN: PRIORITY_COSMETIC,
+    insim_.ISP_BTN: PRIORITY_COSMETIC,
+}
+
+
+# Request completion rules.
+def _first_reply(request, packet):
+    return True
+
+def _all_connections(request, packet):
+    return len(request.replies) >= packet.Total
+
+def _file_end(request, packet):
+    return bool(packet.PMOFlags & insim_.PMO_FILE_END)
+
+def _last_host(request, packet):
+    return any(host.Flags & insim_.HOS_LAST for host in packet.Info)
+
+# Request (type, subtype) -> (reply types, rule). Requests to LFS are also
+# complete when the TINY_REPLY to a TINY_PING sent after them arrives, as
+# LFS sends the replies to each packet before reading the next.
+_REQUESTS = {
+    (insim_.ISP_ISI, None): ((insim_.ISP_VER,), _first_reply),
+    (insim_.ISP_TINY, insim_.TINY_VER): ((insim_.ISP_VER,), _first_reply),
+    (insim_.ISP_TINY, insim_.TINY_PING): ((), None),
+    (insim_.ISP_TINY, insim_.TINY_SCP): ((insim_.ISP_CPP,), _first_reply),
+    (insim_.ISP_TINY, insim_.TINY_SST): ((insim_.ISP_STA,), _first_reply),
+    (insim_.ISP_TINY, insim_.TINY_GTH): ((insim_.ISP_SMALL,), _first_reply),
+    (insim_.ISP_TINY, insim_.TINY_ISM): ((insim_.ISP_ISM,), _first_reply),
+    (insim_.ISP_TINY, insim_.TINY_NCN): ((insim_.ISP_NCN,), _all_connections),
+    (insim_.ISP_TINY, insim_.TINY_NPL): ((insim_.ISP_NPL,), None),
+    (insim_.ISP_TINY, insim_.TINY_RES): ((insim_.ISP_RES,), None),
+    (insim_.ISP_TINY, insim_.TINY_NLP): ((insim_.ISP_NLP,), _first_reply),
+    (insim_.ISP_TINY, insim_.TINY_MCI): ((insim_.ISP_MCI,), None),
+    (insim_.ISP_TINY, insim_.TINY_REO): ((insim_.ISP_REO,), _first_reply),
+    (insim_.ISP_TINY, insim_.TINY_RST): ((insim_.ISP_RST,), _first_reply),
+    (insim_.ISP_TINY, insim_.TINY_AXI): ((insim_.ISP_AXI,), _first_reply),
+    (insim_.ISP_TINY, insim_.TINY_RIP): ((insim_.ISP_RIP,), _first_reply),
+    (insim_.ISP_TINY, insim_.TINY_NCI): ((insim_.ISP_NCI,), None),
+    (insim_.ISP_TINY, insim_.TINY_ALC): ((insim_.ISP_SMALL,), _first_reply),
+    (insim_.ISP_TINY, insim_.TINY_AXM): ((insim_.ISP_AXM,), _file_end),
+    (insim_.ISP_TINY, insim_.TINY_SLC): ((insim_.ISP_SLC,), None),
+    (insim_.ISP_TINY, insim_.TINY_MAL): ((insim_.ISP_MAL,), _first_reply),
+    (insim_.ISP_TINY, insim_.TINY_PLH): ((insim_.ISP_PLH,), _first_reply),
+    (insim_.ISP_TINY, insim_.TINY_IPB): ((insim_.ISP_IPB,), _first_reply),
+    (insim_.ISP_RIP, None): ((insim_.ISP_RIP,), _first_reply),
+    (insim_.ISP_SSH, None): ((insim_.ISP_SSH,), _first_reply),
+    (insim_.ISP_TTC, insim_.TTC_SEL): ((insim_.ISP_AXM,), _first_reply),
+    (insim_.IRP_HLR, None): ((insim_.IRP_HOS,), _last_host),
+    (insim_.IRP_SEL, None): ((insim_.ISP_VER, insim_.IRP_ERR), _first_reply),
+    (insim_.IRP_ARQ, None): ((insim_.IRP_ARP,), _first_reply),
+}
 
 
 class InSimError(Exception):
@@ -148,7 +244,7 @@ class InSimError(Exception):
 
 def insim(host='127.0.0.1', port=29999, ReqI=0, UDPPort=0, Flags=0, 
           Prefix=b'\x00', Interval=0, Admin=b'', IName=b'pyinsim', 
-          name=b'localhost'):
+          name=b'localhost', high_water=_SEND_HIGH_WATER):
     """Initialize a new InSim connection.
     
     Args:
@@ -162,14 +258,15 @@ def insim(host='127.0.0.1', port=29999, ReqI=0, UDPPort=0, Flags=0,
         Admin - LFS game admin password.
         IName - Short name for your program.
         name - An optional name for the connection.        
+        high_water - Queued bytes at which EVT_PAUSE is dispatched.
     
     Returns:
         An initialized InSim object.
     
     """
-    insim = _InSim(name)
+    insim = _InSim(name, high_water)
     insim._connect(host, port, UDPPort)
-    insim.send(insim_.ISP_ISI,
+    insim._hello = insim.send(insim_.ISP_ISI,
                ReqI=ReqI,
                UDPPort=UDPPort, 
                Flags=Flags, 
@@ -181,7 +278,7 @@ def insim(host='127.0.0.1', port=29999, ReqI=0, UDPPort=0, Flags=0,
 
     
 def relay(host='isrelay.lfs.net', port=47474, ReqI=0, HName=b'', Admin=b'', 
-          Spec=b'', name=b'localhost'):
+          Spec=b'', name=b'localhost', high_water=_SEND_HIGH_WATER):
     """Initialize a new InSim relay connection.
     
     Args:
@@ -192,15 +289,16 @@ def relay(host='isrelay.lfs.net', port=47474, ReqI=0, HName=b'', Admin=b'',
         Admin - The host admin password.
         Spec - The host spectator password.
         name - An optional name for the relay connection.
+        high_water - Queued bytes at which EVT_PAUSE is dispatched.
     
     Returns:
         An initialized relay host.
     
     """
-    relay = _InSim(name)
+    relay = _InSim(name, high_water)
     relay._connect(host, port)
     if HName:
-        relay.send(insim_.IRP_SEL, ReqI=ReqI, HName=HName, Admin=Admin, Spec=Spec)
+        relay._hello = relay.send(insim_.IRP_SEL, ReqI=ReqI, HName=HName, Admin=Admin, Spec=Spec)
     return relay
     
 
@@ -246,7 +344,7 @@ def outsim(host='127.0.0.1', port=30000, callback=None, timeout=30.0, name=b'loc
     return outsim_
 
 
-def outsim2(host='127.0.0.1', port=30000, callback=None, timeout=30.0, mode=1, name=b'localhost'):
+def outsim2(host='127.0.0.1', port=30000, callback=None, timeout=30.0, mode=1, name=b'localhost', reuse=False):
     """Initialize a new OutSim connection.
 
     Args:
@@ -255,12 +353,14 @@ def outsim2(host='127.0.0.1', port=30000, callback=None, timeout=30.0, mode=1, n
         callback - An optional function to call when an OutSim packet is received.
         timeout - Number of seconds to wait for a packet before timing out.
         name - An optional name for the connection.
+        reuse - Set true to decode every packet into the same OutSimPack2
+                object, so copy any values you want to keep.
 
     Returns:
         An initialized OutSim host.
 
     """
-    outsim_ = _OutSim(name, timeout, mode)
+    outsim_ = _OutSim(name, timeout, mode, reuse)
     outsim_._connect(host, port)
     if callback:
         outsim_.bind(EVT_OUTSIM2, callback)
@@ -307,6 +407,8 @@ def run(background=False):
         background - Set true to run the loop in a background thread (for use in GUI app).
     
     """
+    if asyncore is None:
+        raise InSimError('asyncore is not available, use pyinsim9.aio.run() instead')
     if background:
         threading.Thread(target=asyncore.loop, args=[_TIMEOUT], name='pyinsim').start()
     else:
@@ -315,64 +417,447 @@ def run(background=False):
 
 def isrunning():
     """Determin if pyinsim is running."""
-    return bool(asyncore.socket_map)
+    return asyncore is not None and bool(asyncore.socket_map)
 
 
 def closeall():
     """Close all open connections."""
-    asyncore.close_all(ignore_all=True)
+    if asyncore is not None:
+        asyncore.close_all(ignore_all=True)
+
+
+class _PacketBuffer(object):
+    """Preallocated receive buffer that frames TCP packets in place.
+    
+    Data is read straight into the free tail of the buffer and packets are
+    yielded as memoryviews over it, so only the bytes of an incomplete
+    packet are ever moved (when the tail runs out of room).
+    
+    """
+    def __init__(self, size=_TCP_RING_SIZE):
+        """Create a new _PacketBuffer object.
+        
+        Args:
+            size - The initial size of the buffer in bytes.
+        
+        """
+        self._buff = bytearray(size)
+        self._view = memoryview(self._buff)
+        self._start = 0
+        self._end = 0
+        self.copied = 0
+        
+    def __len__(self):
+        return self._end - self._start
+        
+    def get_buffer(self, sizehint=_TCP_BUFFER_SIZE):
+        """Get a writable view of the free space at the end of the buffer.
+        
+        Args:
+            sizehint - The minimum number of free bytes wanted.
+        
+        Returns:
+            A writable memoryview.
+        
+        """
+        sizehint = max(sizehint, _TCP_BUFFER_SIZE)
+        if len(self._buff) - self._end < sizehint:
+            self._compact(sizehint)
+        return self._view[self._end:]
+        
+    def buffer_updated(self, nbytes):
+        """Commit bytes written into the view from get_buffer()."""
+        self._end += nbytes
+        
+    def _compact(self, sizehint):
+        pending = self._end - self._start
+        if pending + sizehint > len(self._buff):
+            # Views handed out earlier keep the old buffer alive, so grow into
+            # a new one instead of resizing in place.
+            buff = bytearray(max(len(self._buff) * 2, pending + sizehint))
+            buff[:pending] = self._view[self._start:self._end]
+            self._buff = buff
+            self._view = memoryview(buff)
+        else:
+            self._view[:pending] = self._view[self._start:self._end]
+        self.copied += pending
+        self._start = 0
+        self._end = pending
+        
+    def packets(self):
+        """Yield each complete packet in the buffer as a memoryview. The views 
+        are only valid until the next call to get_buffer()."""
+        buff = self._buff
+        view = self._view
+        while self._end > self._start:
+            start = self._start
+            size = buff[start] * 4
+            if not size:
+                raise InSimError('TCP packet size is zero')
+            if self._end - start < size:
+                break
+            self._start = start + size
+            yield view[start:start + size]
+        if self._start == self._end:
+            self._start = self._end = 0
+            
+            
+class _SendQueue(object):
+    """Queue of outgoing data chunks, flushed with one vectored send."""
+    def __init__(self, high_water=_SEND_HIGH_WATER):
+        """Create a new _SendQueue object.
+        
+        Args:
+            high_water - Queued bytes above which the queue is paused.
+        
+        """
+        self._chunks = collections.deque()
+        self.high_water = high_water
+        self.low_water = high_water // 4
+        self.limit = None
+        self.paused = False
+        self.size = 0
+        self.queued = 0
+        self.sent = 0
+        self.dropped = 0
+        
+    def __len__(self):
+        return self.size
+        
+    def put(self, chunks):
+        """Add chunks of data to the end of the queue.
+        
+        Returns:
+            True if the queue has just gone over its high-water mark.
+        
+        """
+        self._chunks.extend(chunks)
+        nbytes = sum(map(len, chunks))
+        self.size += nbytes
+        self.queued += nbytes
+        if self.limit is not None and self.size > self.limit:
+            self._trim()
+        if not self.paused and self.size >= self.high_water:
+            self.paused = True
+            return True
+        return False
+        
+    def push(self, chunk):
+        """Add a chunk of data to the front of the queue, before any is sent."""
+        self._chunks.appendleft(chunk)
+        self.size += len(chunk)
+        self.queued += len(chunk)
+        
+    def take(self):
+        """Remove and return every queued chunk."""
+        chunks = list(self._chunks)
+        self._chunks.clear()
+        self.size = 0
+        return chunks
+        
+    def _trim(self):
+        # Drop the oldest packets until the queue is within its limit. Only
+        # used before connecting, so no chunk has been partly sent.
+        chunks = self._chunks
+        while self.size > self.limit and chunks:
+            self.size -= len(chunks.popleft())
+            self.dropped += 1
+        
+    def flush(self, sock):
+        """Send as much queued data as the socket will take.
+        
+        Returns:
+            True if the queue has just drained below its low-water mark.
+        
+        """
+        if hasattr(sock, 'sendmsg'):
+            sent = sock.sendmsg(list(itertools.islice(self._chunks, _IOV_MAX)))
+        else:
+            data = []
+            nbytes = 0
+            for chunk in self._chunks:
+                data.append(chunk)
+                nbytes += len(chunk)
+                if nbytes >= _SEND_JOIN_SIZE:
+                    break
+            sent = sock.send(b''.join(data))
+        self._consume(sent)
+        if self.paused and self.size <= self.low_water:
+            self.paused = False
+            return True
+        return False
+        
+    def _consume(self, sent):
+        self.size -= sent
+        self.sent += sent
+        chunks = self._chunks
+        while sent:
+            size = len(chunks[0])
+            if size > sent:
+                chunks[0] = memoryview(chunks[0])[sent:]
+                break
+            chunks.popleft()
+            sent -= size
+            
+            
+class _Scheduler(object):
+    """Rate limit for the packets sent on one connection.
+
+    A token bucket refilled at rate packets a second lets through bursts of
+    up to burst packets. Packets it holds back wait in a queue for each
+    priority and go out control first, then race messages, then buttons. A
+    queued IS_BTN is replaced by a newer one for the same UCID and ClickID,
+    and dropped when an IS_BFN deletes it. Once more than budget packets
+    are waiting, the oldest queued IS_BTN are dropped.
+
+    Attributes:
+        rate - Packets sent a second.
+        burst - Packets that can be sent at once after a pause.
+        budget - Queued packets above which buttons are dropped.
+        depth - List of the number of packets queued for each priority.
+        sent - Packets sent.
+        coalesced - Buttons replaced or deleted while queued.
+        dropped - Buttons dropped for being over budget.
+
+    """
+    def __init__(self, rate, burst, budget, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.budget = budget
+        self.clock = clock
+        self.depth = [0, 0, 0]
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self._tokens = float(burst)
+        self._stamp = clock()
+        self._queues = (collections.deque(), collections.deque(), collections.deque())
+        self._buttons = {} # (UCID, ClickID) -> queued entry
+        
+    def __len__(self):
+        return sum(self.depth)
+        
+    def put(self, packet, priority=None):
+        """Queue a packet.
+        
+        Args:
+            packet - The packet to send.
+            priority - One of PRIORITY_*, by default from the packet type.
+        
+        """
+        ptype = packet.Type
+        if priority is None:
+            priority = _PRIORITIES.get(ptype, PRIORITY_CONTROL)
+        data = packet.pack()
+        key = None
+        if ptype == insim_.ISP_BTN:
+            key = (packet.UCID, packet.ClickID)
+            entry = self._buttons.get(key)
+            if entry is not None:
+                entry[1] = data
+                self.coalesced += 1
+                return
+        elif ptype == insim_.ISP_BFN and self._buttons:
+            if packet.SubT == insim_.BFN_DEL_BTN:
+                last = max(packet.ClickID, packet.ClickMax)
+                self._cancel(lambda ucid, click_id: ucid == packet.UCID and packet.ClickID <= click_id <= last)
+            elif packet.SubT == insim_.BFN_CLEAR:
+                self._cancel(lambda ucid, click_id: ucid == packet.UCID or packet.UCID == 255)
+        entry = [key, data, priority]
+        self._queues[priority].append(entry)
+        self.depth[priority] += 1
+        if key is not None:
+            self._buttons[key] = entry
+        if len(self) > self.budget:
+            self._drop()
+            
+    def _cancel(self, match):
+        for key in [key for key in self._buttons if match(*key)]:
+            entry = self._buttons.pop(key)
+            entry[1] = None
+            self.depth[entry[2]] -= 1
+            self.coalesced += 1
+            
+    def _drop(self):
+        # Drop the oldest buttons, whichever queue they were put in.
+        excess = len(self) - self.budget
+        for queue in reversed(self._queues):
+            for entry in queue:
+                if excess <= 0:
+                    return
+                if entry[0] is not None and entry[1] is not None:
+                    del self._buttons[entry[0]]
+                    entry[1] = None
+                    self.depth[entry[2]] -= 1
+                    self.dropped += 1
+                    excess -= 1
+                    
+    def get(self, flush=False):
+        """Take the packets the rate limit allows to be sent now.
+        
+        Args:
+            flush - Set to True to take every queued packet.
+        
+        Returns:
+            A tuple of the list of packed packets and the seconds until the
+            next one can be sent, or None if nothing is left queued.
+        
+        """
+        now = self.clock()
+        if flush:
+            tokens = float('inf')
+        else:
+            tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+        chunks = []
+        for queue in self._queues:
+            while queue and tokens >= 1:
+                key, data, priority = queue.popleft()
+                if data is None:
+                    continue
+                if key is not None:
+                    del self._buttons[key]
+                self.depth[priority] -= 1
+                chunks.append(data)
+                tokens -= 1
+            # Skip over cancelled packets, so the queue is not held up by them.
+            while queue and queue[0][1] is None:
+                queue.popleft()
+        self._tokens = min(tokens, self.burst)
+        self.sent += len(chunks)
+        if not len(self):
+            return chunks, None
+        return chunks, (1 - tokens) / self.rate
+        
+        
+def _backoff(delay, max_delay, attempts):
+    # Double the delay after each failure up to max_delay, and cut each wait
+    # by a random amount of up to half, so connections dropped by the same
+    # host restart do not all come back at once.
+    return min(max_delay, delay * 2 ** min(attempts, 32)) * random.uniform(0.5, 1.0)
+    
+    
+class _Supervisor(object):
+    """Reconnect schedule of a supervised connection.
+    
+    Attributes:
+        delay - Seconds before the first attempt.
+        max_delay - Most seconds between attempts.
+        backlog - Bytes of packets kept while disconnected.
+        backoff - Function of the failed attempts giving the seconds to wait,
+                  or None for the jittered exponential backoff.
+        attempts - Attempts since the connection last received a packet.
+        reconnects - The number of times the connection has come back.
+    
+    """
+    def __init__(self, delay, max_delay, backlog, backoff=None):
+        self.delay = delay
+        self.max_delay = max_delay
+        self.backlog = backlog
+        self.backoff = backoff
+        self.attempts = 0
+        self.reconnects = 0
+        
+    def next_delay(self):
+        """Get the seconds to wait before the next attempt."""
+        if self.backoff is not None:
+            delay = self.backoff(self.attempts)
+        else:
+            delay = _backoff(self.delay, self.max_delay, self.attempts)
+        self.attempts += 1
+        return delay
+        
+        
+_dispatcher = asyncore.dispatcher if asyncore is not None else object
 
 
-class _TcpSocket(asyncore.dispatcher):
+class _TcpSocket(_dispatcher):
     """Class to handle a TCP socket."""
-    def __init__(self, dispatch_to):
+    def __init__(self, dispatch_to, high_water=_SEND_HIGH_WATER, backlog=None):
         asyncore.dispatcher.__init__(self)
         self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
         self._dispatch_to = dispatch_to
-        self._send_buff = b''
-        self._recv_buff = b''
+        self._send_buff = _SendQueue(high_water)
+        self._send_buff.limit = backlog
+        self._recv_buff = _PacketBuffer()
         
     def __len__(self):
         return len(self._recv_buff)
         
     def handle_connect(self):
+        self._send_buff.limit = None
         self._dispatch_to._handle_connect()
     
     def handle_close(self):
         self._dispatch_to._handle_close()
         
-    def send(self, data):
-        self._send_buff += data
+    def send(self, *chunks):
+        if self._send_buff.put(chunks):
+            self._dispatch_to._handle_pause()
+        return not self._send_buff.paused
+        
+    def send_first(self, chunk):
+        self._send_buff.push(chunk)
+        
+    def take_backlog(self, other):
+        self._send_buff = other._send_buff
+        
+    def queued(self):
+        return self._send_buff.size
         
     def writable(self):
+        if self._dispatch_to._scheduler is not None:
+            self._dispatch_to._handle_writable()
+        if not self.connected:
+            # Waiting to reconnect, or for the connection to complete.
+            return self.connecting
         return bool(self._send_buff)
     
     def handle_write(self):
-        sent = asyncore.dispatcher.send(self, self._send_buff)
-        self._send_buff = self._send_buff[sent:]
+        try:
+            resumed = self._send_buff.flush(self.socket)
+        except OSError as why:
+            if why.errno in _WOULDBLOCK:
+                return
+            if why.errno in _DISCONNECTED:
+                self.handle_close()
+                return
+            raise
+        if resumed:
+            self._dispatch_to._handle_resume()
+        
+    def readable(self):
+        dispatch_to = self._dispatch_to
+        if dispatch_to._requests or dispatch_to._timers or dispatch_to._reconnect_at is not None:
+            dispatch_to._handle_timers()
+        return self.connected or self.connecting
         
     def handle_read(self):
-        data = self.recv(_TCP_BUFFER_SIZE)
-        if data:
-            self._recv_buff += data
+        nbytes = self.recv_into(self._recv_buff.get_buffer())
+        if nbytes:
+            self._recv_buff.buffer_updated(nbytes)
             self._dispatch_to._handle_tcp_read()
             
+    def recv_into(self, buffer):
+        try:
+            nbytes = self.socket.recv_into(buffer)
+        except OSError as why:
+            if why.errno in _DISCONNECTED:
+                self.handle_close()
+                return 0
+            raise
+        if not nbytes:
+            self.handle_close()
+        return nbytes
+            
     def handle_error(self):
         self._dispatch_to._handle_error()
         
     def get_packets(self):
-        while self._recv_buff and len(self._recv_buff) >= self._recv_buff[0]*4:
-            size = self._recv_buff[0]*4
-            
-            # Check size is multiple of four.
-            #if size % 4 > 0:
-            #    raise InSimError('TCP packet size not a multiple of four')
-                    
-            yield self._recv_buff[:size]
-            self._recv_buff = self._recv_buff[size:]
+        return self._recv_buff.packets()
         
 
-class _UdpSocket(asyncore.dispatcher):
+class _UdpSocket(_dispatcher):
     """Class to handle a UDP socket."""
     def __init__(self, dispatch_to, timeout):
         asyncore.dispatcher.__init__(self)
@@ -437,6 +922,7 @@ class _Binding(object):
             self._callbacks[evt].append(callback)
         else:
             self._callbacks[evt] = [callback]
+        self._rebind()
         
     def unbind(self, evt, callback):
         """Unbind an event callback.
@@ -450,6 +936,7 @@ class _Binding(object):
             self._callbacks[evt].remove(callback)
             if not self._callbacks[evt]:
                 del self._callbacks[evt]
+            self._rebind()
                 
     def isbound(self, evt, callback):
         """Determin if an event callback has been bound.
@@ -474,24 +961,118 @@ class _Binding(object):
         """
         callbacks = self._callbacks.get(evt)
         if callbacks:
-            [c(self, *args) for c in callbacks]  
+            for c in callbacks:
+                c(self, *args)
+                
+    def _rebind(self):
+        # Called after the bound callbacks change.
+        pass
             
         
+class _Timer(object):
+    """A function to call later, from _InSim._call_later()."""
+    def __init__(self, when, callback):
+        self.when = when
+        self.callback = callback
+        self.cancelled = False
+        
+    def cancel(self):
+        """Stop the function from being called."""
+        self.cancelled = True
+        
+        
+class _Request(object):
+    """A request sent to InSim and the replies to it.
+    
+    Attributes:
+        ReqI - The ReqI allocated to the request.
+        packet - The packet that was sent.
+        replies - List of the replies received so far.
+        done - True once the request has completed, failed or been cancelled.
+        error - None, or an InSimError if the request timed out or the
+                connection closed first.
+    
+    """
+    def __init__(self, insim, packet, types, rule, timeout):
+        self.insim = insim
+        self.ReqI = packet.ReqI
+        self.packet = packet
+        self.replies = []
+        self.done = False
+        self.error = None
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self._types = types
+        self._rule = rule
+        self._callbacks = []
+        self._timer = None
+        
+    def add_callback(self, callback):
+        """Add a function to call with (insim, request) when the request is
+        done, or call it now if it already is."""
+        if self.done:
+            callback(self.insim, self)
+        else:
+            self._callbacks.append(callback)
+            
+    def cancel(self):
+        """Stop waiting for replies, without calling the callbacks."""
+        if not self.done:
+            self._callbacks = []
+            self.insim._finish_request(self)
+            
+    def _handle_reply(self, packet):
+        # Returns True once the request is complete.
+        ptype = packet.Type
+        if ptype == insim_.ISP_TINY and packet.SubT == insim_.TINY_REPLY:
+            if self.packet.Type == insim_.ISP_TINY and self.packet.SubT == insim_.TINY_PING:
+                self.replies.append(packet)
+            return True
+        if self._types is not None and ptype not in self._types:
+            return False
+        self.replies.append(packet)
+        return self._rule is not None and self._rule(self, packet)
+        
+    def _complete(self, error=None):
+        self.done = True
+        self.error = error
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self.insim, self)
+            
+            
 class _InSim(_Binding):
     """Class to manage an InSim connection with LFS."""
-    def __init__(self, name=b'localhost'):
+    _tcp_class = _TcpSocket
+    _udp_class = _UdpSocket
+    _request_class = _Request
+
+    def __init__(self, name=b'localhost', high_water=_SEND_HIGH_WATER):
         """Create a new InSim object.
         
         Args:
             name - An optional name for the connection.
+            high_water - Queued bytes at which EVT_PAUSE is dispatched.
         
         """
         _Binding.__init__(self)
         self.name = name
         self.hostaddr = ()
         self.connected = False
-        self._tcp = _TcpSocket(dispatch_to=self)
-        self._udp = _UdpSocket(dispatch_to=self, timeout=0)
+        self._high_water = high_water
+        self._tcp = self._tcp_class(dispatch_to=self, high_water=high_water)
+        self._udp = self._udp_class(dispatch_to=self, timeout=0)
+        self._decoders = _DECODERS
+        self._dispatch_table = [()] * 256
+        self._scheduler = None
+        self._requests = {}
+        self._next_reqi = 0
+        self._next_deadline = None
+        self._supervisor = None
+        self._hello = None
+        self._dropped = False
+        self._reconnect_at = None
+        self._timers = []
+        self.recorder = None
             
     def _connect(self, host, port, udpport=0):
         self.hostaddr = (host, port)
@@ -502,8 +1083,39 @@ class _InSim(_Binding):
     def close(self):
         """Close the InSim connection."""
         self.connected = False
+        self._supervisor = None
+        self._reconnect_at = None
+        self._timers = []
         self._tcp.close()
         self._udp.close()
+        self._fail_requests()
+        
+    def supervise(self, delay=_RECONNECT_DELAY, max_delay=_RECONNECT_MAX_DELAY, backlog=_SEND_HIGH_WATER,
+                  backoff=None):
+        """Reconnect whenever the connection drops, until close() is called.
+        
+        EVT_CLOSE or EVT_ERROR is still dispatched when the connection drops,
+        then it is retried with a growing, randomised delay. Packets sent
+        while disconnected are queued, dropping the oldest over backlog bytes.
+        On reconnecting the IS_ISI (or IR_SEL) the connection was opened with
+        is sent again ahead of them, then EVT_INIT is dispatched once, so
+        pyinsim9.state, timing and buttons resync.
+        
+        Args:
+            delay - Seconds before the first attempt.
+            max_delay - Most seconds between attempts.
+            backlog - Bytes of packets to keep while disconnected.
+            backoff - An optional function called with the number of failed
+                      attempts, returning the seconds to wait before the
+                      next one, in place of the randomised doubling delay.
+        
+        Returns:
+            The supervisor, whose attempts and reconnects attributes count
+            the attempts to reconnect.
+        
+        """
+        self._supervisor = _Supervisor(delay, max_delay, backlog, backoff)
+        return self._supervisor
         
     def send(self, type_, **kwargs):
         """Send a packet to InSim.
@@ -516,108 +1128,373 @@ class _InSim(_Binding):
             The packet that was sent.
         
         """
+        priority = kwargs.pop('priority', None)
         packet = _PACKET_MAP[type_](**kwargs)
-        self._tcp.send(packet.pack())
+        if self._scheduler is None:
+            self._tcp.send(packet.pack())
+        else:
+            self._schedule((packet,), priority)
         return packet
         
-    def sendp(self, *packets):
+    def sendp(self, *packets, priority=None):
         """Send packets to InSim.
         
         Args:
             packets - A sequence of packets to send.
+            priority - With a rate limit, one of PRIORITY_* to send the packets
+                       at instead of the priority of their type.
+        
+        Returns:
+            False if the send queue is over its high-water mark, or with a
+            rate limit, if packets are waiting for it.
+        
+        """
+        if self._scheduler is None:
+            return self._tcp.send(*[packet.pack() for packet in packets])
+        return self._schedule(packets, priority)
+        
+    def queued(self):
+        """Get the number of bytes waiting to be sent to InSim."""
+        return self._tcp.queued()
+        
+    def set_rate_limit(self, rate, burst=None, budget=_SCHEDULER_BUDGET):
+        """Limit the number of packets sent to InSim a second.
+        
+        Packets over the limit are queued and sent in order of priority:
+        PRIORITY_CONTROL for commands and requests, PRIORITY_RACE for IS_MTC,
+        IS_MSX and IS_MSL, then PRIORITY_COSMETIC for IS_BTN and IS_BFN. A
+        queued button is replaced by a newer one with the same ClickID, and
+        the oldest are dropped when more than budget packets are queued.
+        
+        Args:
+            rate - Packets a second, or None to remove the limit.
+            burst - Packets that can be sent at once, by default rate.
+            budget - Queued packets above which buttons are dropped.
+        
+        Returns:
+            The scheduler, whose depth, sent, coalesced and dropped attributes
+            count the packets it has handled.
+        
+        """
+        scheduler = self._scheduler
+        if rate is None:
+            self._scheduler = None
+            if scheduler is not None:
+                # Send everything still queued.
+                self._tcp.send(*scheduler.get(True)[0])
+            return None
+        if scheduler is None:
+            scheduler = self._scheduler = _Scheduler(rate, burst or rate, budget)
+        else:
+            scheduler.rate = rate
+            scheduler.burst = burst or rate
+            scheduler.budget = budget
+        return scheduler
+        
+    def scheduled(self):
+        """Get the number of packets waiting for the rate limit."""
+        if self._scheduler is None:
+            return 0
+        return len(self._scheduler)
+        
+    def request(self, type_, callback=None, timeout=_REQUEST_TIMEOUT, **kwargs):
+        """Send a request to InSim and collect the replies to it.
+        
+        The request is given a free ReqI and every reply that carries it is
+        collected until the request is complete, E.G. when an IS_NCN for each
+        connection has arrived, or the last IS_AXM of the layout. Requests to
+        LFS are followed by a TINY_PING, so those whose replies cannot be
+        counted (IS_NPL, IS_RES, ...) complete on the TINY_REPLY. Any number
+        of requests can be waiting at once.
+        
+        Args:
+            type_ - Type of packet to send (E.G. ISP_TINY).
+            callback - Function to call with (insim, request) when done.
+            timeout - Seconds to wait before failing, or None to wait forever.
+            kwargs - The keyword arguments to initialize the packet with,
+                     other than ReqI.
+        
+        Returns:
+            The request, whose replies attribute lists the packets received.
         
         """
-        [self._tcp.send(packet.pack()) for packet in packets]
+        reqi = self._allocate_reqi()
+        packet = _PACKET_MAP[type_](ReqI=reqi, **kwargs)
+        types, rule = _REQUESTS.get((type_, getattr(packet, 'SubT', None)), (None, None))
+        request = self._request_class(self, packet, types, rule, timeout)
+        if callback is not None:
+            request.add_callback(callback)
+        self._requests[reqi] = request
+        if request.deadline is not None and (self._next_deadline is None or
+                                             request.deadline < self._next_deadline):
+            self._next_deadline = request.deadline
+        self._watch_request(request)
+        if type_ in (insim_.IRP_HLR, insim_.IRP_ARQ, insim_.IRP_SEL) or types == ():
+            self.sendp(packet)
+        else:
+            self.sendp(packet, insim_.IS_TINY(ReqI=reqi, SubT=insim_.TINY_PING))
+        return request
+        
+    def _allocate_reqi(self):
+        # Cycle through the range, so a late reply to a finished request is
+        # unlikely to be taken for a reply to a new one.
+        size = len(_REQUEST_REQI)
+        for i in range(size):
+            reqi = _REQUEST_REQI[(self._next_reqi + i) % size]
+            if reqi not in self._requests:
+                self._next_reqi = (self._next_reqi + i + 1) % size
+                return reqi
+        raise InSimError('Too many requests waiting for replies')
+        
+    def _watch_request(self, request):
+        # The asyncore loop polls _handle_timers() for the deadlines.
+        pass
+        
+    def _call_later(self, delay, callback):
+        # Call callback() in delay seconds, the asyncore loop polls
+        # _handle_timers() for the time. Returns an object with cancel().
+        timer = _Timer(time.monotonic() + delay, callback)
+        self._timers.append(timer)
+        return timer
+        
+    def _fail_requests(self):
+        for request in list(self._requests.values()):
+            self._finish_request(request, InSimError('Connection closed'))
+        
+    def _finish_request(self, request, error=None):
+        if self._requests.get(request.ReqI) is request:
+            del self._requests[request.ReqI]
+        if request._timer is not None:
+            request._timer.cancel()
+            request._timer = None
+        request._complete(error)
         
-    def sendm(self, msg, ucid=0, plid=0):
+    def _handle_timers(self):
+        now = time.monotonic()
+        if self._reconnect_at is not None and now >= self._reconnect_at:
+            self._reconnect_at = None
+            self._reconnect()
+        if self._timers:
+            due = [timer for timer in self._timers if timer.cancelled or timer.when <= now]
+            if due:
+                self._timers = [timer for timer in self._timers if timer not in due]
+                for timer in due:
+                    if not timer.cancelled:
+                        timer.callback()
+        if self._next_deadline is None or now < self._next_deadline:
+            return
+        self._next_deadline = None
+        for request in list(self._requests.values()):
+            if request.deadline is None:
+                continue
+            if request.deadline <= now:
+                self._finish_request(request, InSimError('Request %d timed out' % request.ReqI))
+            elif self._next_deadline is None or request.deadline < self._next_deadline:
+                self._next_deadline = request.deadline
+        
+    def _schedule(self, packets, priority):
+        scheduler = self._scheduler
+        for packet in packets:
+            scheduler.put(packet, priority)
+        return self._handle_writable() and not len(scheduler)
+        
+    def set_decoders(self, decoders):
+        """Replace the decoders used for some received packet types.
+        
+        Args:
+            decoders - Dict of packet type to a function that takes the packet
+                       data and returns the packet object (E.G. the result of
+                       pyinsim9.decoders.array_decoders()).
+        
+        """
+        self._decoders = dict(self._decoders)
+        self._decoders.update(decoders)
+        self._rebind()
+        
+    def _rebind(self):
+        # Callbacks for each packet type, followed by the EVT_ALL callbacks.
+        # Empty for packet types nothing is bound to, so they are not decoded.
+        all_ = tuple(self._callbacks.get(EVT_ALL, ()))
+        self._dispatch_table = [tuple(self._callbacks.get(ptype, ())) + all_ if ptype in self._decoders else ()
+                                for ptype in range(256)]
+        
+    def sendm(self, msg, ucid=0, plid=0, priority=None):
         """Send a message or command to InSim.
         
         Args:
             msg - The message to send.
             ucid - The ID of the connection to send the message to.
             plid - The ID of the player to send the message to.
+            priority - With a rate limit, one of PRIORITY_* to send the message
+                       at instead of the priority of its type.
         
         """
         if ucid or plid:
-            self._tcp.send(insim_.IS_MTC(Msg=msg, UCID=ucid, PLID=plid).pack())
+            packet = insim_.IS_MTC(Msg=msg, UCID=ucid, PLID=plid)
         elif msg.startswith(b'/') and len(msg) < 64:
-            self._tcp.send(insim_.IS_MST(Msg=msg).pack())            
+            packet = insim_.IS_MST(Msg=msg)
         elif len(msg) < 96:
-            self._tcp.send(insim_.IS_MSX(Msg=msg).pack())
+            packet = insim_.IS_MSX(Msg=msg)
+        else:
+            packet = insim_.IS_MSX(Msg=msg[:95])
+        if self._scheduler is None:
+            self._tcp.send(packet.pack())
         else:
-            self._tcp.send(insim_.IS_MSX(Msg=msg[:95]).pack())
+            self._schedule((packet,), priority)
             
     def _handle_connect(self):     
         self.connected = True
+        self._reconnect_at = None
+        if self._supervisor is not None and self._dropped:
+            # Log in again, ahead of what was sent while disconnected. Until
+            # the first connection is made the hello is still in the backlog.
+            self._dropped = False
+            self._supervisor.reconnects += 1
+            if self._hello is not None:
+                self._tcp.send_first(self._hello.pack())
         self.dispatch(EVT_INIT)
         
     def _handle_close(self):
+        if self._supervisor is not None:
+            self._handle_drop(EVT_CLOSE)
+            return
         self.close()
         self.dispatch(EVT_CLOSE)
         
     def _handle_error(self):
+        if self._supervisor is not None:
+            if self.connected:
+                traceback.print_exc()
+            self._handle_drop(EVT_ERROR)
+            return
         self.close()
         self.dispatch(EVT_ERROR)
         traceback.print_exc()
+        
+    def _handle_drop(self, evt):
+        # Replace the TCP socket and retry later. A failed attempt passes on
+        # the packets queued while disconnected, a dropped connection does
+        # not, as its queue may end part way through a packet.
+        connected = self.connected
+        self.connected = False
+        self._dropped = self._dropped or connected
+        old = self._tcp
+        old.close()
+        self._tcp = self._tcp_class(dispatch_to=self, high_water=self._high_water,
+                                    backlog=self._supervisor.backlog)
+        if not connected:
+            self._tcp.take_backlog(old)
+        self._fail_requests()
+        self._schedule_reconnect(self._supervisor.next_delay())
+        if connected:
+            self.dispatch(evt)
+            
+    def _schedule_reconnect(self, delay):
+        # The asyncore loop polls _handle_timers() for the time.
+        self._reconnect_at = time.monotonic() + delay
+        
+    def _reconnect(self):
+        if self._tcp.connecting:
+            # The attempt has not completed in time, E.G. the SYN was lost.
+            self._handle_drop(EVT_ERROR)
+            return
+        try:
+            self._tcp.connect(self.hostaddr)
+        except OSError:
+            self._handle_drop(EVT_ERROR)
+            return
+        self._reconnect_at = time.monotonic() + _CONNECT_TIMEOUT
+        
+    def _handle_writable(self):
+        # Move the packets the rate limit allows into the send queue. The
+        # asyncore loop calls this each time round, so the delay is unused.
+        chunks, delay = self._scheduler.get()
+        return self._tcp.send(*chunks)
+        
+    def _handle_pause(self):
+        self.dispatch(EVT_PAUSE)
+        
+    def _handle_resume(self):
+        self.dispatch(EVT_RESUME)
     
     def _handle_tcp_read(self):
+        if self._supervisor is not None:
+            self._supervisor.attempts = 0
+        recorder = self.recorder
         for data in self._tcp.get_packets():  
+            if recorder is not None:
+                recorder.write(self, _CHANNEL_TCP, data)
+            # Keep alive.
+            if data[1] == insim_.ISP_TINY and data[3] == insim_.TINY_NONE:
+                self._tcp.send(bytes(data))
             self._handle_insim_packet(data)
 
     
     def _handle_udp_read(self):
         data = self._udp.get_packet()
+        if self.recorder is not None:
+            self.recorder.write(self, _CHANNEL_UDP, data)
+        self._handle_udp_packet(data)
+        
+    def _handle_udp_packet(self, data):
         size = len(data)
         if data[0:4] == _OUTSIM2_HEADER:
             callbacks = self._callbacks.get(EVT_OUTSIM2)
             if callbacks:
                 packet = insim_.OutSimPack2(self.mode).unpack(data)
-                [c(self, packet) for c in callbacks]
+                for c in callbacks:
+                    c(self, packet)
         elif size in _OUTSIM_SIZE:
             callbacks = self._callbacks.get(EVT_OUTSIM)
             if callbacks:
                 packet = insim_.OutSimPack().unpack(data)
-                [c(self, packet) for c in callbacks]
+                for c in callbacks:
+                    c(self, packet)
         elif size in _OUTGAUGE_SIZE:
             callbacks = self._callbacks.get(EVT_OUTGAUGE)
             if callbacks:
                 packet = insim_.OutGaugePack().unpack(data)
-                [c(self, packet) for c in callbacks]
+                for c in callbacks:
+                    c(self, packet)
         else:
             self._handle_insim_packet(data)
     
     def _handle_insim_packet(self, data):
         ptype = data[1]
 
-        # Keep alive.P
-        if ptype == insim_.ISP_TINY and data[3] == insim_.TINY_NONE:
-            self._tcp.send(data)
-            
         # Handle packet event.
-        bound = self._callbacks.get(ptype)
-        all_ = self._callbacks.get(EVT_ALL)
-        if bound or all_:
-            packet = _PACKET_MAP[ptype]().unpack(data)
-            if bound:
-                [c(self, packet) for c in bound]
-            if all_:
-                [c(self, packet) for c in all_]            
+        callbacks = self._dispatch_table[ptype]
+        request = self._requests.get(data[2]) if self._requests else None
+        if callbacks or request is not None:
+            decode = self._decoders.get(ptype)
+            if decode is None:
+                return # A type with no decoder that happens to carry a request's ReqI.
+            packet = decode(data)
+            for c in callbacks:
+                c(self, packet)
+            if request is not None and request._handle_reply(packet):
+                self._finish_request(request)
             
             
 class _OutSim(_Binding):
     """Class to manage an OutGauge or OutSim connection."""
-    def __init__(self, name=b'localhost', timeout=0.0, mode=1):
+    _udp_class = _UdpSocket
+
+    def __init__(self, name=b'localhost', timeout=0.0, mode=1, reuse=False):
         """Create a new OutGauge or OutSim object.
         
         Args:
             name - An optional name for the connection.
+            reuse - Set true to decode OutSim2 packets into one object.
         
         """
         _Binding.__init__(self)
         self.name = name
         self.hostaddr = ()
         self.mode = mode
-        self._udp = _UdpSocket(dispatch_to=self, timeout=timeout)
+        self._outsim2 = insim_.OutSimPack2(mode) if reuse else None
+        self.recorder = None
+        self._udp = self._udp_class(dispatch_to=self, timeout=timeout)
         
     def _connect(self, host, port):
         self.hostaddr = (host, port)
@@ -629,22 +1506,31 @@ class _OutSim(_Binding):
 
     def _handle_udp_read(self):
         data = self._udp.get_packet()
+        if self.recorder is not None:
+            self.recorder.write(self, _CHANNEL_UDP, data)
+        self._handle_udp_packet(data)
+        
+    def _handle_udp_packet(self, data):
         size = len(data)
         if data[0:4] == _OUTSIM2_HEADER:
             callbacks = self._callbacks.get(EVT_OUTSIM2)
             if callbacks:
-                packet = insim_.OutSimPack2(self.mode).unpack(data)
-                [c(self, packet) for c in callbacks]
+                packet = self._outsim2 or insim_.OutSimPack2(self.mode)
+                packet.unpack(data)
+                for c in callbacks:
+                    c(self, packet)
         elif size in _OUTSIM_SIZE:
             callbacks = self._callbacks.get(EVT_OUTSIM)
             if callbacks:
                 packet = insim_.OutSimPack().unpack(data)
-                [c(self, packet) for c in callbacks]
+                for c in callbacks:
+                    c(self, packet)
         elif size in _OUTGAUGE_SIZE:
             callbacks = self._callbacks.get(EVT_OUTGAUGE)
             if callbacks:
                 packet = insim_.OutGaugePack().unpack(data)
-                [c(self, packet) for c in callbacks]
+                for c in callbacks:
+                    c(self, packet)
     
     def _handle_close(self):
         self.close()   
@@ -0,0 +1,454 @@
+# decoders.py - precompiled packet decoders for pyinsim
+#
+# This software may be used and distributed according to the terms of the
+# GNU Lesser General Public License version 3 or any later version.
+#
+
+# Dependencies
+import functools
+import re
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Libraries
+import pyinsim9.insim as insim_
+
+__all__ = [
+    'CarUpdate',
+    'array_decoders',
+    'compile_decoders',
+    'concat_cars',
+    'lazy_decoders',
+    'record_dtype',
+]
+
+
+class _Layout(object):
+    """Field layout of a received packet, in pack_s order.
+
+    A trailing '*' strips the null padding from a string field, ':car' decodes
+    a CName, 'Name[n]' collects n values into a list and 'Obj.Name' sets the
+    value on the sub-record created for Obj.
+
+    """
+    def __init__(self, fields, format=None, subs=None, records=None, text=None):
+        """Create a new _Layout object.
+
+        Args:
+            fields - Space separated field names.
+            format - Struct format, if it is not the class pack_s.
+            subs - Dict of sub-record name to the callable that creates it.
+            records - Tuple of (attribute, count field, record class) for
+                      packets followed by an array of sub-records.
+            text - Attribute for null terminated text following the header.
+
+        """
+        self.fields = fields.split()
+        self.format = format
+        self.subs = subs or {}
+        self.records = records
+        self.text = text
+
+
+def _blank(cls):
+    return functools.partial(object.__new__, cls)
+
+
+def _offsets(format):
+    """Get the (offset, code, size) of each value unpacked by a struct format."""
+    values = []
+    prefix = ''
+    for count, code in re.findall(r'(\d*)([a-zA-Z?])', format):
+        count = int(count or 1)
+        if code == 'x':
+            prefix += '%dx' % count
+        elif code == 's':
+            prefix += '%ds' % count
+            values.append((struct.calcsize(prefix) - count, code, count))
+        else:
+            for _ in range(count):
+                prefix += code
+                values.append((struct.calcsize(prefix) - struct.calcsize(code), code, 1))
+    return values
+
+
+_CCO = {'C': insim_.CarContOBJ}
+
+_LAYOUTS = {
+    insim_.IS_VER: _Layout('Size Type ReqI Zero Version* Product* InSimVer Spare'),
+    insim_.IS_TINY: _Layout('Size Type ReqI SubT'),
+    insim_.IS_SMALL: _Layout('Size Type ReqI SubT UVal'),
+    insim_.IS_STA: _Layout('Size Type ReqI Zero ReplaySpeed Flags InGameCam ViewPLID NumP NumConns '
+                           'NumFinished RaceInProg QualMins RaceLaps Spare2 Spare3 Track* Weather Wind'),
+    insim_.IS_CPP: _Layout('Size Type ReqI Zero Pos[3] H P R ViewPLID InGameCam FOV Time Flags'),
+    insim_.IS_ISM: _Layout('Size Type ReqI Zero Host Sp1 Sp2 Sp3 HName*'),
+    insim_.IS_MSO: _Layout('Size Type ReqI Zero UCID PLID UserType TextStart', text='Msg'),
+    insim_.IS_VTN: _Layout('Size Type ReqI Zero UCID Action Spare2 Spare3'),
+    insim_.IS_RST: _Layout('Size Type ReqI Zero RaceLaps QualMins NumP Timing Track* Weather Wind '
+                           'Flags NumNodes Finish Split1 Split2 Split3'),
+    insim_.IS_NCN: _Layout('Size Type ReqI UCID UName* PName* Admin Total Flags Sp3'),
+    insim_.IS_CNL: _Layout('Size Type ReqI UCID Reason Total Sp2 Sp3'),
+    insim_.IS_CPR: _Layout('Size Type ReqI UCID PName* Plate'),
+    insim_.IS_NPL: _Layout('Size Type ReqI PLID UCID PType Flags PName* Plate CName:car SName* Tyres[4] '
+                           'H_Mass H_TRes Model Pass RWAdj FWAdj Sp2 Sp3 SetF NumP Config Fuel'),
+    insim_.IS_PLP: _Layout('Size Type ReqI PLID'),
+    insim_.IS_PLL: _Layout('Size Type ReqI PLID'),
+    insim_.IS_LAP: _Layout('Size Type ReqI PLID LTime ETime LapsDone Flags Sp0 Penalty NumStops Fuel200'),
+    insim_.IS_SPX: _Layout('Size Type ReqI PLID STime ETime Split Penalty NumStops Fuel200'),
+    insim_.IS_PIT: _Layout('Size Type ReqI PLID LapsDone Flags FuelAdd Penalty NumStops Sp3 Tyres[4] Work Spare'),
+    insim_.IS_PSF: _Layout('Size Type ReqI PLID STime Spare'),
+    insim_.IS_PLA: _Layout('Size Type ReqI PLID Fact Sp1 Sp2 Sp3'),
+    insim_.IS_CCH: _Layout('Size Type ReqI PLID Camera Sp1 Sp2 Sp3'),
+    insim_.IS_PEN: _Layout('Size Type ReqI PLID OldPen NewPen Reason Sp3'),
+    insim_.IS_TOC: _Layout('Size Type ReqI PLID OldUCID NewUCID Sp2 Sp3'),
+    insim_.IS_FLG: _Layout('Size Type ReqI PLID OffOn Flag CarBehind Sp3'),
+    insim_.IS_PFL: _Layout('Size Type ReqI PLID Flags Spare'),
+    insim_.IS_FIN: _Layout('Size Type ReqI PLID TTime BTime SpA NumStops Confirm SpB LapsDone Flags'),
+    insim_.IS_RES: _Layout('Size Type ReqI PLID UName* PName* Plate* CName:car TTime BTime SpA NumStops '
+                           'Confirm SpB LapsDone Flags ResultNum NumRes PSeconds'),
+    insim_.IS_NLP: _Layout('Size Type ReqI NumP', records=('Info', 'NumP', insim_.NodeLap)),
+    insim_.IS_MCI: _Layout('Size Type ReqI NumC', records=('Info', 'NumC', insim_.CompCar)),
+    insim_.IS_CRS: _Layout('Size Type ReqI PLID'),
+    insim_.IS_BFN: _Layout('Size Type ReqI SubT UCID ClickID ClickMax Inst'),
+    insim_.IS_AXI: _Layout('Size Type ReqI Zero AXStart NumCP NumO LName*'),
+    insim_.IS_AXO: _Layout('Size Type ReqI PLID'),
+    insim_.IS_BTC: _Layout('Size Type ReqI UCID ClickID Inst CFlags Sp3'),
+    insim_.IS_BTT: _Layout('Size Type ReqI UCID ClickID Inst TypeIn Sp3 Text*'),
+    insim_.IS_RIP: _Layout('Size Type ReqI Error MPR Paused Options Sp3 CTime TTime RName*'),
+    insim_.IS_SSH: _Layout('Size Type ReqI Error Sp0 Sp1 Sp2 Sp3 Name*'),
+    insim_.IS_CON: _Layout('Size Type ReqI Zero SpClose Time '
+                           'A.PLID A.Info A.Sp2 A.Steer A.ThrBrk A.CluHan A.GearSp A.Speed A.Direction '
+                           'A.Heading A.AccelF A.AccelR A.X A.Y '
+                           'B.PLID B.Info B.Sp2 B.Steer B.ThrBrk B.CluHan B.GearSp B.Speed B.Direction '
+                           'B.Heading B.AccelF B.AccelR B.X B.Y',
+                           format=insim_.IS_CON.pack_s.format + insim_.CarContact.pack_s.format * 2,
+                           subs={'A': _blank(insim_.CarContact), 'B': _blank(insim_.CarContact)}),
+    insim_.IS_OBH: _Layout('Size Type ReqI PLID SpClose Time C.Direction C.Heading C.Speed C.Zbyte C.X C.Y '
+                           'X Y Zbyte Sp1 Index OBHFlags', subs=_CCO),
+    insim_.IS_HLV: _Layout('Size Type ReqI PLID HLVC Sp1 Time C.Direction C.Heading C.Speed C.Zbyte C.X C.Y',
+                           subs=_CCO),
+    insim_.IS_AXM: _Layout('Size Type ReqI NumO UCID PMOAction PMOFlags Sp3',
+                           records=('Info', 'NumO', insim_.ObjectInfo)),
+    insim_.IS_NCI: _Layout('Size Type ReqI UCID Language Sp1 Sp2 Sp3 UserID IPAddress'),
+    insim_.IS_JRR: _Layout('Size Type ReqI PLID UCID JRRAction Sp2 Sp3 X Y Zbyte Flags Index Heading'),
+    insim_.IS_UCO: _Layout('Size Type ReqI PLID Sp0 UCOAction Sp2 Sp3 Time C.Direction C.Heading C.Speed '
+                           'C.Sp2 C.X C.Y Info.X Info.Y Info.Zbyte Info.Flags Info.Index Info.Heading',
+                           format=insim_.IS_UCO.pack_s.format + insim_.ObjectInfo.pack_s.format,
+                           subs={'C': insim_.CarContOBJ, 'Info': _blank(insim_.ObjectInfo)}),
+    insim_.IS_OCO: _Layout('Size Type ReqI Zero OCOAction Index Identifier Data'),
+    insim_.IS_CSC: _Layout('Size Type ReqI PLID Sp0 CSCAction Sp2 Sp3 Time C.Direction C.Heading C.Speed '
+                           'C.Sp2 C.X C.Y', subs=_CCO),
+    insim_.IS_CIM: _Layout('Size Type ReqI UCID Mode SubMode SelType Sp3'),
+    insim_.IS_MAL: _Layout('Size Type ReqI NumM UCID Flags Sp1 Sp2 SkinID'),
+    insim_.IS_PLH: _Layout('Size Type ReqI NumP', records=('HCaps', 'NumP', insim_.PlayerHCap)),
+    insim_.IR_HOS: _Layout('Size Type ReqI NumHosts', records=('Info', 'NumHosts', insim_.HInfo)),
+    insim_.IR_ARP: _Layout('Size Type ReqI Admin'),
+    insim_.IR_ERR: _Layout('Size Type ReqI ErrNo'),
+}
+
+_RECORDS = {
+    insim_.NodeLap: _Layout('Node Lap PLID Position'),
+    insim_.CompCar: _Layout('Node Lap PLID Position Info Sp3 X Y Z Speed Direction Heading AngVel'),
+    insim_.ObjectInfo: _Layout('X Y Zbyte Flags Index Heading'),
+    insim_.PlayerHCap: _Layout('PLID Flags H_Mass H_TRes'),
+    insim_.HInfo: _Layout('HName* Track* Flags NumConns'),
+}
+
+_CONVERTERS = {
+    '*': insim_._eat_null_chars,
+    ':car': insim_._car_name,
+}
+
+
+def _codegen(name, cls, layout, arg, lazy=False):
+    """Generate the source of a function that fills a new cls from the
+    unpacked tuple ``t``, skipping converted fields if they are lazy."""
+    namespace = {'new': object.__new__, 'cls': cls}
+    targets = []
+    post = []
+    for sub, factory in layout.subs.items():
+        namespace['sub_' + sub] = factory
+        post.append('    p.%s = s_%s = sub_%s()' % (sub, sub, sub))
+    for field in layout.fields:
+        for suffix, converter in _CONVERTERS.items():
+            if field.endswith(suffix) and lazy:
+                targets.append('_')
+                break
+            if field.endswith(suffix):
+                field = field[:-len(suffix)]
+                namespace['conv_' + field] = converter
+                targets.append('_' + field)
+                post.append('    p.%s = conv_%s(_%s)' % (field, field, field))
+                break
+        else:
+            if field.endswith(']'):
+                field, count = field[:-1].split('[')
+                items = ['_%s%d' % (field, i) for i in range(int(count))]
+                targets.extend(items)
+                post.append('    p.%s = [%s]' % (field, ', '.join(items)))
+            elif '.' in field:
+                targets.append('s_' + field)
+            else:
+                targets.append('p.' + field)
+    lines = ['def %s(%s, **bound):' % (name, arg), '    p = new(cls)']
+    lines.extend(line for line in post if ' = s_' in line)
+    lines.append('    %s, = t' % ', '.join(targets))
+    lines.extend(line for line in post if ' = s_' not in line)
+    return lines, namespace
+
+
+def _build(name, lines, namespace):
+    # Helpers are bound as default arguments so they are fast locals.
+    lines[0] = lines[0].replace('**bound', ', '.join('%s=%s' % (k, k) for k in namespace))
+    exec('\n'.join(lines), namespace)
+    return namespace[name]
+
+
+def _compile_record(cls):
+    lines, namespace = _codegen('record', cls, _RECORDS[cls], 't')
+    lines.append('    return p')
+    return _build('record', lines, namespace)
+
+
+def _compile(cls, layout, array=False):
+    pack_s = struct.Struct(layout.format) if layout.format else cls.pack_s
+    lines, namespace = _codegen('decode', cls, layout, 'data')
+    lines.insert(2, '    t = unpack_from(data)')
+    namespace['unpack_from'] = pack_s.unpack_from
+    if layout.records and array:
+        # Copied once into bytes, as the receive buffer behind data is reused.
+        attr, count, record = layout.records
+        namespace['frombuffer'] = numpy.frombuffer
+        namespace['dtype'] = record_dtype(record)
+        lines.append('    p.%s = frombuffer(bytes(data[%d:%d + p.%s * %d]), dtype)' % (
+                     attr, pack_s.size, pack_s.size, count, record.pack_s.size))
+    elif layout.records:
+        attr, count, record = layout.records
+        namespace['iter_unpack'] = record.pack_s.iter_unpack
+        namespace['record'] = _compile_record(record)
+        lines.append('    p.%s = list(map(record, iter_unpack(data[%d:%d + p.%s * %d])))' % (
+                     attr, pack_s.size, pack_s.size, count, record.pack_s.size))
+    if layout.text:
+        lines.append("    p.%s = bytes(data[%d:]).split(b'\\x00', 1)[0]" % (layout.text, pack_s.size))
+    lines.append('    return p')
+    decode = _build('decode', lines, namespace)
+    decode.__name__ = decode.__qualname__ = 'decode_' + cls.__name__
+    return decode
+
+
+def _fallback(cls):
+    def decode(data):
+        return cls().unpack(data)
+    decode.__name__ = decode.__qualname__ = 'decode_' + cls.__name__
+    return decode
+
+
+def compile_decoders(packet_map):
+    """Build a decoder for each received packet type.
+
+    Args:
+        packet_map - Dict of packet type to packet class.
+
+    Returns:
+        A dict of packet type to a function that takes the packet data and
+        returns the decoded packet object. Packets without a known layout
+        fall back to the class unpack() method.
+
+    """
+    decoders = {}
+    for ptype, cls in packet_map.items():
+        layout = _LAYOUTS.get(cls)
+        if layout is not None:
+            decoders[ptype] = _compile(cls, layout)
+        elif hasattr(cls, 'unpack'):
+            decoders[ptype] = _fallback(cls)
+    return decoders
+
+
+def record_dtype(cls):
+    """Build a NumPy structured dtype matching a sub-record's pack_s.
+
+    Args:
+        cls - The sub-record class (E.G. CompCar or NodeLap).
+
+    Returns:
+        A numpy.dtype with one named field per sub-record attribute.
+
+    """
+    if numpy is None:
+        raise ImportError('NumPy is required for array decoding')
+    names = [field.rstrip('*') for field in _RECORDS[cls].fields]
+    values = _offsets(cls.pack_s.format)
+    formats = ['S%d' % size if code == 's' else '=' + code for offset, code, size in values]
+    offsets = [offset for offset, code, size in values]
+    return numpy.dtype({'names': names, 'formats': formats, 'offsets': offsets,
+                        'itemsize': cls.pack_s.size})
+
+
+def array_decoders():
+    """Build decoders that store IS_MCI and IS_NLP cars in NumPy arrays.
+
+    The Info attribute of each packet is a structured array with a field for
+    each CompCar or NodeLap attribute (E.G. packet.Info['X']), instead of a
+    list of objects. The arrays are read-only views of a copy of the packet.
+    Pass the result to the set_decoders() method of an InSim connection to
+    enable it.
+
+    Returns:
+        A dict of packet type to decoder.
+
+    """
+    if numpy is None:
+        raise ImportError('NumPy is required for array decoding')
+    return dict((ptype, _compile(cls, _LAYOUTS[cls], array=True))
+                for ptype, cls in ((insim_.ISP_MCI, insim_.IS_MCI), (insim_.ISP_NLP, insim_.IS_NLP)))
+
+
+def concat_cars(packets):
+    """Join the car arrays of several packets decoded by array_decoders().
+
+    Args:
+        packets - A sequence of IS_MCI or IS_NLP packets.
+
+    Returns:
+        A single structured array of every car, in packet order.
+
+    """
+    return numpy.concatenate([packet.Info for packet in packets])
+
+
+class CarUpdate(object):
+    """Callback that collects the IS_MCI packets of one update.
+
+    LFS splits an update into several IS_MCI packets when there are many cars
+    in the race. Bind an instance to ISP_MCI on a connection using
+    array_decoders() and it will call callback(insim, cars) with one array of
+    every car once the last packet of each update arrives.
+
+    """
+    def __init__(self, callback):
+        """Create a new CarUpdate object.
+
+        Args:
+            callback - The function to call with each complete update.
+
+        """
+        self.callback = callback
+        self._packets = []
+
+    def __call__(self, insim, packet):
+        info = packet.Info['Info']
+        if len(info) and info[0] & insim_.CCI_FIRST:
+            self._packets = []
+        self._packets.append(packet)
+        if not len(info) or info[-1] & insim_.CCI_LAST:
+            packets, self._packets = self._packets, []
+            self.callback(insim, concat_cars(packets))
+
+
+def _lazy_property(slot, index, bit, convert):
+    """Property that converts a raw unpacked value on first access and caches
+    it in the slot it shadows."""
+    get_slot = slot.__get__
+    set_slot = slot.__set__
+    def get(self):
+        if self._done & bit:
+            return get_slot(self)
+        value = convert(self._raw[index])
+        set_slot(self, value)
+        self._done |= bit
+        return value
+    def set_(self, value):
+        set_slot(self, value)
+        self._done |= bit
+    return property(get, set_)
+
+
+def _text(raw):
+    return raw.split(b'\x00', 1)[0]
+
+
+def _rebuild(cls, fields):
+    """Create an instance of a packet class with the given field values."""
+    packet = cls.__new__(cls)
+    for name, value in fields.items():
+        setattr(packet, name, value)
+    return packet
+
+
+def _eager_reduce(cls):
+    """Method that reduces a lazy packet to an instance of its packet class,
+    so it copies and pickles without the raw values or the generated class."""
+    def reduce(self):
+        fields = {}
+        for name in cls.__slots__:
+            try:
+                fields[name] = getattr(self, name)
+            except AttributeError:
+                pass
+        return _rebuild, (cls, fields)
+    return reduce
+
+
+def _lazy_class(cls, layout):
+    """Create a subclass of cls that converts its string fields on first access."""
+    reduce = _eager_reduce(cls)
+    namespace = {'__slots__': ('_raw', '_done'), '__module__': __name__, '__doc__': cls.__doc__,
+                 '_fields': cls.__slots__, '__reduce__': reduce,
+                 '__copy__': lambda self: _rebuild(*reduce(self)[1])}
+    index = 0
+    for field in layout.fields:
+        for suffix, converter in _CONVERTERS.items():
+            if field.endswith(suffix):
+                field = field[:-len(suffix)]
+                namespace[field] = _lazy_property(getattr(cls, field), index, 1 << index, converter)
+                index += 1
+                break
+        else:
+            index += int(field[:-1].split('[')[1]) if field.endswith(']') else 1
+    if layout.text:
+        namespace[layout.text] = _lazy_property(getattr(cls, layout.text), index, 1 << index, _text)
+    lazy = type(cls.__name__, (cls,), namespace)
+    lazy.__qualname__ = cls.__qualname__
+    return lazy
+
+
+def _compile_lazy(cls, layout):
+    pack_s = struct.Struct(layout.format) if layout.format else cls.pack_s
+    lines, namespace = _codegen('decode', _lazy_class(cls, layout), layout, 'data', lazy=True)
+    lines.insert(2, '    t = unpack_from(data)')
+    namespace['unpack_from'] = pack_s.unpack_from
+    if layout.text:
+        lines.append('    p._raw = t + (bytes(data[%d:]),)' % pack_s.size)
+    else:
+        lines.append('    p._raw = t')
+    lines.append('    p._done = 0')
+    lines.append('    return p')
+    decode = _build('decode', lines, namespace)
+    decode.__name__ = decode.__qualname__ = 'decode_' + cls.__name__
+    return decode
+
+
+def lazy_decoders():
+    """Build decoders that defer decoding the fields of string-bearing packets.
+
+    IS_RES, IS_NPL, IS_NCN, IS_BTT and IS_MSO packets keep their string fields
+    raw and strip, decode or split each one the first time it is read, so
+    handlers that only look at PLID or TTime skip the name, car and text
+    decoding. The packets are subclasses of the usual packet classes with the
+    same attributes, listed in their _fields, and copy and pickle as the
+    usual classes. Pass the result to the set_decoders() method of an InSim
+    connection to enable it.
+
+    Returns:
+        A dict of packet type to decoder.
+
+    """
+    return dict((ptype, _compile_lazy(cls, _LAYOUTS[cls]))
+                for ptype, cls in ((insim_.ISP_RES, insim_.IS_RES), (insim_.ISP_NPL, insim_.IS_NPL),
+                                   (insim_.ISP_NCN, insim_.IS_NCN), (insim_.ISP_BTT, insim_.IS_BTT),
+                                   (insim_.ISP_MSO, insim_.IS_MSO)))
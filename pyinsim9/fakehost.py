@@ -0,0 +1,513 @@
+# fakehost.py - fake LFS host for testing pyinsim
+#
+# This software may be used and distributed according to the terms of the
+# GNU Lesser General Public License version 3 or any later version.
+#
+
+# Dependencies
+import math
+import select
+import socket
+import struct
+import threading
+import time
+import traceback
+
+# Libraries
+import pyinsim9.core as core
+from pyinsim9.core import insim_ # pyinsim9.insim is shadowed by core.insim()
+
+__all__ = [
+    'fake_host',
+]
+
+# Constants.
+_MCI_CARS = 8
+_NODES = 400
+_RADIUS = 500.0
+_KEEP_ALIVE = 30.0
+_IDLE = 0.05
+_RELAY_INTERVAL = 1.0
+_HOSTS_PER_PACKET = 6
+_VERSION = b'0.7F'
+_PRODUCT = b'S3'
+
+
+def fake_host(host='127.0.0.1', port=0, cars=8, interval=None, lap_time=60.0, splits=3,
+              hname=b'pyinsim', track=b'BL1', keep_alive=_KEEP_ALIVE, callback=None):
+    """Start a fake LFS host that InSim and relay connections can connect to.
+
+    The host answers the IS_ISI and IR_SEL handshakes and IS_TINY requests,
+    and drives a race of cars around a circular track, sending IS_MCI and
+    IS_NLP updates to the connections that ask for them in IS_ISI Flags, and
+    IS_LAP and IS_SPX to every connection as the cars cross the lines. Use
+    add_outsim2() and add_outgauge() to also send UDP streams.
+
+    It runs on background threads, so the connections being tested can be
+    run with pyinsim9.run() or pyinsim9.aio.run() on this one.
+
+    Args:
+        host - The address to listen on.
+        port - The port to listen on, or 0 to pick a free port.
+        cars - The number of cars in the race.
+        interval - Seconds between IS_MCI and IS_NLP updates, or None to use
+                   the Interval each connection sets in IS_ISI.
+        lap_time - Seconds the fastest car takes for a lap.
+        splits - The number of splits on each lap.
+        hname - The host name, which IR_SEL must select, or a list of names
+                the host answers to as if the relay listed that many hosts.
+        track - The short track name.
+        keep_alive - Seconds between keep alive IS_TINY packets.
+        callback - An optional function to call with (host, data) for every
+                   packet a connection sends.
+
+    Returns:
+        The started fake host, its port attribute is the port to connect to.
+
+    """
+    fake = _FakeHost(host, port, cars, interval, lap_time, splits, hname, track, keep_alive, callback)
+    fake.start()
+    return fake
+
+
+class _Client(object):
+    """A connection to the fake host."""
+    def __init__(self, sock, addr):
+        self.sock = sock
+        self.addr = addr
+        self.ready = False
+        self.flags = 0
+        self.interval = 0.0
+        self.udpaddr = None
+        self.next_update = 0.0
+        self.lock = threading.Lock()
+
+    def send(self, *packets):
+        with self.lock:
+            self.sock.sendall(b''.join(packets))
+
+
+class _FakeHost(object):
+    """Class to imitate an LFS host for load and end-to-end testing."""
+    def __init__(self, host='127.0.0.1', port=0, cars=8, interval=None, lap_time=60.0, splits=3,
+                 hname=b'pyinsim', track=b'BL1', keep_alive=_KEEP_ALIVE, callback=None):
+        """Create a new fake host object.
+
+        Args:
+            host - The address to listen on.
+            port - The port to listen on, or 0 to pick a free port.
+            cars - The number of cars in the race.
+            interval - Seconds between IS_MCI and IS_NLP updates.
+            lap_time - Seconds the fastest car takes for a lap.
+            splits - The number of splits on each lap.
+            hname - The host name, or a list of names.
+            track - The short track name.
+            keep_alive - Seconds between keep alive IS_TINY packets.
+            callback - An optional function to call with each received packet.
+
+        """
+        self.hostaddr = (host, port)
+        self.cars = cars
+        self.interval = interval
+        self.lap_time = lap_time
+        self.splits = splits
+        self.hnames = [hname] if isinstance(hname, bytes) else list(hname)
+        self.hname = self.hnames[0]
+        self.track = track
+        self.keep_alive = keep_alive
+        self.callback = callback
+        self.sent = 0
+        self.received = 0
+        self.late = 0
+        self.max_lag = 0.0
+        self._clients = []
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._threads = []
+        self._listener = None
+        self._udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._start = time.monotonic()
+        self._last = self._start
+        # Laps covered by each car, the cars start spread over the first lap.
+        self._distance = [1.0 - (i + 1.0) / (cars + 1) for i in range(cars)]
+        self._pace = [1.0 - i * 0.01 for i in range(cars)]
+
+    @property
+    def port(self):
+        """The port the host is listening on."""
+        return self.hostaddr[1]
+
+    @property
+    def clients(self):
+        """The number of connections that completed the handshake."""
+        return sum(1 for client in self._clients if client.ready)
+
+    def start(self):
+        """Start listening and driving the race."""
+        self._listen()
+        self._spawn(self._race, 'pyinsim-fakehost-race')
+
+    def add_outsim2(self, port=30000, rate=100.0, mode=1, rigs=1, host=None):
+        """Send OutSim2 packets, as LFS does with OutSim Mode 1.
+
+        Args:
+            port - The port to send to.
+            rate - Packets per second from each rig.
+            mode - The OutSim Opts value.
+            rigs - The number of rigs sending, each with its own ID.
+            host - The address to send to, defaults to the listening address.
+
+        """
+        layout = insim_._outsim2_layout(mode)
+        values = list(layout.pack_s.unpack(bytes(layout.pack_s.size)))
+        if layout.header is not None:
+            values[layout.header:layout.header + 4] = b'LFST'
+        def build(n):
+            packets = []
+            for rig in range(rigs):
+                if layout.id is not None:
+                    values[layout.id] = rig
+                if layout.time is not None:
+                    values[layout.time] = int(n * 1000 / rate)
+                packets.append(layout.pack_s.pack(*values))
+            return packets
+        self._spawn(self._stream, 'pyinsim-fakehost-outsim2', ((host or self.hostaddr[0], port), rate, build))
+
+    def add_outgauge(self, port=30000, rate=100.0, host=None):
+        """Send OutGauge packets with an ID.
+
+        Args:
+            port - The port to send to.
+            rate - Packets per second.
+            host - The address to send to, defaults to the listening address.
+
+        """
+        pack_s = insim_.OutGaugePack.pack_s
+        def build(n):
+            rpm = 4000.0 + 3000.0 * math.sin(n / rate)
+            return [pack_s.pack(int(n * 1000 / rate), b'XRG', 0, 3, 1, 30.0, rpm, 0.0, 90.0, 0.5, 4.0,
+                                90.0, 0, 0, 1.0, 0.0, 0.0, b'', b'') + struct.pack('i', 1)]
+        self._spawn(self._stream, 'pyinsim-fakehost-outgauge', ((host or self.hostaddr[0], port), rate, build))
+
+    def broadcast(self, *packets):
+        """Send raw packets to every connection that completed the handshake.
+
+        Args:
+            packets - The packed packets.
+
+        """
+        for client in list(self._clients):
+            if client.ready:
+                self._send(client, *packets)
+
+    def restart(self, downtime=0.0):
+        """Close every connection and stop listening for a while, as LFS does
+        when it restarts. Blocks until it is listening again.
+
+        Args:
+            downtime - Seconds before connections are accepted again.
+
+        """
+        try:
+            self._listener.shutdown(socket.SHUT_RDWR) # Wakes _accept() so the port is released.
+        except OSError:
+            pass
+        self._listener.close()
+        for client in list(self._clients):
+            self._drop(client)
+        time.sleep(downtime)
+        self._listen()
+
+    def close(self):
+        """Stop the host and close every connection."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        for client in list(self._clients):
+            self._drop(client)
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join()
+        self._listener.close()
+        self._udp.close()
+
+    def _listen(self):
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind(self.hostaddr)
+        self._listener.listen(16)
+        self._listener.settimeout(_IDLE)
+        self.hostaddr = self._listener.getsockname()
+        self._spawn(self._accept, 'pyinsim-fakehost-accept', (self._listener,))
+
+    def _spawn(self, target, name, args=()):
+        thread = threading.Thread(target=target, name=name, args=args, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _send(self, client, *packets):
+        try:
+            client.send(*packets)
+            self.sent += len(packets)
+        except OSError:
+            self._drop(client)
+
+    def _drop(self, client):
+        with self._lock:
+            if client not in self._clients:
+                return
+            self._clients.remove(client)
+        try:
+            client.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        client.sock.close()
+
+    def _accept(self, listener):
+        while not self._closed.is_set():
+            try:
+                sock, addr = listener.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            sock.settimeout(None)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client = _Client(sock, addr)
+            with self._lock:
+                self._clients.append(client)
+            self._spawn(self._serve, 'pyinsim-fakehost-client', (client,))
+
+    def _serve(self, client):
+        buff = b''
+        try:
+            while not self._closed.is_set():
+                if not select.select([client.sock], [], [], _IDLE)[0]:
+                    continue
+                data = client.sock.recv(4096)
+                if not data:
+                    break
+                buff += data
+                while len(buff) >= 4 and len(buff) >= buff[0] * 4:
+                    size = buff[0] * 4
+                    if not size:
+                        raise core.InSimError('TCP packet size is zero')
+                    packet, buff = buff[:size], buff[size:]
+                    self.received += 1
+                    if self.callback:
+                        self.callback(self, packet)
+                    self._handle_packet(client, packet)
+        except OSError:
+            pass
+        except ValueError:
+            # select() raises ValueError once the socket has been dropped.
+            if client.sock.fileno() != -1:
+                traceback.print_exc()
+        except Exception:
+            traceback.print_exc()
+        self._drop(client)
+
+    def _handle_packet(self, client, data):
+        ptype = data[1]
+        if ptype == insim_.ISP_ISI:
+            (size, type_, reqi, zero, udpport, flags, insimver, prefix,
+             interval, admin, iname) = insim_.IS_ISI.pack_s.unpack(data)
+            client.flags = flags
+            client.interval = self.interval or interval / 1000.0
+            if udpport:
+                client.udpaddr = (client.addr[0], udpport)
+            self._handshake(client, reqi)
+        elif ptype == insim_.IRP_SEL:
+            size, type_, reqi, zero, hname, admin, spec = insim_.IR_SEL.pack_s.unpack(data)
+            if hname.rstrip(b'\x00') not in self.hnames:
+                self._send(client, struct.pack('4B', 1, insim_.IRP_ERR, reqi, insim_.IR_ERR_HOSTNAME))
+                return
+            client.flags = insim_.ISF_MCI | insim_.ISF_NLP
+            client.interval = self.interval or _RELAY_INTERVAL
+            self._handshake(client, reqi)
+        elif ptype == insim_.IRP_HLR:
+            self._send(client, *self._host_list(data[2]))
+        elif ptype == insim_.ISP_TINY:
+            self._handle_tiny(client, data[2], data[3])
+
+    def _host_list(self, reqi):
+        # IR_HOS packets of up to six hosts, as the relay sends them.
+        packets = []
+        last = len(self.hnames) - 1
+        for start in range(0, len(self.hnames), _HOSTS_PER_PACKET):
+            names = self.hnames[start:start + _HOSTS_PER_PACKET]
+            hinfo = b''
+            for i, hname in enumerate(names, start):
+                flags = insim_.HOS_LICENSED
+                if i == 0:
+                    flags |= insim_.HOS_FIRST
+                if i == last:
+                    flags |= insim_.HOS_LAST
+                hinfo += insim_.HInfo.pack_s.pack(hname, self.track, flags, self.cars + 1)
+            packets.append(struct.pack('4B', (4 + len(hinfo)) // 4, insim_.IRP_HOS, reqi, len(names)) + hinfo)
+        return packets
+
+    def _handshake(self, client, reqi):
+        client.next_update = time.monotonic()
+        client.ready = True
+        if reqi:
+            self._send(client, self._ver(reqi))
+
+    def _handle_tiny(self, client, reqi, subt):
+        if subt == insim_.TINY_VER:
+            self._send(client, self._ver(reqi))
+        elif subt == insim_.TINY_PING:
+            self._send(client, struct.pack('4B', 1, insim_.ISP_TINY, reqi, insim_.TINY_REPLY))
+        elif subt == insim_.TINY_CLOSE:
+            self._drop(client)
+        elif subt == insim_.TINY_SST:
+            self._send(client, insim_.IS_STA.pack_s.pack(7, insim_.ISP_STA, reqi, 0, 1.0, 0, 0, 1, self.cars,
+                                                         self.cars + 1, 0, 1, 0, 10, 0, 0, self.track, 0, 0))
+        elif subt == insim_.TINY_ISM:
+            self._send(client, insim_.IS_ISM.pack_s.pack(10, insim_.ISP_ISM, reqi, 0, 1, 0, 0, 0, self.hname))
+        elif subt == insim_.TINY_NCN:
+            packets = [insim_.IS_NCN.pack_s.pack(14, insim_.ISP_NCN, reqi, 0, b'', b'host', 1, self.cars + 1, 0, 0)]
+            packets.extend(insim_.IS_NCN.pack_s.pack(14, insim_.ISP_NCN, reqi, i, b'driver%d' % i, b'^7Driver %d' % i,
+                                                     0, self.cars + 1, 0, 0) for i in range(1, self.cars + 1))
+            self._send(client, *packets)
+        elif subt == insim_.TINY_NPL:
+            self._send(client, *[insim_.IS_NPL.pack_s.pack(19, insim_.ISP_NPL, reqi, i, i, 0, 0, b'^7Driver %d' % i,
+                                                           b'PYINSIM', b'XRG', b'DEFAULT', 1, 1, 1, 1, 0, 0, 0, 0,
+                                                           0, 0, 0, 0, 0, self.cars, 0, 50)
+                                 for i in range(1, self.cars + 1)])
+        elif subt == insim_.TINY_RST:
+            split = _NODES // (self.splits + 1)
+            self._send(client, insim_.IS_RST.pack_s.pack(7, insim_.ISP_RST, reqi, 0, 10, 0, self.cars, 0, self.track,
+                                                         0, 0, 0, _NODES, 0, split, split * 2, split * 3))
+        elif subt == insim_.TINY_GTH:
+            ms = int((time.monotonic() - self._start) * 1000) & 0xffffffff
+            self._send(client, insim_.IS_SMALL(ReqI=reqi, SubT=insim_.SMALL_RTP, UVal=ms).pack())
+        elif subt in (insim_.TINY_MCI, insim_.TINY_NLP):
+            mci, nlp = self._positions(reqi)
+            self._send(client, *(mci if subt == insim_.TINY_MCI else [nlp]))
+
+    def _ver(self, reqi):
+        return insim_.IS_VER.pack_s.pack(5, insim_.ISP_VER, reqi, 0, _VERSION, _PRODUCT, insim_.INSIM_VERSION, 0)
+
+    def _race(self):
+        keep_alive = time.monotonic() + self.keep_alive
+        while not self._closed.is_set():
+            try:
+                now = time.monotonic()
+                self._advance(now)
+                if now >= keep_alive:
+                    keep_alive = now + self.keep_alive
+                    self.broadcast(struct.pack('4B', 1, insim_.ISP_TINY, 0, insim_.TINY_NONE))
+                wait = keep_alive - now
+                update = None
+                for client in list(self._clients):
+                    if not client.ready or not client.interval or not client.flags & (insim_.ISF_MCI | insim_.ISF_NLP):
+                        continue
+                    lag = now - client.next_update
+                    if lag >= 0:
+                        if lag > client.interval:
+                            # The client or this thread fell behind, skip ahead.
+                            self.late += 1
+                            self.max_lag = max(self.max_lag, lag)
+                            client.next_update = now + client.interval
+                        else:
+                            client.next_update += client.interval
+                        if update is None:
+                            update = self._positions()
+                        self._send_update(client, *update)
+                    wait = min(wait, client.next_update - now)
+                self._closed.wait(min(max(wait, 0.0), _IDLE))
+            except Exception:
+                traceback.print_exc()
+
+    def _send_update(self, client, mci, nlp):
+        packets = []
+        if client.flags & insim_.ISF_MCI:
+            packets.extend(mci)
+        if client.flags & insim_.ISF_NLP:
+            packets.append(nlp)
+        if client.udpaddr:
+            for packet in packets:
+                self._udp.sendto(packet, client.udpaddr)
+            self.sent += len(packets)
+        else:
+            self._send(client, *packets)
+
+    def _advance(self, now):
+        elapsed = now - self._last
+        self._last = now
+        events = []
+        for i in range(self.cars):
+            old = self._distance[i]
+            new = self._distance[i] = old + elapsed * self._pace[i] / self.lap_time
+            plid = i + 1
+            etime = int((now - self._start) * 1000)
+            if int(new) > int(old):
+                ltime = int(self.lap_time / self._pace[i] * 1000)
+                events.append(insim_.IS_LAP.pack_s.pack(5, insim_.ISP_LAP, 0, plid, ltime, etime,
+                                                        int(new), 0, 0, 0, 0, 100))
+            else:
+                for split in range(1, self.splits + 1):
+                    line = int(old) + split / (self.splits + 1.0)
+                    if old < line <= new:
+                        stime = int(self.lap_time / self._pace[i] * 1000 * split / (self.splits + 1))
+                        events.append(insim_.IS_SPX.pack_s.pack(4, insim_.ISP_SPX, 0, plid, stime, etime,
+                                                                split, 0, 0, 100))
+        if events:
+            self.broadcast(*events)
+
+    def _positions(self, reqi=0):
+        order = sorted(range(self.cars), key=lambda i: -self._distance[i])
+        positions = [0] * self.cars
+        for position, i in enumerate(order):
+            positions[i] = position + 1
+        speed = int(2 * math.pi * _RADIUS / self.lap_time * 327.68)
+        cars = []
+        nodes = []
+        for i in range(self.cars):
+            distance = self._distance[i]
+            lap = int(distance) + 1
+            angle = (distance % 1.0) * 2 * math.pi
+            node = int((distance % 1.0) * _NODES)
+            heading = int((angle / (2 * math.pi) * 65536 + 16384)) & 0xffff
+            cars.append([node, lap, i + 1, positions[i], 0, 0,
+                         int(_RADIUS * math.cos(angle) * 65536), int(_RADIUS * math.sin(angle) * 65536), 0,
+                         min(int(speed * self._pace[i]), 0xffff), heading, heading, int(16384 / self.lap_time)])
+            nodes.append(insim_.NodeLap.pack_s.pack(node, lap, i + 1, positions[i]))
+        mci = []
+        for first in range(0, self.cars, _MCI_CARS):
+            chunk = cars[first:first + _MCI_CARS]
+            chunk[0][4] |= insim_.CCI_FIRST if first == 0 else 0
+            chunk[-1][4] |= insim_.CCI_LAST if first + _MCI_CARS >= self.cars else 0
+            data = b''.join(insim_.CompCar.pack_s.pack(*car) for car in chunk)
+            mci.append(struct.pack('4B', (4 + len(data)) // 4, insim_.ISP_MCI, reqi, len(chunk)) + data)
+        data = b''.join(nodes)
+        if self.cars % 2:
+            data += b'\x00\x00'
+        nlp = struct.pack('4B', (4 + len(data)) // 4, insim_.ISP_NLP, reqi, self.cars) + data
+        return mci, nlp
+
+    def _stream(self, addr, rate, build):
+        period = 1.0 / rate
+        due = time.monotonic()
+        n = 0
+        while not self._closed.is_set():
+            now = time.monotonic()
+            if now < due:
+                self._closed.wait(due - now)
+                continue
+            lag = now - due
+            if lag > period:
+                self.late += 1
+                self.max_lag = max(self.max_lag, lag)
+                if lag > 1.0:
+                    # Too far behind to catch up, start again from now.
+                    due = now
+            try:
+                for packet in build(n):
+                    self._udp.sendto(packet, addr)
+                    self.sent += 1
+            except OSError:
+                pass
+            n += 1
+            due += period
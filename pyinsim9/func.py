@@ -6,6 +6,8 @@
 # GNU Lesser General Public License version 3 or any later version.
 #
 
+import functools
+import html
 import math
 import re
 import struct
@@ -15,7 +17,6 @@ import pyinsim9.strmanip as strmanip
 # import numpy as np
 
 
-_COLOUR_REGEX = re.compile(r'\^[0-9]')
 _COLOUR_CODE = {'black': b'^0', 'red': b'^1', 'green': b'^2', 'yellow': b'^3', 'blue': b'^4', 'pink': b'^5', 'lightblue': b'^6', 'white': b'^7', 'grey': b'^8', 'inherit': b'^9'}
 # Codes de couleur LFS (HTML approximatif)
 _COLOR_MAP = {'1': '#FF0000',  # Rouge
@@ -29,7 +30,16 @@ _COLOR_MAP = {'1': '#FF0000',  # Rouge
     '0': '#000000',  # Noir
 }
 _ENC_REGEX = re.compile(r'\^[LETBJCGHSK]')
-_ENC_COL_REGEX = re.compile(r'\^[LETBJCGHSK0-9]')
+# Colour codes, matching an escaped '^^' too so the '^' it stands for never
+# starts a code.
+_RUN_REGEX = re.compile(r'(\^[\^0-9])')
+_RUN_BYTES_REGEX = re.compile(rb'\^[\^0-9]')
+_HTML_DEFAULT = '#FFFFFF'
+_ANSI_COLOR_MAP = {'0': '\x1b[30m', '1': '\x1b[31m', '2': '\x1b[32m', '3': '\x1b[33m', '4': '\x1b[34m',
+    '5': '\x1b[35m', '6': '\x1b[36m', '7': '\x1b[37m', '8': '\x1b[90m', '9': '\x1b[39m'}
+_ANSI_RESET = '\x1b[0m'
+# Player names are rendered over and over.
+_RUNS_CACHE_SIZE = 1024
 
 
 _PENALTY_MESSAGE = {0: 'No penalty', 1: 'Drive through', 2: 'Drive through', 3: 'Stop&Go', 4: 'Stop&Go', 5: '30 sec penalty', 6: '45 sec penalty'}
@@ -37,9 +47,48 @@ _PENALTY_REASON = {0: 'unknown or cleared penalty', 1: 'penalty given by admin',
 
 _TYRE_COMPOUND = {None: '', 0: 'R1', 1: 'R2', 2: 'R3', 3: 'R4', 4: 'Road Super', 5: 'Road Normal', 6: 'Hybrid', 7: 'Knobby'}
 
+def _split_runs(text):
+    # Split gives the text before the first code, then each code followed by
+    # the text after it.
+    parts = _RUN_REGEX.split(text)
+    runs = []
+    colour = '9'
+    texts = [parts[0]]
+    for i in range(1, len(parts), 2):
+        code = parts[i][1]
+        if code == '^':
+            texts.append(parts[i])
+        elif code != colour:
+            run = ''.join(texts)
+            if run:
+                runs.append((colour, run))
+            texts = []
+            colour = code
+        texts.append(parts[i + 1])
+    run = ''.join(texts)
+    if run:
+        runs.append((colour, run))
+    return tuple(runs)
+
+@functools.lru_cache(maxsize=_RUNS_CACHE_SIZE)
+def colour_runs(str_):
+    """Split a string into a tuple of (colour, text) runs, where colour is
+    the code '0' to '9' and '9' is the default colour. LFS encoded bytes are
+    converted to unicode first, encoding markers (^L, ^E etc..) are stripped
+    from strings. An escaped '^^' is kept in the text either way. Results are
+    cached by the string passed in."""
+    if isinstance(str_, bytes):
+        text = strmanip._colour_text(str_)
+    else:
+        text = _ENC_REGEX.sub('', str_)
+    return _split_runs(text)
+
+@functools.lru_cache(maxsize=_RUNS_CACHE_SIZE)
 def stripcols(str_):
     """Strip color codes (^3, ^7 etc..) from a string."""
-    return _COLOUR_REGEX.sub('', str_)
+    if isinstance(str_, bytes):
+        return _RUN_BYTES_REGEX.sub(lambda match: match.group() if match.group() == b'^^' else b'', str_)
+    return ''.join(text for colour, text in _split_runs(str_))
 
 def coltoinsim(str_):
     return _COLOUR_CODE[str_]
@@ -50,27 +99,22 @@ def colfromcode(byte_):
             return col
     return ''
 
+@functools.lru_cache(maxsize=_RUNS_CACHE_SIZE)
 def lfs_color_to_html(text: str) -> str:
     """
-    Convertit un texte LFS avec codes ^1 à ^8 en HTML coloré pour QLabel.
+    Convertit un texte LFS avec codes ^0 à ^9 en HTML coloré pour QLabel,
+    un <span> par suite de caractères de la même couleur.
     """
-    result = ""
-    current_color = '#FFFFFF'  # Couleur par défaut
-    i = 0
-    while i < len(text):
-        if text[i] == '^' and i + 1 < len(text) and text[i+1] in _COLOR_MAP:
-            current_color = _COLOR_MAP[text[i+1]]
-            i += 2
-        else:
-            safe_char = (
-                text[i].replace("&", "&amp;")
-                        .replace("<", "&lt;")
-                        .replace(">", "&gt;")
-            )
-            result += f'<span style="color:{current_color}">{safe_char}</span>'
-            i += 1
-
-    return result
+    return ''.join('<span style="color:%s">%s</span>' % (_COLOR_MAP.get(colour, _HTML_DEFAULT), html.escape(run, False))
+                   for colour, run in colour_runs(text))
+
+@functools.lru_cache(maxsize=_RUNS_CACHE_SIZE)
+def lfs_color_to_ansi(text):
+    """Convert a string with LFS colour codes to ANSI terminal colours."""
+    runs = colour_runs(text)
+    if not runs:
+        return ''
+    return ''.join(_ANSI_COLOR_MAP[colour] + run for colour, run in runs) + _ANSI_RESET
 
 
 def stripenc(str_, cols=True):
@@ -78,7 +122,7 @@ def stripenc(str_, cols=True):
     stripped of encoding markers cannot be converted to unicode."""
     if cols:
         return _ENC_REGEX.sub('', str_)        
-    return _ENC_COL_REGEX.sub('', str_)
+    return _ENC_REGEX.sub('', stripcols(str_))
 
 def tounicode(str_, cols=True, default='L'):
     """Convert a LFS encoded string to unicode."""
@@ -443,11 +443,16 @@ LCL_Mask_ExtraLight = 0x00400000    # bit  22    (Switches & 0x00400000) - Extra
 def _eat_null_chars(str_):
     return str_.rstrip(b'\x00')
 
+def _car_name(cname):
+    # Official cars are 3 letters, mods are a reversed 3 byte hex ID.
+    return _eat_null_chars(cname).decode() if cname[0:3].isalnum() else cname[::-1].hex()
+
 
 class IS_ISI(object):
     """InSim Init - packet to initialise the InSim system.
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'Zero', 'UDPPort', 'Flags', 'InSimVer', 'Prefix', 'Interval', 'Admin', 'IName')
     pack_s = struct.Struct('4B2HBcH15sx15sx')
     def __init__(self, ReqI=0, UDPPort=0, Flags=0, Prefix=b'\x00', Interval=0, Admin=b'', IName=b'pyinsim'):
         """Create a new IS_ISI packet.
@@ -480,6 +485,7 @@ class IS_VER(object):
     """VERsion.
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'Zero', 'Version', 'Product', 'InSimVer', 'Spare')
     pack_s = struct.Struct('4B7sx5sxBB')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.Zero, self.Version, self.Product, self.InSimVer, self.Spare = self.pack_s.unpack(data)
@@ -491,6 +497,7 @@ class IS_TINY(object):
     """General purpose packet.
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'SubT')
     pack_s = struct.Struct('4B')
     def __init__(self, ReqI=0, SubT=TINY_NONE):
         """Initialise a new IS_TINY packet.
@@ -514,6 +521,7 @@ class IS_SMALL(object):
     """General purpose packet.
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'SubT', 'UVal')
     pack_s = struct.Struct('4BI')
     def __init__(self, ReqI=0, SubT=SMALL_NONE, UVal=0):
         """Initialise a new IS_SMALL packet.
@@ -539,6 +547,7 @@ class IS_TTC(object):
     """General purpose 8 byte packet (Target To Connection)
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'SubT', 'UCID', 'B1', 'B2', 'B3')
     pack_s = struct.Struct('8B')
     def __init__(self, ReqI=0, SubT=TTC_NONE, UCID=0, B1=0, B2=0, B3=0):
         self.Size = 2
@@ -558,6 +567,7 @@ class IS_STA(object):
     this packet send a ``IS_TINY`` with a ``ReqI`` of non-zero and a ``SubT`` of ``TINY_STA``.
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'Zero', 'ReplaySpeed', 'Flags', 'InGameCam', 'ViewPLID', 'NumP', 'NumConns', 'NumFinished', 'RaceInProg', 'QualMins', 'RaceLaps', 'Spare2', 'Spare3', 'Track', 'Weather', 'Wind')
     pack_s = struct.Struct('4BfH10B5sx2B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.Zero, self.ReplaySpeed, self.Flags, self.InGameCam, self.ViewPLID, self.NumP, self.NumConns, self.NumFinished, self.RaceInProg, self.QualMins, self.RaceLaps, self.Spare2, self.Spare3, self.Track, self.Weather, self.Wind = self.pack_s.unpack(data)
@@ -568,6 +578,7 @@ class IS_SCH(object):
     """Single CHaracter
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'Zero', 'CharB', 'Flags', 'Spare2', 'Spare3')
     pack_s = struct.Struct('4Bc3B')
     def __init__(self, ReqI=0, CharB=b'\x00', Flags=0):
         """Initialise a new IS_SCH packet.
@@ -594,6 +605,7 @@ class IS_SFP(object):
     must be set by using key-presses or slash commands.
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'Zero', 'Flag', 'OffOn', 'Sp3')
     pack_s = struct.Struct('4BH2B')
     def __init__(self, ReqI=0, Flag=0, OffOn=0):
         """Initialise a new IS_SFP packet.
@@ -618,6 +630,7 @@ class IS_SCC(object):
     """Set Car Camera - Simplified camera packet (not SHIFT+U mode)
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'Zero', 'ViewPLID', 'InGameCam', 'Sp2', 'Sp3')
     pack_s = struct.Struct('8B')
     def __init__(self, ReqI=0, ViewPLID=0, InGameCam=0):
         """Initialise a new IS_SCC packet.
@@ -643,6 +656,7 @@ class IS_CPP(object):
     """Cam Pos Pack - Full camera packet (in car or SHIFT+U mode)
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'Zero', 'Pos', 'H', 'P', 'R', 'ViewPLID', 'InGameCam', 'FOV', 'Time', 'Flags')
     pack_s = struct.Struct('4B3i3H2Bf2H')
     def __init__(self, ReqI=0, Pos=[0,0,0], H=0, P=0, R=0, ViewPLID=0, InGameCam=0, FOV=0.0, Time=0, Flags=0):
         """Initialise a new IS_CPP packet.
@@ -685,6 +699,7 @@ class IS_ISM(object):
     LFS will send this packet when a host is started or joined.
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'Zero', 'Host', 'Sp1', 'Sp2', 'Sp3', 'HName')
     pack_s = struct.Struct('8B31sx')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.Zero, self.Host, self.Sp1, self.Sp2, self.Sp3, self.HName = self.pack_s.unpack(data)
@@ -695,11 +710,12 @@ class IS_MSO(object):
     """MSg Out - system messages and user messages
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'Zero', 'UCID', 'PLID', 'UserType', 'TextStart', 'Msg')
     pack_s = struct.Struct('8B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.Zero, self.UCID, self.PLID, self.UserType, self.TextStart = self.pack_s.unpack(data[:8])
         #self.Msg = struct.unpack('%dsx' % int(self.Size - 9), data[8:])
-        self.Msg = data[8:].split(b'\x00')[0]
+        self.Msg = bytes(data[8:]).split(b'\x00')[0]
         #self.Msg = _eat_null_chars(self.Msg)
         return self
 
@@ -707,6 +723,7 @@ class IS_III(object):
     """InsIm Info - /i message from user to host's InSim
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'Zero', 'UCID', 'PLID', 'Sp2', 'Sp3', 'Msg')
     pack_s = struct.Struct('8B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.Zero, self.UCID, self.PLID, self.Sp2, self.Sp3 = self.pack_s.unpack(data[:8])
@@ -718,6 +735,7 @@ class IS_MST(object):
     """MSg Type - send to LFS to type message or command
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'Zero', 'Msg')
     pack_s = struct.Struct('4B63sx')
     def __init__(self, ReqI=0, Msg=b''):
         """Initialise a new IS_MST packet.
@@ -739,6 +757,7 @@ class IS_MTC(object):
     """Msg To Connection - hosts only - send to a connection or a player
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'Sound', 'UCID', 'PLID', 'Sp2', 'Sp3', 'Msg')
     pack_s = struct.Struct('8B')
     def __init__(self, ReqI=0, Sound=0, UCID=0, PLID=0, Msg=b''):
         """Initialise a new IS_MTC packet.
@@ -768,6 +787,7 @@ class IS_MOD(object):
     """MODe : send to LFS to change screen mode
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'Zero', 'Bits16', 'RR', 'Width', 'Height')
     pack_s = struct.Struct('4B4i')
     def __init__(self, ReqI=0, Bits16=0, RR=0, Width=0, Height=0):
         """Initialise a new IS_MOD packet.
@@ -795,6 +815,7 @@ class IS_VTN(object):
     """VoTe Notify
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'Zero', 'UCID', 'Action', 'Spare2', 'Spare3')
     pack_s = struct.Struct('8B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.Zero, self.UCID, self.Action, self.Spare2, self.Spare3 = self.pack_s.unpack(data)
@@ -804,6 +825,7 @@ class IS_RST(object):
     """Race STart
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'Zero', 'RaceLaps', 'QualMins', 'NumP', 'Timing', 'Track', 'Weather', 'Wind', 'Flags', 'NumNodes', 'Finish', 'Split1', 'Split2', 'Split3')
     pack_s = struct.Struct('8B5sx2B6H')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.Zero, self.RaceLaps, self.QualMins, self.NumP, self.Timing, self.Track, self.Weather, self.Wind, self.Flags, self.NumNodes, self.Finish, self.Split1, self.Split2, self.Split3 = self.pack_s.unpack(data)
@@ -814,6 +836,7 @@ class IS_NCN(object):
     """New ConN
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'UCID', 'UName', 'PName', 'Admin', 'Total', 'Flags', 'Sp3')
     pack_s = struct.Struct('4B23sx23sx4B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.UCID, self.UName, self.PName, self.Admin, self.Total, self.Flags, self.Sp3 = self.pack_s.unpack(data)
@@ -825,6 +848,7 @@ class IS_NCI(object):
     """New Connection Info
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'UCID', 'Language', 'Sp1', 'Sp2', 'Sp3', 'UserID', 'IPAddress')
     pack_s = struct.Struct('8B2I')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.UCID, self.Language, self.Sp1, self.Sp2, self.Sp3, self.UserID, self.IPAddress = self.pack_s.unpack(data)
@@ -834,6 +858,7 @@ class IS_SLC(object):
     """SeLected Car - sent when a connection selects a car (empty if no car)
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'UCID', 'CName')
     pack_s = struct.Struct('8B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.UCID, self.CName[0], self.CName[1], self.CName[2], self.CName[3] = self.pack_s.unpack(data)
@@ -844,12 +869,14 @@ class IS_MAL(object):
     """SeLected Car - sent when a connection selects a car (empty if no car)
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'NumM', 'UCID', 'Flags', 'Sp1', 'Sp2', 'SkinID')
     pack_s = struct.Struct('8B1I')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.NumM, self.UCID, self.Flags, self.Sp1, self.Sp2, self.SkinID = self.pack_s.unpack(data)
         return self
 
 class in_addr(object):
+    __slots__ = ('IP',)
     pack_s = struct.Struct('4B')
     def __init__(self, IP='123.123.123.123'):
         self.IP = IP
@@ -857,6 +884,7 @@ class in_addr(object):
         return self.pack_s.unpack(self.IP.encode())
 
 class IS_IPB(object):
+    __slots__ = ('Size', 'Type', 'ReqI', 'NumB', 'Sp0', 'Sp1', 'Sp2', 'Sp3', 'BanIPs')
     pack_s = struct.Struct('8B')
     def __init__(self, ReqI=0, NumB=0, BanIPs=[]):
         self.Size = 2
@@ -879,6 +907,7 @@ class IS_CIM(object):
     """Conn Interface Mode
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'UCID', 'Mode', 'SubMode', 'SelType', 'Sp3')
     pack_s = struct.Struct('8B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.UCID, self.Mode, self.SubMode, self.SelType, self.Sp3 = self.pack_s.unpack(data)
@@ -920,6 +949,7 @@ class IS_CNL(object):
     """ConN Leave
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'UCID', 'Reason', 'Total', 'Sp2', 'Sp3')
     pack_s = struct.Struct('8B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.UCID, self.Reason, self.Total, self.Sp2, self.Sp3 = self.pack_s.unpack(data)
@@ -929,6 +959,7 @@ class IS_CPR(object):
     """Conn Player Rename
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'UCID', 'PName', 'Plate')
     pack_s = struct.Struct('4B23sx7sx')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.UCID, self.PName, self.Plate = self.pack_s.unpack(data)
@@ -940,6 +971,7 @@ class IS_NPL(object):
     """New PLayer joining race (if PLID already exists, then leaving pits)
 
     """
+    __slots__ = ('Tyres', 'Size', 'Type', 'ReqI', 'PLID', 'UCID', 'PType', 'Flags', 'PName', 'Plate', 'CName', 'SName', 'H_Mass', 'H_TRes', 'Model', 'Pass', 'RWAdj', 'FWAdj', 'Sp2', 'Sp3', 'SetF', 'NumP', 'Config', 'Fuel')
     # KingOfIce - update 0.6V
     # KingOfIce - update 0.7A
     pack_s = struct.Struct('6BH23sx8s3sx15sx16B')
@@ -947,7 +979,7 @@ class IS_NPL(object):
         self.Tyres = [0,0,0,0]
         self.Size, self.Type, self.ReqI, self.PLID, self.UCID, self.PType, self.Flags, self.PName, self.Plate, self.CName, self.SName, self.Tyres[0], self.Tyres[1], self.Tyres[2], self.Tyres[3], self.H_Mass, self.H_TRes, self.Model, self.Pass, self.RWAdj, self.FWAdj, self.Sp2, self.Sp3, self.SetF, self.NumP, self.Config, self.Fuel = self.pack_s.unpack(data)
         self.PName = _eat_null_chars(self.PName)
-        self.CName = _eat_null_chars(self.CName).decode() if self.CName[0:3].isalnum() else self.CName[::-1].hex()
+        self.CName = _car_name(self.CName)
         self.SName = _eat_null_chars(self.SName)
         return self
 
@@ -955,6 +987,7 @@ class IS_PLP(object):
     """PLayer Pits (go to settings - stays in player list)
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'PLID')
     pack_s = struct.Struct('4B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.PLID = self.pack_s.unpack(data)
@@ -964,6 +997,7 @@ class IS_PLL(object):
     """PLayer Leave race (spectate - removed from player list)
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'PLID')
     pack_s = struct.Struct('4B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.PLID = self.pack_s.unpack(data)
@@ -973,6 +1007,7 @@ class IS_LAP(object):
     """LAP time
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'PLID', 'LTime', 'ETime', 'LapsDone', 'Flags', 'Sp0', 'Penalty', 'NumStops', 'Fuel200')
     pack_s = struct.Struct('4B2I2H4B')
     def unpack(self, data):
         # KingOfIce - update 0.6V
@@ -983,6 +1018,7 @@ class IS_SPX(object):
     """SPlit X time
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'PLID', 'STime', 'ETime', 'Split', 'Penalty', 'NumStops', 'Fuel200')
     pack_s = struct.Struct('4B2I4B')
     def unpack(self, data):
         # KingOfIce - update 0.6V
@@ -993,6 +1029,7 @@ class IS_PIT(object):
     """PIT stop (stop at pit garage)
 
     """
+    __slots__ = ('Tyres', 'Size', 'Type', 'ReqI', 'PLID', 'LapsDone', 'Flags', 'FuelAdd', 'Penalty', 'NumStops', 'Sp3', 'Work', 'Spare')
     pack_s = struct.Struct('4B2H8B2I')
     def unpack(self, data):
         self.Tyres = [0, 0, 0, 0]
@@ -1004,6 +1041,7 @@ class IS_PSF(object):
     """Pit Stop Finished
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'PLID', 'STime', 'Spare')
     pack_s = struct.Struct('4B2I')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.PLID, self.STime, self.Spare = self.pack_s.unpack(data)
@@ -1013,6 +1051,7 @@ class IS_PLA(object):
     """Pit LAne
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'PLID', 'Fact', 'Sp1', 'Sp2', 'Sp3')
     pack_s = struct.Struct('8B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.PLID, self.Fact, self.Sp1, self.Sp2, self.Sp3 = self.pack_s.unpack(data)
@@ -1022,6 +1061,7 @@ class IS_CCH(object):
     """Camera CHange
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'PLID', 'Camera', 'Sp1', 'Sp2', 'Sp3')
     pack_s = struct.Struct('8B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.PLID, self.Camera, self.Sp1, self.Sp2, self.Sp3 = self.pack_s.unpack(data)
@@ -1031,6 +1071,7 @@ class IS_PEN(object):
     """PENalty (given or cleared)
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'PLID', 'OldPen', 'NewPen', 'Reason', 'Sp3')
     pack_s = struct.Struct('8B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.PLID, self.OldPen, self.NewPen, self.Reason, self.Sp3 = self.pack_s.unpack(data)
@@ -1040,6 +1081,7 @@ class IS_TOC(object):
     """Take Over Car
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'PLID', 'OldUCID', 'NewUCID', 'Sp2', 'Sp3')
     pack_s = struct.Struct('8B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.PLID, self.OldUCID, self.NewUCID, self.Sp2, self.Sp3 = self.pack_s.unpack(data)
@@ -1049,6 +1091,7 @@ class IS_FLG(object):
     """FLaG (yellow or blue flag changed)
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'PLID', 'OffOn', 'Flag', 'CarBehind', 'Sp3')
     pack_s = struct.Struct('8B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.PLID, self.OffOn, self.Flag, self.CarBehind, self.Sp3 = self.pack_s.unpack(data)
@@ -1058,6 +1101,7 @@ class IS_PFL(object):
     """Player FLags (help flags changed)
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'PLID', 'Flags', 'Spare')
     pack_s = struct.Struct('4B2H')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.PLID, self.Flags, self.Spare = self.pack_s.unpack(data)
@@ -1067,6 +1111,7 @@ class IS_FIN(object):
     """FINished race notification (not a final result - use :class:`IS_RES`)
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'PLID', 'TTime', 'BTime', 'SpA', 'NumStops', 'Confirm', 'SpB', 'LapsDone', 'Flags')
     pack_s = struct.Struct('4B2I4B2H')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.PLID, self.TTime, self.BTime, self.SpA, self.NumStops, self.Confirm, self.SpB, self.LapsDone, self.Flags = self.pack_s.unpack(data)
@@ -1076,13 +1121,14 @@ class IS_RES(object):
     """RESult (qualify or confirmed finish)
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'PLID', 'UName', 'PName', 'Plate', 'CName', 'TTime', 'BTime', 'SpA', 'NumStops', 'Confirm', 'SpB', 'LapsDone', 'Flags', 'ResultNum', 'NumRes', 'PSeconds')
     pack_s = struct.Struct('4B23sx23sx7sx3sx2I4B2H2BH')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.PLID, self.UName, self.PName, self.Plate, self.CName, self.TTime, self.BTime, self.SpA, self.NumStops, self.Confirm, self.SpB, self.LapsDone, self.Flags, self.ResultNum, self.NumRes, self.PSeconds = self.pack_s.unpack(data)
         self.UName = _eat_null_chars(self.UName)
         self.PName = _eat_null_chars(self.PName)
         self.Plate = _eat_null_chars(self.Plate) # No trailing zero
-        self.CName = _eat_null_chars(self.CName).decode() if self.CName[0:3].isalnum() else self.CName[::-1].hex()
+        self.CName = _car_name(self.CName)
         return self
 
 class IS_REO(object):
@@ -1090,6 +1136,7 @@ class IS_REO(object):
     is filled in automatically from the PLID length.
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'NumP', 'PLID')
     pack_s = struct.Struct('4B')
     def __init__(self, ReqI=0, PLID=[]):
         """Initialise a new IS_REO packet.
@@ -1116,6 +1163,7 @@ class IS_NLP(object):
     """Node and Lap Packet - variable size
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'NumP', 'Info')
     pack_s = struct.Struct('4B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.NumP = self.pack_s.unpack(data[:4])
@@ -1127,6 +1175,7 @@ class NodeLap(object):
     """Car info in 6 bytes - there is an array of these in the :class:`IS_NLP`
 
     """
+    __slots__ = ('Node', 'Lap', 'PLID', 'Position')
     pack_s = struct.Struct('2H2B')
     def __init__(self, data, index):
         """Initialise a new NodeLap sub-packet.
@@ -1140,6 +1189,7 @@ class IS_MCI(object):
     """Multi Car Info - if more than 8 in race then more than one of these is sent
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'NumC', 'Info')
     pack_s = struct.Struct('4B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.NumC = self.pack_s.unpack(data[:4])
@@ -1152,6 +1202,7 @@ class CompCar(object):
     """Car info in 28 bytes - there is an array of these in the :class:`IS_MCI`
 
     """
+    __slots__ = ('Node', 'Lap', 'PLID', 'Position', 'Info', 'Sp3', 'X', 'Y', 'Z', 'Speed', 'Direction', 'Heading', 'AngVel')
     pack_s = struct.Struct('2H4B3i3Hh')
     def __init__(self, data, index):
         """Initialise a new CompCar sub-packet.
@@ -1163,6 +1214,7 @@ class IS_MSX(object):
     """MSg eXtended - like ``IS_MST`` but longer (not for commands)
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'Zero', 'Msg')
     pack_s = struct.Struct('4B95sx')
     def __init__(self, ReqI=0, Msg=b''):
         """Initialise a new IS_MSX packet.
@@ -1184,6 +1236,7 @@ class IS_MSL(object):
     """MSg Local - message to appear on local computer only
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'Sound', 'Msg')
     pack_s = struct.Struct('4B127sx')
     def __init__(self, ReqI=0, Sound=0, Msg=b''):
         """Initialise a new IS_MSL packet.
@@ -1206,6 +1259,7 @@ class IS_CRS(object):
     """Car ReSet
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'PLID')
     pack_s = struct.Struct('4B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.PLID = self.pack_s.unpack(data)
@@ -1215,6 +1269,7 @@ class IS_BFN(object):
     """Button FunctioN - delete buttons / receive button requests
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'SubT', 'UCID', 'ClickID', 'ClickMax', 'Inst')
     pack_s = struct.Struct('8B')
     def __init__(self, ReqI=0, SubT=0, UCID=0, ClickID=0, ClickMax=0, Inst=0):
         """Initialise a new IS_BFN packet.
@@ -1246,6 +1301,7 @@ class IS_AXI(object):
     """AutoX Info
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'Zero', 'AXStart', 'NumCP', 'NumO', 'LName')
     pack_s = struct.Struct('6BH31sx')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.Zero, self.AXStart, self.NumCP, self.NumO, self.LName = self.pack_s.unpack(data)
@@ -1256,6 +1312,7 @@ class IS_AXO(object):
     """AutoX Object
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'PLID')
     pack_s = struct.Struct('4B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.PLID = self.pack_s.unpack(data)
@@ -1265,6 +1322,7 @@ class IS_BTN(object):
     """BuTtoN - button header - followed by 0 to 240 characters
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'UCID', 'ClickID', 'Inst', 'BStyle', 'TypeIn', 'L', 'T', 'W', 'H', 'Text')
     pack_s = struct.Struct('12B')
     def __init__(self, ReqI=0, UCID=0, ClickID=0, Inst=0, BStyle=0, TypeIn=0, L=0, T=0, W=0, H=0, Text=b''):
         """Initialise a new IS_BTN packet.
@@ -1312,6 +1370,7 @@ class IS_BTC(object):
     """BuTton Click - sent back when user clicks a button
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'UCID', 'ClickID', 'Inst', 'CFlags', 'Sp3')
     pack_s = struct.Struct('8B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.UCID, self.ClickID, self.Inst, self.CFlags, self.Sp3 = self.pack_s.unpack(data)
@@ -1321,6 +1380,7 @@ class IS_BTT(object):
     """BuTton Type - sent back when user types into a text entry button
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'UCID', 'ClickID', 'Inst', 'TypeIn', 'Sp3', 'Text')
     pack_s = struct.Struct('8B95sx')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.UCID, self.ClickID, self.Inst, self.TypeIn, self.Sp3, self.Text = self.pack_s.unpack(data)
@@ -1331,6 +1391,7 @@ class IS_RIP(object):
     """Replay Information Packet
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'Error', 'MPR', 'Paused', 'Options', 'Sp3', 'CTime', 'TTime', 'RName')
     pack_s = struct.Struct('8B2L63sx')
     def __init__(self, ReqI=0, Error=0, MPR=0, Paused=0, Options=0, CTime=0, TTime=0, RName=b''):
         """Initialise a new IS_RIP packet.
@@ -1368,6 +1429,7 @@ class IS_SSH(object):
     """ScreenSHot
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'Error', 'Sp0', 'Sp1', 'Sp2', 'Sp3', 'Name')
     pack_s = struct.Struct('8B31sx')
     def __init__(self, ReqI=0, Error=0, Name=b''):
         """Initialise a new IS_SSH packet.
@@ -1398,6 +1460,7 @@ class CarContact(object):
     """Info about one car in a contact - two of these in the IS_CON
 
     """
+    __slots__ = ('PLID', 'Info', 'Sp2', 'Steer', 'ThrBrk', 'CluHan', 'GearSp', 'Speed', 'Direction', 'Heading', 'AccelF', 'AccelR', 'X', 'Y')
     pack_s = struct.Struct('3Bb6b2B2h')
     def __init__(self, data):
         self.PLID, self.Info, self.Sp2, self.Steer, self.ThrBrk, self.CluHan, self.GearSp, self.Speed, self.Direction, self.Heading, self.AccelF, self.AccelR, self.X, self.Y = self.pack_s.unpack(data)
@@ -1406,6 +1469,7 @@ class IS_CON(object):
     """CONtact - between two cars (A and B are sorted by PLID)
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'Zero', 'SpClose', 'Time', 'A', 'B')
     pack_s = struct.Struct('4B2H')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.Zero, self.SpClose, self.Time = self.pack_s.unpack(data[:8])
@@ -1414,6 +1478,7 @@ class IS_CON(object):
         return self
 
 class CarContOBJ(object):
+    __slots__ = ('Direction', 'Heading', 'Speed', 'Zbyte', 'X', 'Y')
     def __init__(self):
         self.Direction = 0
         self.Heading = 0
@@ -1428,6 +1493,7 @@ OBH_WAS_MOVING = 4
 OBH_ON_SPOT = 8
 
 class IS_OBH(object):
+    __slots__ = ('C', 'Size', 'Type', 'ReqI', 'PLID', 'SpClose', 'Time', 'X', 'Y', 'Zbyte', 'Sp1', 'Index', 'OBHFlags')
     pack_s = struct.Struct('4B2H4B2h2h4B')
     def unpack(self, data):
         self.C = CarContOBJ()
@@ -1435,6 +1501,7 @@ class IS_OBH(object):
         return self
 
 class IS_HLV(object):
+    __slots__ = ('C', 'Size', 'Type', 'ReqI', 'PLID', 'HLVC', 'Sp1', 'Time')
     pack_s = struct.Struct('6BH4B2h')
     def unpack(self, data):
         self.C = CarContOBJ()
@@ -1442,6 +1509,7 @@ class IS_HLV(object):
         return self
 
 class IS_UCO(object):
+    __slots__ = ('C', 'Size', 'Type', 'ReqI', 'PLID', 'Sp0', 'UCOAction', 'Sp2', 'Sp3', 'Time', 'Info')
     pack_s = struct.Struct('8BI4B2h')
     def unpack(self, data):
         self.C = CarContOBJ() # 4B2h
@@ -1455,6 +1523,7 @@ UCO_CP_FWD = 2
 UCO_CP_REV = 3
 
 class IS_CSC(object):
+    __slots__ = ('C', 'Size', 'Type', 'ReqI', 'PLID', 'Sp0', 'CSCAction', 'Sp2', 'Sp3', 'Time')
     pack_s = struct.Struct('8BI4B2h')
     def unpack(self, data):
         self.C = CarContOBJ() # 4B2h
@@ -1468,6 +1537,7 @@ class IS_OCO(object):
     """ Object COntrol
 
     """
+    __slots__ = ('Size', 'Type', 'ReqI', 'Zero', 'OCOAction', 'Index', 'Identifier', 'Data')
     pack_s = struct.Struct('8B')
     def __init__(self, OCOAction=0, Index=0, Identifier=0, Data=0):
         """ Initialise a new IS_OCO packet
@@ -1514,6 +1584,7 @@ OCO_INDEX_MAIN = 240    # special value to override the main start light system
 
 
 class ObjectInfo(object):
+    __slots__ = ('X', 'Y', 'Zbyte', 'Flags', 'Index', 'Heading')
     pack_s = struct.Struct('2h4B')
     def __init__(self, data, index):
         self.X, self.Y, self.Zbyte, self.Flags, self.Index, self.Heading = self.pack_s.unpack(data[index:index+8])
@@ -1536,6 +1607,7 @@ PMO_SELECTION_REAL = 4
 PMO_AVOID_CHECK = 8
 
 class IS_AXM(object):
+    __slots__ = ('Size', 'Type', 'ReqI', 'NumO', 'UCID', 'PMOAction', 'PMOFlags', 'Sp3', 'Info')
     pack_s = struct.Struct('8B')
     def __init__(self, ReqI=0, NumO=0, UCID=0, PMOAction=0, PMOFlags=0, Sp3=0, Info=[]):
         self.Size = 2
@@ -1559,6 +1631,7 @@ class IS_AXM(object):
         return self
 
 class IS_ACR(object):
+    __slots__ = ('Size', 'Type', 'ReqI', 'Zero', 'UCID', 'Admin', 'Result', 'Sp3', 'Text')
     pack_s = struct.Struct('8B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.Zero, self.UCID, self.Admin, self.Result, self.Sp3 = self.pack_s.unpack(data[:8])
@@ -1595,6 +1668,7 @@ CS_NUM			= 20     # number of values above
 #255 - stop control
 
 class AIInputVal(object):
+    __slots__ = ('Input', 'Time', 'Value')
     pack_s = struct.Struct('2BH')
     def __init__(self, Input, Time, Value):
         self.Input, self.Time, self.Value = Input, Time, Value
@@ -1602,6 +1676,7 @@ class AIInputVal(object):
         return self.pack_s.pack(self.Input, self.Time, self.Value)
 
 class IS_AIC(object):
+    __slots__ = ('Size', 'Type', 'ReqI', 'PLID', 'Inputs')
     pack_s = struct.Struct('4B')
     def __init__(self, ReqI=0, PLID=0, Inputs=[]):
         self.Size = 1
@@ -1629,6 +1704,7 @@ AIFLAGS_CHUP = 4        # upshift lever currently held
 AIFLAGS_CHDN = 8		# downshift lever currently held
 
 class IS_AII(object):
+    __slots__ = ('Size', 'Type', 'ReqI', 'PLID', 'OSData', 'Flags', 'Gear', 'RPM', 'ShoLights')
     pack_s = struct.Struct('4B12f3i4B3f4I')
     def unpack(self, data):
         t = self.pack_s.unpack(data)
@@ -1670,6 +1746,7 @@ CAR_FBM = 0x80000
 CAR_ALL = 0xffffffff
 
 class IS_PLC(object):
+    __slots__ = ('Size', 'Type', 'ReqI', 'Zero', 'UCID', 'Sp1', 'Sp2', 'Sp3', 'Cars')
     pack_s = struct.Struct('8BI')
     def __init__(self, UCID=0, Cars=CAR_NONE):
         self.Size = 3
@@ -1694,12 +1771,14 @@ JRR_6 = 6
 JRR_7 = 7
 
 class IS_JRR(object):
+    __slots__ = ('Size', 'Type', 'ReqI', 'PLID', 'UCID', 'JRRAction', 'Sp2', 'Sp3', 'X', 'Y', 'Zbyte', 'Flags', 'Index', 'Heading')
     pack_s = struct.Struct('8B2h4B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.PLID, self.UCID, self.JRRAction, self.Sp2, self.Sp3, self.X, self.Y, self.Zbyte, self.Flags, self.Index, self.Heading = self.pack_s.unpack(data)
         return self
 
 class CarHCP(object):
+    __slots__ = ('H_Mass', 'H_TRes')
     pack_s = struct.Struct('2B')
     def __init__(self, H_Mass=0, H_TRes=0):
         self.H_Mass = H_Mass
@@ -1708,6 +1787,7 @@ class CarHCP(object):
         return self.pack_s.pack(self.H_Mass, self.H_TRes)
 
 class IS_HCP(object):
+    __slots__ = ('Size', 'Type', 'ReqI', 'Zero', 'Info')
     pack_s = struct.Struct('4B')
     def __init__(self, ReqI=0, Zero=0, Info=[]):
         self.Size = 17
@@ -1720,6 +1800,7 @@ class IS_HCP(object):
         return data + ''.join([info.pack() for info in self.Info])
 
 class PlayerHCap(object):
+    __slots__ = ('PLID', 'Flags', 'H_Mass', 'H_TRes')
     pack_s = struct.Struct('4B')
     def __init__(self, PLID=0, H_Mass=0, H_TRes=0):
         self.PLID = PLID
@@ -1733,6 +1814,7 @@ class PlayerHCap(object):
 
 
 class IS_PLH(object):
+    __slots__ = ('Size', 'Type', 'ReqI', 'NumP', 'HCaps')
     pack_s = struct.Struct('4B')
     def __init__(self, ReqI=0, NumP=0,HCaps=[]):
         self.Size = 1
@@ -1775,6 +1857,7 @@ IR_ERR_SPEC     = 5
 IR_ERR_NOSPEC   = 6
 
 class IR_HLR(object):
+    __slots__ = ('Size', 'Type', 'ReqI', 'Sp0')
     pack_s = struct.Struct('4B')
     def __init__(self, ReqI=0):
         self.Size = 1
@@ -1785,6 +1868,7 @@ class IR_HLR(object):
         return self.pack_s.pack(self.Size, self.Type, self.ReqI, self.Sp0)
 
 class IR_HOS(object):
+    __slots__ = ('Size', 'Type', 'ReqI', 'NumHosts', 'Info')
     pack_s = struct.Struct('4B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.NumHosts = self.pack_s.unpack(data[:4])
@@ -1793,6 +1877,7 @@ class IR_HOS(object):
         return self
 
 class HInfo(object):
+    __slots__ = ('HName', 'Track', 'Flags', 'NumConns')
     pack_s = struct.Struct('31sx5sx2B')
     def __init__(self, data, index):
         self.HName, self.Track, self.Flags, self.NumConns = self.pack_s.unpack(data[index:index+40])
@@ -1800,6 +1885,7 @@ class HInfo(object):
         self.Track = _eat_null_chars(self.Track)
 
 class IR_SEL(object):
+    __slots__ = ('Size', 'Type', 'ReqI', 'Zero', 'HName', 'Admin', 'Spec')
     pack_s = struct.Struct('4B31sx15sx15sx')
     def __init__(self, ReqI=0, HName=b'', Admin=b'', Spec=b''):
         self.Size = 17
@@ -1813,6 +1899,7 @@ class IR_SEL(object):
         return self.pack_s.pack(self.Size, self.Type, self.ReqI, self.Zero, self.HName, self.Admin, self.Spec)
 
 class IR_ARQ(object):
+    __slots__ = ('Size', 'Type', 'ReqI', 'Sp0')
     pack_s = struct.Struct('4B')
     def __init__(self, ReqI=0):
         self.Size = 1
@@ -1823,18 +1910,21 @@ class IR_ARQ(object):
         return self.pack_s.pack(self.Size, self.Type, self.ReqI, self.Sp0)
 
 class IR_ARP(object):
+    __slots__ = ('Size', 'Type', 'ReqI', 'Admin')
     pack_s = struct.Struct('4B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.Admin = self.pack_s.unpack(data)
         return self
 
 class IR_ERR(object):
+    __slots__ = ('Size', 'Type', 'ReqI', 'ErrNo')
     pack_s = struct.Struct('4B')
     def unpack(self, data):
         self.Size, self.Type, self.ReqI, self.ErrNo = self.pack_s.unpack(data)
         return self
 
 class OutSimPack(object):
+    __slots__ = ('Time', 'AngVel', 'Heading', 'Pitch', 'Roll', 'Accel', 'Vel', 'Pos', 'ID')
     pack_s = struct.Struct('I12f3i')
     def __init__(self):
         self.Time = 0
@@ -1876,6 +1966,7 @@ DL_NUM= 4096
 
 
 class IS_OBH(object):
+    __slots__ = ('C', 'Size', 'Type', 'ReqI', 'PLID', 'SpClose', 'Time', 'X', 'Y', 'Zbyte', 'Sp1', 'Index', 'OBHFlags')
     pack_s = struct.Struct('4B2H4B2h2h4B')
     def unpack(self, data):
         self.C = CarContOBJ()
@@ -1898,6 +1989,7 @@ OSO_EXTRA_1 = 256
 
 
 class OutSimMain(object):
+    __slots__ = ('AngVel', 'Heading', 'Pitch', 'Roll', 'Accel', 'Vel', 'Pos')
     #pack_s = struct.Struct('12f3i')
     def __init__(self):
         self.AngVel = [0.0, 0.0, 0.0]
@@ -1912,6 +2004,7 @@ class OutSimMain(object):
         return self
 
 class OutSimInputs(object):
+    __slots__ = ('Throttle', 'Brake', 'InputSteer', 'Clutch', 'Handbrake')
     #pack_s = struct.Struct('5f')
     def __init__(self):
         self.Throttle = 0.0
@@ -1925,6 +2018,7 @@ class OutSimInputs(object):
 
 
 class OutSimWheel(object):
+    __slots__ = ('SuspDeflect', 'Steer', 'XForce', 'YForce', 'VerticalLoad', 'AngVel', 'LeanRelToRoad', 'AirTemp', 'SlipFraction', 'Touching', 'Sp3', 'SlipRatio', 'TanSlipAngle')
     #pack_s = struct.Struct('7f4B2f')
     def __init__(self):
         self.SuspDeflect = 0.0
@@ -1944,65 +2038,103 @@ class OutSimWheel(object):
         self.SuspDeflect, self.Steer, self.XForce, self.YForce, self.VerticalLoad, self.AngVel, self.LeanRelToRoad, self.AirTemp, self.SlipFraction, self.Touching, self.Sp3, self.SlipRatio, self.TanSlipAngle = data
         return self
 
-class OutSimPack2(object):
-    pack_s = b''
+# Struct format and number of values of each OutSim2 section, in packet order
+_OUTSIM2_SECTIONS = (
+    (OSO_HEADER, 'header', '4B', 4),
+    (OSO_ID, 'id', 'I', 1),
+    (OSO_TIME, 'time', 'i', 1),
+    (OSO_MAIN, 'main', '12f3i', 15),
+    (OSO_INPUTS, 'inputs', '5f', 5),
+    (OSO_DRIVE, 'drive', '4B2f', 6),
+    (OSO_DISTANCE, 'distance', '2f', 2),
+    (OSO_WHEELS, 'wheels', '7f4B2f'*4, 13*4),
+    (OSO_EXTRA_1, 'extra', '2f', 2),
+)
+
+_OUTSIM2_LAYOUTS = {}
+
+class _OutSim2Layout(object):
+    """Struct of an OutSim2 packet for one OutSim Opts mode, with the offset of
+    each section in the unpacked values (None if the mode leaves it out).
+
+    """
+    __slots__ = ('mode', 'pack_s', 'header', 'id', 'time', 'main', 'inputs', 'drive', 'distance', 'wheels', 'extra')
     def __init__(self, mode):
         self.mode = mode
         s = ''
-        if bool(self.mode & OSO_HEADER):
-            s = s + '4B'
-        if bool(self.mode & OSO_ID):
-            s = s + 'I'
-        if bool(self.mode & OSO_TIME):
-            s = s + 'i'
+        offset = 0
+        for bit, name, format, count in _OUTSIM2_SECTIONS:
+            if mode & bit:
+                setattr(self, name, offset)
+                s = s + format
+                offset += count
+            else:
+                setattr(self, name, None)
+        self.pack_s = struct.Struct(s)
+
+def _outsim2_layout(mode):
+    layout = _OUTSIM2_LAYOUTS.get(mode)
+    if layout is None:
+        layout = _OUTSIM2_LAYOUTS[mode] = _OutSim2Layout(mode)
+    return layout
+
+class OutSimPack2(object):
+    """OutSim2 packet, with the sections set by the OutSim Opts mode.
+
+    The struct for each mode is built once and shared. An instance can be
+    reused by calling unpack() again, which fills the same sub-records.
+
+    """
+    __slots__ = ('mode', 'pack_s', 'L', 'F', 'S', 'T', 'ID', 'Time', 'OSMain', 'OSInputs', 'Gear', 'Sp1', 'Sp2', 'Sp3', 'EngineAngVel', 'MaxTorqueAtVel', 'CurrentLapDist', 'IndexedDistance', 'OSWheels', 'SteerTorque', 'Spare', '_layout')
+    def __init__(self, mode):
+        self.mode = mode
+        self._layout = _outsim2_layout(mode)
+        self.pack_s = self._layout.pack_s
         if bool(self.mode & OSO_MAIN):
-            s = s + '12f3i'
+            self.OSMain = OutSimMain()
         if bool(self.mode & OSO_INPUTS):
-            s = s + '5f'
-        if bool(self.mode & OSO_DRIVE):
-            s = s + '4B2f'
-        if bool(self.mode & OSO_DISTANCE):
-            s = s + '2f'
+            self.OSInputs = OutSimInputs()
         if bool(self.mode & OSO_WHEELS):
-            s = s + '7f4B2f'*4
-        if bool(self.mode & OSO_EXTRA_1):
-            s = s + '2f'
+            self.OSWheels = [OutSimWheel() for i in range(4)]
 
-        self.pack_s = struct.Struct(s)
+    def __getstate__(self):
+        # Struct objects can't be pickled, pack_s is rebuilt from the mode.
+        return dict((k, getattr(self, k)) for k in self.__slots__ if k not in ('pack_s', '_layout') and hasattr(self, k))
+
+    def __setstate__(self, state):
+        self.__init__(state['mode'])
+        for k, v in state.items():
+            setattr(self, k, v)
 
     def unpack(self, data):
         t = self.pack_s.unpack(data)
-        if bool(self.mode & OSO_HEADER):
-            self.L, self.F, self.S, self.T = t[:4]
-            t = t[4:]
-        if bool(self.mode & OSO_ID):
-            self.ID = t[0]
-            t = t[1:]
-        if bool(self.mode & OSO_TIME):
-            self.Time = t[0]
-            t = t[1:]
-        if bool(self.mode & OSO_MAIN):
-            self.OSMain = OutSimMain().unpack(t[:15])
-            t = t[15:]
-        if bool(self.mode & OSO_INPUTS):
-            self.OSInputs = OutSimInputs().unpack(t[:5])
-            t = t[5:]
-        if bool(self.mode & OSO_DRIVE):
-            self.Gear, self.Sp1, self.Sp2, self.Sp3, self.EngineAngVel, self.MaxTorqueAtVel = t[:6]
-            t = t[6:]
-        if bool(self.mode & OSO_DISTANCE):
-            self.CurrentLapDist, self.IndexedDistance = t[:2]
-            t = t[2:]
-        if bool(self.mode & OSO_WHEELS):
-            self.OSWheels = [OutSimWheel().unpack(t[13*i:13*(i+1)]) for i in range(4)]
-            t = t[13*4:]
-        if bool(self.mode & OSO_EXTRA_1):
-            self.SteerTorque, self.Spare = t[:2]
-            #t = t[2:]
+        l = self._layout
+        if l.header is not None:
+            self.L, self.F, self.S, self.T = t[l.header:l.header + 4]
+        if l.id is not None:
+            self.ID = t[l.id]
+        if l.time is not None:
+            self.Time = t[l.time]
+        if l.main is not None:
+            self.OSMain.unpack(t[l.main:l.main + 15])
+        if l.inputs is not None:
+            self.OSInputs.unpack(t[l.inputs:l.inputs + 5])
+        if l.drive is not None:
+            self.Gear, self.Sp1, self.Sp2, self.Sp3, self.EngineAngVel, self.MaxTorqueAtVel = t[l.drive:l.drive + 6]
+        if l.distance is not None:
+            self.CurrentLapDist, self.IndexedDistance = t[l.distance:l.distance + 2]
+        if l.wheels is not None:
+            i = l.wheels
+            for wheel in self.OSWheels:
+                wheel.unpack(t[i:i + 13])
+                i += 13
+        if l.extra is not None:
+            self.SteerTorque, self.Spare = t[l.extra:l.extra + 2]
         return self
 
 
 class OutGaugePack(object):
+    __slots__ = ('Time', 'Car', 'Flags', 'Gear', 'PLID', 'Speed', 'RPM', 'Turbo', 'EngTemp', 'Fuel', 'OilPress', 'OilTemp', 'DashLights', 'ShowLights', 'Throttle', 'Brake', 'Clutch', 'Display1', 'Display2', 'ID')
     pack_s = struct.Struct('I3sxH2B7f2I3f15sx15sx')
     def __init__(self):
         self.Time = 0
@@ -0,0 +1,422 @@
+# pth.py - memory-mapped path file loader for pyinsim
+#
+# This software may be used and distributed according to the terms of the
+# GNU Lesser General Public License version 3 or any later version.
+#
+
+# Dependencies
+import array
+import math
+import mmap
+import os
+import threading
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Libraries
+from pyinsim9.func import (PthException, _PTH_HEADER, _PTH_HEADER_STRUCT, _PTH_NODE_STRUCT,
+                           _PTH_REVISION, _PTH_VERSION)
+
+__all__ = [
+    'CarProjection',
+    'MappedPth',
+    'PathProjector',
+    'clear_pth_cache',
+    'load_pth',
+]
+
+# Constants.
+_INT_FIELDS = ('X', 'Y', 'Z')
+_FLOAT_FIELDS = ('DirX', 'DirY', 'DirZ', 'LimitLeft', 'LimitRight', 'DriveLeft', 'DriveRight')
+_FIELDS = _INT_FIELDS + _FLOAT_FIELDS
+_NODE_WORDS = _PTH_NODE_STRUCT.size // 4
+
+# Path and car positions are in 1/65536 of a metre.
+_UNIT = 1.0 / 65536.0
+# Size in metres of the grid cells nodes are indexed by.
+_CELL_SIZE = 40.0
+# Nodes a car may have moved from its hint in one update.
+_HINT_STEPS = 32
+# Metres a car may be from the node found from its hint before the grid is
+# searched instead, a hint can lead to the wrong side of a crossover.
+_LOST_DISTANCE = 40.0
+
+# Loaded paths by real path, with the (mtime, size) they were loaded at.
+_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def _node_dtype():
+    return numpy.dtype({'names': list(_FIELDS), 'formats': ['<i4'] * 3 + ['<f4'] * 7,
+                        'offsets': [i * 4 for i in range(len(_FIELDS))], 'itemsize': _PTH_NODE_STRUCT.size})
+
+
+class MappedPth(object):
+    """A path file (.pth) with its nodes stored in columns.
+
+    X, Y, Z, DirX, DirY, DirZ, LimitLeft, LimitRight, DriveLeft and
+    DriveRight each hold one value per node. With NumPy they are views of a
+    structured array (nodes) over the memory-mapped file, without it they
+    are array.array copies. No object is created per node.
+
+    """
+    def __init__(self, path):
+        """Map a path file.
+
+        Args:
+            path - The .pth file to load.
+
+        """
+        self.path = path
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read()
+        except Exception:
+            self._map.close()
+            raise
+
+    def _read(self):
+        if len(self._map) < _PTH_HEADER_STRUCT.size:
+            raise PthException('Invalid header')
+        data = _PTH_HEADER_STRUCT.unpack_from(self._map)
+        if data[0] != _PTH_HEADER:
+            raise PthException('Invalid header')
+        if data[1] != _PTH_VERSION:
+            raise PthException('Invalid version')
+        if data[2] != _PTH_REVISION:
+            raise PthException('Invalid revision')
+        self.numNodes = data[3]
+        self.finishLine = data[4]
+        start = _PTH_HEADER_STRUCT.size
+        end = start + self.numNodes * _PTH_NODE_STRUCT.size
+        if self.numNodes < 0 or end > len(self._map):
+            raise PthException('Truncated file')
+        if numpy is not None:
+            self.nodes = numpy.frombuffer(self._map, _node_dtype(), self.numNodes, start)
+            for name in _FIELDS:
+                setattr(self, name, self.nodes[name])
+        else:
+            # Every column is a slice of the 4 byte words of the nodes.
+            data = self._map[start:end]
+            ints = array.array('i', data)
+            floats = array.array('f', data)
+            for i, name in enumerate(_FIELDS):
+                setattr(self, name, (ints if name in _INT_FIELDS else floats)[i::_NODE_WORDS])
+            self.nodes = None
+            self._map.close()
+            self._map = None
+
+    def __len__(self):
+        return self.numNodes
+
+    def node(self, index):
+        """Get one node as a tuple, in the same order as the file.
+
+        Args:
+            index - The index of the node.
+
+        Returns:
+            A tuple of (X, Y, Z, DirX, DirY, DirZ, LimitLeft, LimitRight,
+            DriveLeft, DriveRight).
+
+        """
+        return tuple(getattr(self, name)[index] for name in _FIELDS)
+
+
+def load_pth(path, cache=True):
+    """Load a path file, sharing it with every other caller in the process.
+
+    The file is parsed once and reused until it changes on disk, so
+    reloading the track in an IS_RST handler is a dictionary lookup:
+
+        pth = pyinsim9.pth.load_pth(os.path.join(pth_dir, rst.Track.decode() + '.pth'))
+
+    Args:
+        path - The .pth file to load.
+        cache - Set to False to always load the file again.
+
+    Returns:
+        A MappedPth object, which must be treated as read-only.
+
+    """
+    if not cache:
+        return MappedPth(path)
+    key = os.path.realpath(path)
+    stat = os.stat(key)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _CACHE_LOCK:
+        entry = _CACHE.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+    pth = MappedPth(key)
+    with _CACHE_LOCK:
+        _CACHE[key] = (version, pth)
+    return pth
+
+
+def clear_pth_cache():
+    """Forget every path file loaded by load_pth()."""
+    with _CACHE_LOCK:
+        _CACHE.clear()
+
+
+class CarProjection(object):
+    """Where a car is on the path.
+
+    Attributes:
+        PLID - The player ID of the car.
+        Node - Index of the nearest path node.
+        Distance - Metres driven along the path since the finish line.
+        Fraction - Distance as a fraction of the lap, from 0 to 1.
+        Offset - Metres from the centre line, positive to the right.
+        Inside - True if Offset is within LimitLeft and LimitRight.
+
+    """
+    __slots__ = ('PLID', 'Node', 'Distance', 'Fraction', 'Offset', 'Inside')
+    def __init__(self, PLID, Node, Distance, Fraction, Offset, Inside):
+        self.PLID = PLID
+        self.Node = Node
+        self.Distance = Distance
+        self.Fraction = Fraction
+        self.Offset = Offset
+        self.Inside = Inside
+
+
+class PathProjector(object):
+    """Project cars onto a path.
+
+    Nodes are indexed in a grid so the nearest node to a point is found
+    without looking at every node. Each car's node is remembered by PLID and
+    the next update walks from it to the nearest node, so a car moving along
+    the path costs a few node comparisons. Cars without a hint, or too far
+    from the node walked to, are looked up in the grid.
+
+    """
+    def __init__(self, pth, cell_size=_CELL_SIZE, vectorized=None):
+        """Create a new PathProjector.
+
+        Args:
+            pth - A MappedPth (or func.Pth) of the closed path.
+            cell_size - Size in metres of the grid cells.
+            vectorized - Set to False to project cars one at a time rather
+                         than with NumPy, defaults to True when NumPy is
+                         installed.
+
+        """
+        if isinstance(pth, MappedPth):
+            columns = [list(getattr(pth, name)) for name in _FIELDS]
+        else:
+            columns = [[getattr(node, name) for node in pth.nodes] for name in _FIELDS]
+        x, y, z, dx, dy, dz, left, right = columns[:8]
+        count = len(x)
+        if count < 2:
+            raise PthException('Path has too few nodes')
+        self._count = count
+        self._x = [v * _UNIT for v in x]
+        self._y = [v * _UNIT for v in y]
+        self._z = [v * _UNIT for v in z]
+        self._fx, self._fy, self._fz, self._rx, self._ry = [], [], [], [], []
+        for i in range(count):
+            size = math.sqrt(dx[i] * dx[i] + dy[i] * dy[i] + dz[i] * dz[i]) or 1.0
+            self._fx.append(dx[i] / size)
+            self._fy.append(dy[i] / size)
+            self._fz.append(dz[i] / size)
+            size = math.hypot(dx[i], dy[i]) or 1.0
+            self._rx.append(dy[i] / size)
+            self._ry.append(-dx[i] / size)
+        self._left = left
+        self._right = right
+
+        # Distance along the path to each node, the lap wraps to node 0.
+        self._along = [0.0]
+        for i in range(count):
+            j = (i + 1) % count
+            self._along.append(self._along[i] + math.sqrt((self._x[j] - self._x[i]) ** 2 +
+                                                          (self._y[j] - self._y[i]) ** 2 +
+                                                          (self._z[j] - self._z[i]) ** 2))
+        self.length = self._along.pop()
+        self._start = self._along[pth.finishLine % count]
+
+        self._cell_size = cell_size
+        self._grid = {}
+        for i in range(count):
+            self._grid.setdefault((int(self._x[i] // cell_size), int(self._y[i] // cell_size)), []).append(i)
+        cells = list(self._grid)
+        self._bounds = (min(c[0] for c in cells), max(c[0] for c in cells),
+                        min(c[1] for c in cells), max(c[1] for c in cells))
+
+        if vectorized is None:
+            vectorized = numpy is not None
+        self._vectorized = vectorized
+        if vectorized:
+            if numpy is None:
+                raise ImportError('NumPy is required for vectorized projection')
+            self._arrays = dict((name, numpy.array(getattr(self, name)))
+                                for name in ('_x', '_y', '_z', '_fx', '_fy', '_fz', '_rx', '_ry', '_left', '_right',
+                                             '_along'))
+        self._hints = {}
+
+    def _distance2(self, i, x, y, z):
+        return (x - self._x[i]) ** 2 + (y - self._y[i]) ** 2 + (z - self._z[i]) ** 2
+
+    def _walk(self, x, y, z, node):
+        # Walk from a node to the nearest node that is no nearer than its
+        # neighbours.
+        count = self._count
+        best = self._distance2(node, x, y, z)
+        for _ in range(_HINT_STEPS):
+            ahead = node + 1 if node + 1 < count else 0
+            behind = node - 1 if node else count - 1
+            distance = self._distance2(ahead, x, y, z)
+            if distance < best:
+                node, best = ahead, distance
+                continue
+            distance = self._distance2(behind, x, y, z)
+            if distance < best:
+                node, best = behind, distance
+                continue
+            break
+        return node, best
+
+    def _search(self, x, y, z):
+        # Look at the grid cells in rings around the point, until no node in
+        # the next ring can be nearer than the nearest one found.
+        size = self._cell_size
+        cx = int(x // size)
+        cy = int(y // size)
+        minx, maxx, miny, maxy = self._bounds
+        last = max(cx - minx, maxx - cx, cy - miny, maxy - cy)
+        grid = self._grid
+        node = None
+        best = float('inf')
+        ring = 0
+        while ring <= last:
+            if ring:
+                cells = [(cx + i, cy + j) for i in range(-ring, ring + 1) for j in (-ring, ring)]
+                cells.extend((cx + i, cy + j) for i in (-ring, ring) for j in range(1 - ring, ring))
+            else:
+                cells = [(cx, cy)]
+            for cell in cells:
+                for i in grid.get(cell, ()):
+                    distance = self._distance2(i, x, y, z)
+                    if distance < best:
+                        node, best = i, distance
+            if node is not None and best <= (ring * size) ** 2:
+                break
+            ring += 1
+        return node
+
+    def nearest(self, X, Y, Z, hint=None):
+        """Find the nearest path node to a point.
+
+        Args:
+            X, Y, Z - The point, in the units of CompCar (1/65536 m).
+            hint - A node near the point, E.G. the car's previous node.
+
+        Returns:
+            The index of the node.
+
+        """
+        x, y, z = X * _UNIT, Y * _UNIT, Z * _UNIT
+        if hint is not None and 0 <= hint < self._count:
+            node, distance = self._walk(x, y, z, hint)
+            if distance <= _LOST_DISTANCE * _LOST_DISTANCE:
+                return node
+        return self._search(x, y, z)
+
+    def _project_one(self, x, y, z, hint):
+        node = None
+        if 0 <= hint < self._count:
+            node, distance = self._walk(x, y, z, hint)
+            if distance > _LOST_DISTANCE * _LOST_DISTANCE:
+                node = None
+        if node is None:
+            node = self._search(x, y, z)
+        dx = x - self._x[node]
+        dy = y - self._y[node]
+        dz = z - self._z[node]
+        along = (self._along[node] + dx * self._fx[node] + dy * self._fy[node] + dz * self._fz[node] -
+                 self._start) % self.length
+        offset = dx * self._rx[node] + dy * self._ry[node]
+        return node, along, offset, self._left[node] <= offset <= self._right[node]
+
+    def _project_arrays(self, x, y, z, hints):
+        a = self._arrays
+        count = self._count
+        valid = (hints >= 0) & (hints < count)
+        node = numpy.where(valid, hints, 0)
+        def distance2(i):
+            return (x - a['_x'][i]) ** 2 + (y - a['_y'][i]) ** 2 + (z - a['_z'][i]) ** 2
+        best = distance2(node)
+        for _ in range(_HINT_STEPS):
+            ahead = node + 1
+            ahead[ahead == count] = 0
+            behind = node - 1
+            behind[behind < 0] = count - 1
+            ahead_distance = distance2(ahead)
+            behind_distance = distance2(behind)
+            step = numpy.where(ahead_distance <= behind_distance, ahead, behind)
+            distance = numpy.minimum(ahead_distance, behind_distance)
+            closer = distance < best
+            if not closer.any():
+                break
+            node = numpy.where(closer, step, node)
+            best = numpy.where(closer, distance, best)
+        for i in numpy.flatnonzero(~valid | (best > _LOST_DISTANCE * _LOST_DISTANCE)):
+            node[i] = self._search(float(x[i]), float(y[i]), float(z[i]))
+        dx = x - a['_x'][node]
+        dy = y - a['_y'][node]
+        dz = z - a['_z'][node]
+        along = (a['_along'][node] + dx * a['_fx'][node] + dy * a['_fy'][node] + dz * a['_fz'][node] -
+                 self._start) % self.length
+        offset = dx * a['_rx'][node] + dy * a['_ry'][node]
+        inside = (a['_left'][node] <= offset) & (offset <= a['_right'][node])
+        return node, along, offset, inside
+
+    def project(self, cars):
+        """Project every car of an IS_MCI update.
+
+        The node found for each car is the hint for its next update. Before
+        a car has one, the Node LFS sent for it is used.
+
+        Args:
+            cars - The Info of an IS_MCI packet, a list of CompCar or a
+                   structured array from decoders.array_decoders().
+
+        Returns:
+            A list of CarProjection, in the same order as the cars.
+
+        """
+        if hasattr(cars, 'dtype'):
+            plids = cars['PLID'].tolist()
+            nodes = cars['Node'].tolist()
+            positions = (cars['X'], cars['Y'], cars['Z'])
+        else:
+            plids = [car.PLID for car in cars]
+            nodes = [car.Node for car in cars]
+            positions = ([car.X for car in cars], [car.Y for car in cars], [car.Z for car in cars])
+        hints = self._hints
+        hint = [hints.get(plid, node) for plid, node in zip(plids, nodes)]
+        length = self.length
+        if self._vectorized:
+            x, y, z = (numpy.asarray(values, dtype=float) * _UNIT for values in positions)
+            results = zip(*(values.tolist() for values in self._project_arrays(x, y, z, numpy.array(hint))))
+        else:
+            results = [self._project_one(x * _UNIT, y * _UNIT, z * _UNIT, h) for x, y, z, h in zip(*positions, hint)]
+        projections = []
+        for plid, (node, along, offset, inside) in zip(plids, results):
+            hints[plid] = node
+            projections.append(CarProjection(plid, node, along, along / length, offset, inside))
+        return projections
+
+    def forget(self, PLID):
+        """Drop the hint of a car, E.G. when an IS_PLL or IS_PLP is received."""
+        self._hints.pop(PLID, None)
+
+    def reset(self):
+        """Drop the hints of every car, E.G. when an IS_RST is received."""
+        self._hints.clear()
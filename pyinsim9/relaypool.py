@@ -0,0 +1,310 @@
+# relaypool.py - pool of InSim relay connections for pyinsim
+#
+# This software may be used and distributed according to the terms of the
+# GNU Lesser General Public License version 3 or any later version.
+#
+
+# Dependencies
+import collections
+import functools
+
+# Libraries
+import pyinsim9.core as core
+from pyinsim9.core import insim_ # pyinsim9.insim is shadowed by core.insim()
+
+__all__ = [
+    'EVT_HOSTS',
+    'EVT_HOST_ERROR',
+    'EVT_SNAPSHOT',
+    'RelayPool',
+]
+
+# Event constants.
+EVT_HOSTS = 320
+EVT_SNAPSHOT = 321
+EVT_HOST_ERROR = 322
+
+# Constants.
+_SIZE = 4
+_TIMEOUT = 10.0
+_RETRY = 30.0
+_SNAPSHOT = (insim_.TINY_SST, insim_.TINY_NCN, insim_.TINY_NPL)
+_POOL_EVENTS = (EVT_HOSTS, EVT_SNAPSHOT, EVT_HOST_ERROR)
+
+
+class RelayPool(core._Binding):
+    """Watch many hosts through a fixed number of relay connections.
+
+    While there are no more watched hosts than connections, each host keeps
+    a connection of its own. Beyond that the connections take turns: each
+    selects the next host in the rotation, requests a snapshot of it (by
+    default IS_STA, IS_NCN and IS_NPL) and moves on once every reply has
+    arrived. The relay host list is requested at the start and again after
+    each round. A host that cannot be selected is left out until the host
+    list shows it has changed, which is requested every retry seconds while
+    such hosts leave a connection idle.
+
+    Bind packet types or EVT_ALL to the pool as you would to a connection.
+    Callbacks are called with (pool, HName, packet), where HName is the host
+    the packet came from. Packets that arrive while a connection is
+    switching hosts are not passed on. The pool also dispatches:
+
+        EVT_HOSTS - (pool, added, removed, changed) when the host list has
+                    changed, with lists of the HInfo of added and changed
+                    hosts and of the HName of removed ones.
+        EVT_SNAPSHOT - (pool, HName, replies) when a snapshot is complete.
+        EVT_HOST_ERROR - (pool, HName, ErrNo) when a host cannot be selected,
+                         ErrNo is one of IR_ERR_* or 0 if the relay did not
+                         answer.
+
+    """
+    def __init__(self, host='isrelay.lfs.net', port=47474, size=_SIZE, connections=None, snapshot=_SNAPSHOT,
+                 watch_all=False, timeout=_TIMEOUT, retry=_RETRY):
+        """Create a new RelayPool and start its connections.
+
+        Args:
+            host - The InSim relay host.
+            port - The InSim relay port.
+            size - The number of relay connections to open.
+            connections - A list of relay connections to use instead of
+                          opening them, E.G. from pyinsim9.aio.relay().
+            snapshot - The TINY_* requests that make up a snapshot.
+            watch_all - Set to True to watch every host the relay lists,
+                        as they come and go.
+            timeout - Seconds to wait for the relay to answer a request.
+            retry - Seconds between host list requests while hosts that
+                    could not be selected leave a connection idle.
+
+        """
+        core._Binding.__init__(self)
+        if connections is None:
+            connections = [core.relay(host, port, name=b'relay pool %d' % i) for i in range(size)]
+        self.connections = list(connections)
+        self.snapshot = snapshot
+        self.watch_all = watch_all
+        self.timeout = timeout
+        self.retry = retry
+        self.hosts = {}          # HName -> HInfo from the last host list
+        self.errors = {}         # HName -> IR_ERR_* of the last failed selection
+        self._watched = collections.OrderedDict() # HName -> (Admin, Spec)
+        self._rotation = collections.deque()
+        self._current = {}       # connection -> HName its packets come from
+        self._selected = {}      # connection -> HName selected or being selected
+        self._requests = {}      # connection -> requests waiting for replies
+        self._parked = set()     # connections keeping a host of their own
+        self._forwarded = ()
+        self._retry = None       # timer to request the host list again
+        for relay in self.connections:
+            relay.bind(core.EVT_CLOSE, self._handle_close)
+            relay.bind(core.EVT_ERROR, self._handle_close)
+        self.refresh()
+
+    def close(self):
+        """Close every relay connection."""
+        for relay in list(self.connections):
+            self._remove(relay)
+            relay.close()
+
+    def watch(self, HName, Admin=b'', Spec=b''):
+        """Add a host to the hosts being watched.
+
+        Args:
+            HName - The name of the host.
+            Admin - The host admin password.
+            Spec - The host spectator password.
+
+        """
+        if HName in self._watched:
+            return
+        self._watched[HName] = (Admin, Spec)
+        self._rotation.append(HName)
+        self._schedule()
+
+    def unwatch(self, HName):
+        """Stop watching a host, its connection moves on to the next one."""
+        if self._watched.pop(HName, None) is None:
+            return
+        try:
+            self._rotation.remove(HName)
+        except ValueError:
+            pass
+        for relay, hname in list(self._selected.items()):
+            if hname == HName:
+                self._next(relay)
+
+    def watching(self):
+        """Get the list of the names of the hosts being watched."""
+        return list(self._watched)
+
+    def selected(self):
+        """Get a dict of each connection to the host it has selected."""
+        return dict(self._current)
+
+    def refresh(self):
+        """Request the host list from the relay."""
+        if self.connections:
+            self.connections[0].request(insim_.IRP_HLR, self._handle_hosts, self.timeout)
+
+    def _rotating(self):
+        return len(self._watched) > len(self.connections)
+
+    def _schedule(self):
+        # Give hosts to idle connections, and once there are more hosts than
+        # connections, put those keeping a host into the rotation.
+        rotating = self._rotating()
+        for relay in list(self.connections):
+            if relay in self._parked and rotating:
+                self._rotation.append(self._current[relay])
+                self._next(relay)
+            elif relay not in self._selected:
+                self._next(relay)
+
+    def _next(self, relay):
+        self._parked.discard(relay)
+        self._current.pop(relay, None)
+        self._selected.pop(relay, None)
+        for request in self._requests.pop(relay, ()):
+            request.cancel()
+        if not self._rotation:
+            # Start a round, leaving out hosts that failed until the host list
+            # shows they have changed.
+            busy = set(self._selected.values())
+            self._rotation.extend(hname for hname in self._watched if hname not in busy and hname not in self.errors)
+            if self._rotation and self._rotating():
+                self.refresh()
+        if not self._rotation:
+            self._retry_later()
+            return
+        hname = self._rotation.popleft()
+        self._selected[relay] = hname
+        Admin, Spec = self._watched[hname]
+        self._requests[relay] = [relay.request(insim_.IRP_SEL, functools.partial(self._handle_select, hname),
+                                               self.timeout, HName=hname, Admin=Admin, Spec=Spec)]
+
+    def _retry_later(self):
+        # Hosts that failed are tried again once the host list shows they
+        # have changed, so keep asking for it while one leaves a connection idle.
+        if self.errors and self._retry is None and self.connections:
+            self._retry = self.connections[0]._call_later(self.retry, self._handle_retry)
+
+    def _handle_retry(self):
+        self._retry = None
+        self.refresh()
+
+    def _handle_select(self, hname, relay, request):
+        if not relay.connected or self._selected.get(relay) != hname:
+            return # Closing, or moved on.
+        reply = request.replies[0] if request.replies else None
+        if reply is None or reply.Type == insim_.IRP_ERR:
+            errno = reply.ErrNo if reply is not None else 0
+            self.errors[hname] = errno
+            self.dispatch(EVT_HOST_ERROR, hname, errno)
+            self._next(relay)
+            return
+        self._current[relay] = hname
+        requests = self._requests[relay] = [relay.request(insim_.ISP_TINY, timeout=self.timeout, SubT=subt)
+                                            for subt in self.snapshot]
+        done = functools.partial(self._handle_snapshot, hname, requests)
+        for snapshot_request in requests:
+            snapshot_request.add_callback(done)
+        if not requests:
+            self._snapshot_done(relay, hname, [])
+
+    def _handle_snapshot(self, hname, requests, relay, request):
+        if not all(request.done for request in requests):
+            return
+        if not relay.connected or self._current.get(relay) != hname:
+            return
+        self._requests.pop(relay, None)
+        replies = []
+        for request in requests:
+            replies.extend(request.replies)
+        self._snapshot_done(relay, hname, replies)
+
+    def _snapshot_done(self, relay, hname, replies):
+        self.dispatch(EVT_SNAPSHOT, hname, replies)
+        if self._current.get(relay) != hname:
+            return # Moved on by a callback.
+        if self._rotating():
+            self._rotation.append(hname)
+            self._next(relay)
+        else:
+            self._parked.add(relay)
+
+    def _handle_hosts(self, relay, request):
+        if request.error is not None:
+            return
+        hosts = {}
+        for hos in request.replies:
+            for host in hos.Info:
+                hosts[host.HName] = host
+        old = self.hosts
+        added = [host for hname, host in hosts.items() if hname not in old]
+        removed = [hname for hname in old if hname not in hosts]
+        changed = [host for hname, host in hosts.items() if hname in old and
+                   (host.Track, host.Flags, host.NumConns) != (old[hname].Track, old[hname].Flags,
+                                                              old[hname].NumConns)]
+        self.hosts = hosts
+        for host in added + changed:
+            self.errors.pop(host.HName, None)
+        if self.watch_all:
+            for hname in removed:
+                self.unwatch(hname)
+            for host in added:
+                self.watch(host.HName)
+        if added or removed or changed:
+            self.dispatch(EVT_HOSTS, added, removed, changed)
+        self._schedule()
+
+    def _handle_packet(self, relay, packet):
+        hname = self._current.get(relay)
+        if hname is None:
+            return
+        callbacks = self._callbacks.get(packet.Type)
+        if callbacks:
+            for c in callbacks:
+                c(self, hname, packet)
+        callbacks = self._callbacks.get(core.EVT_ALL)
+        if callbacks:
+            for c in callbacks:
+                c(self, hname, packet)
+
+    def _handle_close(self, relay):
+        hname = self._selected.get(relay)
+        self._remove(relay)
+        if hname is not None and hname in self._watched:
+            self._rotation.appendleft(hname)
+        self._schedule()
+
+    def _remove(self, relay):
+        if relay not in self.connections:
+            return
+        if self._retry is not None:
+            # The timer may belong to this connection, start it again later.
+            self._retry.cancel()
+            self._retry = None
+        self.connections.remove(relay)
+        self._current.pop(relay, None)
+        self._selected.pop(relay, None)
+        self._parked.discard(relay)
+        for request in self._requests.pop(relay, ()):
+            request.cancel()
+        relay.unbind(core.EVT_CLOSE, self._handle_close)
+        relay.unbind(core.EVT_ERROR, self._handle_close)
+        for evt in self._forwarded:
+            relay.unbind(evt, self._handle_packet)
+
+    def _rebind(self):
+        # Only have the connections decode the packet types bound to the pool.
+        if core.EVT_ALL in self._callbacks:
+            forwarded = (core.EVT_ALL,)
+        else:
+            forwarded = tuple(evt for evt in self._callbacks if evt not in _POOL_EVENTS)
+        for relay in self.connections:
+            for evt in self._forwarded:
+                if evt not in forwarded:
+                    relay.unbind(evt, self._handle_packet)
+            for evt in forwarded:
+                if evt not in self._forwarded:
+                    relay.bind(evt, self._handle_packet)
+        self._forwarded = forwarded
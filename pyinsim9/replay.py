@@ -0,0 +1,339 @@
+# replay.py - packet capture and replay for pyinsim
+#
+# This software may be used and distributed according to the terms of the
+# GNU Lesser General Public License version 3 or any later version.
+#
+
+# Dependencies
+import bisect
+import os
+import struct
+import time
+
+# Libraries
+import pyinsim9.core as core
+
+__all__ = [
+    'CHANNEL_TCP',
+    'CHANNEL_UDP',
+    'Recorder',
+    'Replayer',
+]
+
+# Constants.
+CHANNEL_TCP = core._CHANNEL_TCP
+CHANNEL_UDP = core._CHANNEL_UDP
+
+_MAGIC = b'PYISCAP1'
+_INTERVAL = 1.0
+_INDEX_EVERY = 64
+_READ_BUFFER_SIZE = 1 << 20
+
+# Record kinds, CHANNEL_TCP and CHANNEL_UDP hold a packet.
+_KIND_NAME = 0
+_KIND_INDEX = 3
+_KIND_FOOTER = 4
+
+# File layout:
+#   header: magic, wall clock time the capture started
+#   records: kind, connection id, payload length, seconds since start, payload
+# A name record maps a connection id to its name. Every index record lists
+# the (time, offset) checkpoints taken since the previous one, the offset of
+# the previous index record and every connection name, and the footer written
+# by close() holds the offset of the last index record.
+_HEADER = struct.Struct('<8sd')
+_RECORD = struct.Struct('<BBHd')
+_INDEX = struct.Struct('<QHH')
+_CHECKPOINT = struct.Struct('<dQ')
+_NAME = struct.Struct('<BB')
+_OFFSET = struct.Struct('<Q')
+
+
+class Recorder(object):
+    """Records the raw packets received by connections into an append-only
+    capture file.
+
+    Attach a connection to tee every framed InSim packet read from TCP and
+    every datagram read from UDP into the file, before they are decoded.
+
+    """
+    def __init__(self, path, interval=_INTERVAL, index_every=_INDEX_EVERY):
+        """Create a new Recorder object.
+
+        Args:
+            path - The path of the capture file, which is overwritten.
+            interval - Seconds between seek index checkpoints.
+            index_every - The number of checkpoints in each index record.
+
+        """
+        self.path = path
+        self.records = 0
+        self._file = open(path, 'wb')
+        self._start = time.monotonic()
+        self._file.write(_HEADER.pack(_MAGIC, time.time()))
+        self._offset = _HEADER.size
+        self._interval = interval
+        self._index_every = index_every
+        self._next = 0.0
+        self._last = 0.0
+        self._checkpoints = []
+        self._last_index = 0
+        self._ids = {}
+        self._names = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def attach(self, conn):
+        """Record the packets received by a connection.
+
+        Args:
+            conn - The InSim, OutSim or OutGauge connection.
+
+        """
+        self._conn_id(conn)
+        conn.recorder = self
+
+    def detach(self, conn):
+        """Stop recording a connection.
+
+        Args:
+            conn - The connection.
+
+        """
+        if conn.recorder is self:
+            conn.recorder = None
+
+    def write(self, conn, channel, data, timestamp=None):
+        """Append a packet to the capture, called by attached connections
+        with each packet they read.
+
+        Args:
+            conn - The connection that received the packet.
+            channel - CHANNEL_TCP or CHANNEL_UDP.
+            data - The raw packet.
+            timestamp - Seconds since the capture started, defaults to now.
+
+        """
+        self._write(channel, self._conn_id(conn), data, timestamp)
+        self.records += 1
+
+    def flush(self):
+        """Flush the buffered records to the file."""
+        self._file.flush()
+
+    def close(self):
+        """Detach every connection and finish the file with the seek index."""
+        if self._file.closed:
+            return
+        for conn in self._ids:
+            self.detach(conn)
+        now = max(time.monotonic() - self._start, self._last)
+        self._write_index(now)
+        self._file.write(_RECORD.pack(_KIND_FOOTER, 0, _OFFSET.size, now))
+        self._file.write(_OFFSET.pack(self._last_index))
+        self._file.close()
+
+    def _conn_id(self, conn):
+        try:
+            return self._ids[conn]
+        except KeyError:
+            if len(self._ids) == 256:
+                raise core.InSimError('cannot record more than 256 connections')
+            cid = len(self._ids)
+            name = conn.name[:255]
+            self._ids[conn] = cid
+            self._names.append(_NAME.pack(cid, len(name)) + name)
+            self._write(_KIND_NAME, cid, name)
+            return cid
+
+    def _write(self, kind, cid, data, timestamp=None):
+        now = time.monotonic() - self._start if timestamp is None else timestamp
+        if now >= self._next:
+            if len(self._checkpoints) >= self._index_every:
+                self._write_index(now)
+            self._checkpoints.append(_CHECKPOINT.pack(now, self._offset))
+            self._next = now + self._interval
+        self._last = now
+        self._file.write(_RECORD.pack(kind, cid, len(data), now))
+        self._file.write(data)
+        self._offset += _RECORD.size + len(data)
+
+    def _write_index(self, now):
+        payload = b''.join([_INDEX.pack(self._last_index, len(self._checkpoints), len(self._names))] +
+                           self._checkpoints + self._names)
+        self._file.write(_RECORD.pack(_KIND_INDEX, 0, len(payload), now))
+        self._file.write(payload)
+        self._last_index = self._offset
+        self._offset += _RECORD.size + len(payload)
+        self._checkpoints = []
+
+
+class Replayer(object):
+    """Reads a capture file written by a Recorder and feeds the packets back
+    into connections."""
+    def __init__(self, path):
+        """Open a capture file.
+
+        A file that was not closed, because the recording process died, has
+        no seek index and is scanned instead. A partly written last record is
+        ignored.
+
+        Args:
+            path - The path of the capture file.
+
+        """
+        self.path = path
+        self.names = {}
+        self.index = []
+        self.duration = 0.0
+        self._file = open(path, 'rb', buffering=_READ_BUFFER_SIZE)
+        header = self._file.read(_HEADER.size)
+        if len(header) < _HEADER.size or header[:8] != _MAGIC:
+            self._file.close()
+            raise core.InSimError('not a pyinsim capture file: %s' % path)
+        self.started = _HEADER.unpack(header)[1]
+        self._size = os.fstat(self._file.fileno()).st_size
+        self._end = self._size
+        if not self._read_index():
+            self._scan()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the capture file."""
+        self._file.close()
+
+    def records(self, start=0.0, end=None):
+        """Iterate the recorded packets.
+
+        Args:
+            start - Seconds since the start of the capture to begin at.
+            end - Seconds since the start of the capture to stop at, or None
+                  for the end of the file.
+
+        Returns:
+            An iterator of (timestamp, name, channel, data) tuples.
+
+        """
+        i = bisect.bisect_right(self.index, (start, self._size)) - 1
+        pos = self.index[i][1] if i >= 0 else _HEADER.size
+        self._file.seek(pos)
+        read = self._file.read
+        unpack = _RECORD.unpack
+        names = self.names
+        stop = self._end
+        while pos < stop:
+            kind, cid, length, timestamp = unpack(read(_RECORD.size))
+            data = read(length)
+            pos += _RECORD.size + length
+            if kind == CHANNEL_TCP or kind == CHANNEL_UDP:
+                if timestamp < start:
+                    continue
+                if end is not None and timestamp > end:
+                    break
+                yield timestamp, names.get(cid), kind, data
+            elif kind == _KIND_NAME:
+                names[cid] = data
+
+    def replay(self, targets, speed=1.0, start=0.0, end=None):
+        """Feed the recorded packets back into connections, as if they had
+        been received.
+
+        TCP packets are passed to _handle_insim_packet() and UDP datagrams to
+        _handle_udp_packet(), so the callbacks bound to the targets are called
+        as they would be live, but nothing is sent back, not even the reply to
+        a keep-alive. This blocks until the replay is finished, so
+        call it from its own thread to replay into running connections.
+
+        Args:
+            targets - A dict of connection name to the connection to feed, or
+                      one connection to feed every recorded packet to.
+            speed - The playback speed, 1.0 for real time, 10.0 for ten times
+                    faster, or None to replay as fast as possible.
+            start - Seconds since the start of the capture to begin at.
+            end - Seconds since the start of the capture to stop at.
+
+        Returns:
+            The number of packets replayed.
+
+        """
+        if isinstance(targets, dict):
+            lookup = targets.get
+        else:
+            lookup = lambda name: targets
+        count = 0
+        origin = None
+        for timestamp, name, channel, data in self.records(start, end):
+            conn = lookup(name)
+            if conn is None:
+                continue
+            if speed:
+                if origin is None:
+                    origin = time.monotonic() - timestamp / speed
+                delay = origin + timestamp / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            if channel == CHANNEL_TCP:
+                conn._handle_insim_packet(memoryview(data))
+            else:
+                conn._handle_udp_packet(memoryview(data))
+            count += 1
+        return count
+
+    def _read_index(self):
+        footer = _RECORD.size + _OFFSET.size
+        if self._size < _HEADER.size + footer:
+            return False
+        self._file.seek(self._size - footer)
+        kind, cid, length, timestamp = _RECORD.unpack(self._file.read(_RECORD.size))
+        if kind != _KIND_FOOTER or length != _OFFSET.size:
+            return False
+        offset = _OFFSET.unpack(self._file.read(_OFFSET.size))[0]
+        self.duration = timestamp
+        chunks = []
+        while offset:
+            self._file.seek(offset)
+            kind, cid, length, timestamp = _RECORD.unpack(self._file.read(_RECORD.size))
+            if kind != _KIND_INDEX:
+                return False
+            payload = self._file.read(length)
+            offset, checkpoints, names = _INDEX.unpack_from(payload)
+            pos = _INDEX.size + checkpoints * _CHECKPOINT.size
+            chunks.append(list(_CHECKPOINT.iter_unpack(payload[_INDEX.size:pos])))
+            if not self.names:
+                for _ in range(names):
+                    cid, size = _NAME.unpack_from(payload, pos)
+                    pos += _NAME.size
+                    self.names[cid] = payload[pos:pos + size]
+                    pos += size
+        self.index = [checkpoint for chunk in reversed(chunks) for checkpoint in chunk]
+        self._end = self._size - footer
+        return True
+
+    def _scan(self):
+        # Rebuild the checkpoints from the record headers, skipping payloads.
+        pos = _HEADER.size
+        last = None
+        self._file.seek(pos)
+        while pos + _RECORD.size <= self._size:
+            kind, cid, length, timestamp = _RECORD.unpack(self._file.read(_RECORD.size))
+            if pos + _RECORD.size + length > self._size:
+                break
+            if kind == _KIND_NAME:
+                self.names[cid] = self._file.read(length)
+            else:
+                self._file.seek(length, os.SEEK_CUR)
+            if last is None or timestamp >= last + _INTERVAL:
+                self.index.append((timestamp, pos))
+                last = timestamp
+            self.duration = max(self.duration, timestamp)
+            pos += _RECORD.size + length
+        self._end = pos
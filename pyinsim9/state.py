@@ -0,0 +1,214 @@
+# state.py - connection and player state for pyinsim
+#
+# This software may be used and distributed according to the terms of the
+# GNU Lesser General Public License version 3 or any later version.
+#
+
+# Libraries
+import pyinsim9.core as core
+from pyinsim9.core import insim_ # pyinsim9.insim is shadowed by core.insim()
+
+__all__ = [
+    'Connection',
+    'Player',
+    'StateStore',
+]
+
+# Constants.
+_REQI = 0xfd
+_RESYNC = (insim_.TINY_NCN, insim_.TINY_NPL, insim_.TINY_NCI)
+
+
+class Connection(object):
+    """A connection to the host.
+
+    Attributes:
+        UCID - The connection's unique ID, 0 is the host.
+        UName - The LFS username.
+        PName - The nickname.
+        Admin - True if the connection is an admin.
+        Flags - The NCN flags (E.G. remote).
+        Language, UserID, IPAddress - From IS_NCI, when the host sent it.
+        players - Set of the PLIDs this connection is driving.
+
+    """
+    __slots__ = ('UCID', 'UName', 'PName', 'Admin', 'Flags', 'Language', 'UserID', 'IPAddress', 'players')
+    def __init__(self, UCID, UName=b'', PName=b'', Admin=0, Flags=0):
+        self.UCID = UCID
+        self.UName = UName
+        self.PName = PName
+        self.Admin = Admin
+        self.Flags = Flags
+        self.Language = 0
+        self.UserID = 0
+        self.IPAddress = 0
+        self.players = set()
+
+
+class Player(object):
+    """A player (car) in the race.
+
+    Attributes:
+        PLID - The player's unique ID.
+        UCID - The connection driving the car, changed by IS_TOC.
+        PType, Flags, PName, Plate, CName, SName - From IS_NPL.
+        InPits - True after IS_PLP, until the player joins again.
+        npl - The IS_NPL packet the player joined with.
+
+    """
+    __slots__ = ('PLID', 'UCID', 'PType', 'Flags', 'PName', 'Plate', 'CName', 'SName', 'InPits', 'npl')
+    def __init__(self, npl):
+        self.PLID = npl.PLID
+        self.UCID = npl.UCID
+        self.PType = npl.PType
+        self.Flags = npl.Flags
+        self.PName = npl.PName
+        self.Plate = npl.Plate
+        self.CName = npl.CName
+        self.SName = npl.SName
+        self.InPits = False
+        self.npl = npl
+
+
+class StateStore(object):
+    """The connections and players on a host, kept up to date from InSim.
+
+    Binds to IS_NCN, IS_CNL, IS_NPL, IS_PLL, IS_PLP, IS_CPR, IS_TOC and
+    IS_NCI and applies each one as it arrives. On connect it clears the
+    store and requests every connection and player once. Connections are
+    indexed by UCID and UName and players by PLID, so handlers can find
+    the driver of a PLID without asking LFS.
+
+    """
+    def __init__(self, insim, resync=True):
+        """Create a new StateStore and bind it to a connection.
+
+        Args:
+            insim - The InSim connection.
+            resync - Set to False to not request the connections and players
+                     on connect, E.G. when something else does already.
+
+        """
+        self.insim = insim
+        self.resync_on_connect = resync
+        self.connections = {}
+        self.players = {}
+        self._unames = {}
+        self._handlers = ((insim_.ISP_NCN, self._handle_ncn), (insim_.ISP_CNL, self._handle_cnl),
+                          (insim_.ISP_NPL, self._handle_npl), (insim_.ISP_PLL, self._handle_pll),
+                          (insim_.ISP_PLP, self._handle_plp), (insim_.ISP_CPR, self._handle_cpr),
+                          (insim_.ISP_TOC, self._handle_toc), (insim_.ISP_NCI, self._handle_nci),
+                          (core.EVT_INIT, self._handle_init))
+        for evt, callback in self._handlers:
+            insim.bind(evt, callback)
+        if resync and insim.connected:
+            self.resync()
+
+    def close(self):
+        """Unbind the store from its connection."""
+        for evt, callback in self._handlers:
+            self.insim.unbind(evt, callback)
+
+    def resync(self):
+        """Clear the store and request every connection and player."""
+        self.connections.clear()
+        self.players.clear()
+        self._unames.clear()
+        self.insim.sendp(*[insim_.IS_TINY(ReqI=_REQI, SubT=subt) for subt in _RESYNC])
+
+    def connection(self, UCID):
+        """Get a connection by UCID, or None."""
+        return self.connections.get(UCID)
+
+    def player(self, PLID):
+        """Get a player by PLID, or None."""
+        return self.players.get(PLID)
+
+    def by_uname(self, UName):
+        """Get a connection by LFS username, ignoring case, or None."""
+        return self._unames.get(UName.lower())
+
+    def driver(self, PLID):
+        """Get the connection driving a player's car, or None."""
+        player = self.players.get(PLID)
+        if player is None:
+            return None
+        return self.connections.get(player.UCID)
+
+    def _handle_init(self, insim):
+        if self.resync_on_connect:
+            self.resync()
+
+    def _handle_ncn(self, insim, ncn):
+        conn = self.connections.get(ncn.UCID)
+        if conn is None:
+            conn = self.connections[ncn.UCID] = Connection(ncn.UCID)
+            # Players can arrive first, E.G. when the IS_NPL replies to a
+            # resync overtake the IS_NCN ones.
+            conn.players.update(plid for plid, player in self.players.items() if player.UCID == ncn.UCID)
+        else:
+            self._unames.pop(conn.UName.lower(), None)
+        conn.UName = ncn.UName
+        conn.PName = ncn.PName
+        conn.Admin = ncn.Admin
+        conn.Flags = ncn.Flags
+        self._unames[ncn.UName.lower()] = conn
+
+    def _handle_cnl(self, insim, cnl):
+        conn = self.connections.pop(cnl.UCID, None)
+        if conn is not None:
+            if self._unames.get(conn.UName.lower()) is conn:
+                del self._unames[conn.UName.lower()]
+            for plid in conn.players:
+                self.players.pop(plid, None)
+
+    def _handle_npl(self, insim, npl):
+        if not npl.NumP:
+            return # A join request, the player is not in the race yet.
+        old = self.players.get(npl.PLID)
+        if old is not None:
+            self._unlink(old)
+        player = self.players[npl.PLID] = Player(npl)
+        conn = self.connections.get(player.UCID)
+        if conn is not None:
+            conn.players.add(player.PLID)
+
+    def _unlink(self, player):
+        conn = self.connections.get(player.UCID)
+        if conn is not None:
+            conn.players.discard(player.PLID)
+
+    def _handle_pll(self, insim, pll):
+        player = self.players.pop(pll.PLID, None)
+        if player is not None:
+            self._unlink(player)
+
+    def _handle_plp(self, insim, plp):
+        player = self.players.get(plp.PLID)
+        if player is not None:
+            player.InPits = True
+
+    def _handle_cpr(self, insim, cpr):
+        conn = self.connections.get(cpr.UCID)
+        if conn is not None:
+            conn.PName = cpr.PName
+            for plid in conn.players:
+                player = self.players[plid]
+                player.PName = cpr.PName
+                player.Plate = cpr.Plate
+
+    def _handle_toc(self, insim, toc):
+        player = self.players.get(toc.PLID)
+        if player is not None:
+            self._unlink(player)
+            player.UCID = toc.NewUCID
+            conn = self.connections.get(toc.NewUCID)
+            if conn is not None:
+                conn.players.add(toc.PLID)
+
+    def _handle_nci(self, insim, nci):
+        conn = self.connections.get(nci.UCID)
+        if conn is not None:
+            conn.Language = nci.Language
+            conn.UserID = nci.UserID
+            conn.IPAddress = nci.IPAddress
@@ -4,6 +4,11 @@
 # toUnicode() based on pyinsim.strToUnicode()
 # Copyright © 2008-2020 Alex McBride
 
+import codecs
+import functools
+import importlib
+import re
+
 _ENCODING_MAP = {
     'L':    ('cp1252', u'\u20ac\ufffe\u201a\u0192\u201e\u2026\u2020\u2021\u02c6\u2030\u0160\u2039\u0152\ufffe\u017d\ufffe\ufffe\u2018\u2019\u201c\u201d\u2022\u2013\u2014\u02dc\u2122\u0161\u203a\u0153\ufffe\u017e\u0178\xa0\xa1\xa2\xa3\xa4\xa5\xa6\xa7\xa8\xa9\xaa\xab\xac\xad\xae\xaf\xb0\xb1\xb2\xb3\xb4\xb5\xb6\xb7\xb8\xb9\xba\xbb\xbc\xbd\xbe\xbf\xc0\xc1\xc2\xc3\xc4\xc5\xc6\xc7\xc8\xc9\xca\xcb\xcc\xcd\xce\xcf\xd0\xd1\xd2\xd3\xd4\xd5\xd6\xd7\xd8\xd9\xda\xdb\xdc\xdd\xde\xdf\xe0\xe1\xe2\xe3\xe4\xe5\xe6\xe7\xe8\xe9\xea\xeb\xec\xed\xee\xef\xf0\xf1\xf2\xf3\xf4\xf5\xf6\xf7\xf8\xf9\xfa\xfb\xfc\xfd\xfe\xff'),
     'E':    ('cp1250', u'\u20ac\ufffe\u201a\ufffe\u201e\u2026\u2020\u2021\ufffe\u2030\u0160\u2039\u015a\u0164\u017d\u0179\ufffe\u2018\u2019\u201c\u201d\u2022\u2013\u2014\ufffe\u2122\u0161\u203a\u015b\u0165\u017e\u017a\xa0\u02c7\u02d8\u0141\xa4\u0104\xa6\xa7\xa8\xa9\u015e\xab\xac\xad\xae\u017b\xb0\xb1\u02db\u0142\xb4\xb5\xb6\xb7\xb8\u0105\u015f\xbb\u013d\u02dd\u013e\u017c\u0154\xc1\xc2\u0102\xc4\u0139\u0106\xc7\u010c\xc9\u0118\xcb\u011a\xcd\xce\u010e\u0110\u0143\u0147\xd3\xd4\u0150\xd6\xd7\u0158\u016e\xda\u0170\xdc\xdd\u0162\xdf\u0155\xe1\xe2\u0103\xe4\u013a\u0107\xe7\u010d\xe9\u0119\xeb\u011b\xed\xee\u010f\u0111\u0144\u0148\xf3\xf4\u0151\xf6\xf7\u0159\u016f\xfa\u0171\xfc\xfd\u0163\u02d9'),
@@ -32,59 +37,254 @@ _UNESCAPE_MAP = {
 
 _ESCAPE_MAP = dict([(v, k) for (k, v) in _UNESCAPE_MAP.items()])
 
+# Lead bytes of the double byte codepages, their trail byte can be a '^'.
+_LEAD_BYTES = {
+    'J':    frozenset(list(range(0x81, 0xa0)) + list(range(0xe0, 0xfd))),
+    'H':    frozenset(range(0x81, 0xff)),
+    'S':    frozenset(range(0x81, 0xff)),
+    'K':    frozenset(range(0x81, 0xff)),
+}
+
+_DBCS_MARKER_REGEX = re.compile(rb'\^[JHSK]')
+
+
+def _codepage_decoder(key, codec):
+    if key in _LEAD_BYTES:
+        # The double byte codepage decoders are implemented in C.
+        return codecs.lookup(codec).decode
+    table = importlib.import_module('encodings.' + codec).decoding_table
+    charmap_decode = codecs.charmap_decode
+    return lambda data, errors='strict': charmap_decode(data, errors, table)
+
+
+def _codepage_encoder(key, codec):
+    if key in _LEAD_BYTES:
+        return codecs.lookup(codec).encode
+    table = codecs.charmap_build(importlib.import_module('encodings.' + codec).decoding_table)
+    charmap_encode = codecs.charmap_encode
+    return lambda text, errors='strict': charmap_encode(text, errors, table)
+
+# Decode and encode functions for each codepage, called with (data, errors).
+_DECODERS = dict((key, _codepage_decoder(key, codec)) for (key, (codec, chars)) in _ENCODING_MAP.items())
+_ENCODERS = dict((key, _codepage_encoder(key, codec)) for (key, (codec, chars)) in _ENCODING_MAP.items())
+
+# Player and host names are at most 32 bytes and decoded over and over.
+_NAME_LENGTH = 32
+_NAME_CACHE_SIZE = 1024
+
+# Messages and button texts that are broadcast are encoded over and over.
+_TEXT_LENGTH = 128
+_TEXT_CACHE_SIZE = 1024
+
+_MARKERS = dict((key, b'^' + key.encode('ascii')) for key in _ENCODING_MAP)
+
+# Unicode character to the keys of the codepages that can encode it, filled
+# in as characters are first met.
+_CHAR_INDEX = {}
+_RUN_REGEXES = {}
+
+
+def _decode(data, default='L', cols=True, errors='strict', caret='^'):
+    end = data.find(b'\x00')
+    if end >= 0:
+        data = data[:end]
+    if default in _LEAD_BYTES or _DBCS_MARKER_REGEX.search(data):
+        return _decode_dbcs(data, default, cols, errors, caret)
+    # Every part after the first starts with the character after a '^'.
+    parts = data.split(b'^')
+    decode = _DECODERS[default]
+    output = [decode(parts[0], errors)[0]]
+    append = output.append
+    i = 1
+    count = len(parts)
+    while i < count:
+        part = parts[i]
+        i += 1
+        if not part:
+            # An escaped '^^', the part after it is plain text.
+            if i < count:
+                append(caret)
+                if parts[i]:
+                    append(decode(parts[i], errors)[0])
+                i += 1
+            continue
+        c = chr(part[0])
+        if c in _DECODERS:
+            decode = _DECODERS[c]
+        elif c in _UNESCAPE_MAP:
+            append(_UNESCAPE_MAP[c])
+        elif cols:
+            # Keep colour codes, decoding the character after the '^'.
+            append('^')
+            append(decode(part, errors)[0])
+            continue
+        if len(part) > 1:
+            append(decode(part[1:], errors)[0])
+    return ''.join(output)
+
+
+def _decode_dbcs(data, default, cols, errors, caret='^'):
+    # Step over double byte characters so a '^' trail byte isn't a marker.
+    output = []
+    append = output.append
+    decode = _DECODERS[default]
+    lead = _LEAD_BYTES.get(default)
+    start = i = 0
+    size = len(data)
+    while i < size:
+        b = data[i]
+        if b == 94: # '^'
+            if i > start:
+                append(decode(data[start:i], errors)[0])
+            start = i = i + 2
+            if i <= size:
+                c = chr(data[i - 1])
+                if c in _DECODERS:
+                    decode = _DECODERS[c]
+                    lead = _LEAD_BYTES.get(c)
+                elif c == '^':
+                    append(caret)
+                elif c in _UNESCAPE_MAP:
+                    append(_UNESCAPE_MAP[c])
+                elif cols:
+                    append('^')
+                    start = i = i - 1
+        elif lead is not None and b in lead:
+            i += 2
+        else:
+            i += 1
+    if start < size:
+        append(decode(data[start:], errors)[0])
+    return ''.join(output)
+
+
+@functools.lru_cache(maxsize=_NAME_CACHE_SIZE)
+def _decode_name(data, default, cols, caret='^'):
+    return _decode(data, default, cols, 'replace', caret)
+
 
 def toUnicode(str_, default = 'L', cols = True):
-    output = u''
-    accum = ''
-    codec = _ENCODING_MAP[default][0]
-    ctrl = False
-    for c in str_:
-        if c == '\x00':
+    """Convert a LFS encoded byte string to unicode. Characters that are not
+    valid in their codepage are replaced. Names and other short strings are
+    cached."""
+    if isinstance(str_, str):
+        str_ = str_.encode('latin-1')
+    elif not isinstance(str_, bytes):
+        str_ = bytes(str_)
+    if len(str_) <= _NAME_LENGTH:
+        return _decode_name(str_, default, cols)
+    return _decode(str_, default, cols, 'replace')
+
+
+def _colour_text(data, default='L'):
+    # Decode like toUnicode(), but leave an escaped '^^' as it is so the
+    # colour codes kept in the result can still be told apart from text.
+    if len(data) <= _NAME_LENGTH:
+        return _decode_name(data, default, True, '^^')
+    return _decode(data, default, True, 'replace', '^^')
+
+
+def _codepage_chars(key):
+    # The non-ASCII characters a codepage can encode, as a sorted string.
+    codec, chars = _ENCODING_MAP[key]
+    valid = []
+    for c in set(chars):
+        try:
+            if c != u'\ufffe' and c.encode(codec):
+                valid.append(c)
+        except UnicodeEncodeError:
+            pass
+    return u''.join(sorted(valid))
+
+
+def _run_regex(key):
+    # Regex matching the longest run of text a codepage can encode, built on
+    # first use from the ranges of its characters.
+    regex = _RUN_REGEXES.get(key)
+    if regex is None:
+        ranges = []
+        first = last = None
+        for c in _codepage_chars(key):
+            if last is not None and ord(c) == ord(last) + 1:
+                last = c
+                continue
+            if first is not None:
+                ranges.append(first if first == last else first + u'-' + last)
+            first = last = c
+        if first is not None:
+            ranges.append(first if first == last else first + u'-' + last)
+        regex = _RUN_REGEXES[key] = re.compile(u'[\x00-\x7f%s]*' % u''.join(ranges))
+    return regex
+
+
+def _char_codepages(c):
+    # The codepages that can encode a character, as a string of their keys.
+    keys = _CHAR_INDEX.get(c)
+    if keys is None:
+        keys = _CHAR_INDEX[c] = u''.join(key for key in _ENCODING_MAP if _run_regex(key).match(c).end())
+    return keys
+
+
+def _encode(ustr, default='L', errors='strict'):
+    if ustr.isascii():
+        return ustr.encode('ascii')
+    key = default
+    output = []
+    append = output.append
+    size = len(ustr)
+    i = 0
+    end = _run_regex(key).match(ustr).end()
+    while True:
+        if end > i:
+            append(_ENCODERS[key](ustr[i:end], errors)[0])
+        if end == size:
             break
-        if ctrl:
-            if c in _ENCODING_MAP:
-                codec = _ENCODING_MAP[c][0]
-            elif c in _UNESCAPE_MAP:
-                accum += _UNESCAPE_MAP[c]
-            elif cols:
-                accum += '^' + c
-            ctrl = False
-        else:
-            if c == '^':
-                output += accum.decode(codec)
-                accum = ''
-                ctrl = True                
-            else:
-                accum += c
-    if len(accum): 
-        output += accum.decode(codec)
-    return output
+        keys = _CHAR_INDEX.get(ustr[end]) or _char_codepages(ustr[end])
+        if not keys:
+            if errors == 'replace':
+                append(b'?')
+            elif errors != 'ignore':
+                raise UnicodeEncodeError('lfs', ustr, end, end + 1, 'character is not in any LFS codepage')
+            i = end + 1
+            end = _run_regex(key).match(ustr, i).end()
+            continue
+        # Switch to the codepage that covers the most of what follows.
+        i = end
+        for k in keys:
+            run = _run_regex(k).match(ustr, i).end()
+            if run > end:
+                key, end = k, run
+        append(_MARKERS[key])
+    return b''.join(output)
+
+
+@functools.lru_cache(maxsize=_TEXT_CACHE_SIZE)
+def _encode_text(ustr, default):
+    return _encode(ustr, default, 'ignore')
 
 
 def fromUnicode(ustr, default = 'L'):
-    output = ''
-    accum = u''
-    codec = _ENCODING_MAP[default]
-    identifier = ''
-    for c in ustr:
-        # All charsets include the 128 ASCII chars
-        if (ord(c) <= 127) or (c in codec[1]):
-            accum += c
-        else:
-            for (key, charset) in _ENCODING_MAP.items():
-                if c in charset[1]:
-                    # Look-behind, reduces charset jumping.
-                    if len(accum) == 1:
-                        if not accum[-1] in charset[1]:
-                            output += identifier + accum.encode(codec[0])
-                            accum = u''
-                    else:
-                        output += identifier + accum.encode(codec[0])
-                        accum = u''
-                    identifier = '^' + key
-                    codec = charset
-                    accum += c
-                    break
-    if len(accum): 
-        output += identifier + accum.encode(codec[0])
-    return output
+    """Convert a unicode string to a LFS encoded byte string, switching
+    codepage as few times as it can. Characters that are not in any LFS
+    codepage are left out. Messages and button texts are cached."""
+    if len(ustr) <= _TEXT_LENGTH:
+        return _encode_text(ustr, default)
+    return _encode(ustr, default, 'ignore')
+
+
+def _lfs_decode(input, errors='strict'):
+    return _decode(bytes(input), 'L', True, errors), len(input)
+
+
+def _lfs_encode(input, errors='strict'):
+    return _encode(input, 'L', errors), len(input)
+
+
+def _search_codec(name):
+    if name == 'lfs':
+        return codecs.CodecInfo(_lfs_encode, _lfs_decode, name='lfs')
+    return None
+
+
+# b'^Eza\xbf'.decode('lfs') and 'za\u017c'.encode('lfs')
+codecs.register(_search_codec)
@@ -0,0 +1,291 @@
+# timing.py - live timing and gaps for pyinsim
+#
+# This software may be used and distributed according to the terms of the
+# GNU Lesser General Public License version 3 or any later version.
+#
+
+# Dependencies
+import array
+import time
+
+# Libraries
+import pyinsim9.core as core
+from pyinsim9.core import insim_ # pyinsim9.insim is shadowed by core.insim()
+
+__all__ = [
+    'CarTiming',
+    'Timing',
+]
+
+# Constants.
+_NAN = float('nan')
+_REQI = 0xfe
+
+
+class CarTiming(object):
+    """The timing of one car in a snapshot.
+
+    Attributes:
+        PLID - The player ID of the car.
+        Position - Position on the road, from 1.
+        Lap - The lap the car is on.
+        Node - The path node the car is at.
+        Gap - Seconds behind the leader at the same point, nan if unknown.
+        Interval - Seconds behind the car ahead, nan if unknown.
+        SplitGap - Seconds behind the first car at the last split or lap,
+                   from the official LFS times, nan before one.
+        LapsDone - Laps completed.
+        LastLap - Time of the last lap in ms, 0 before one.
+        BestLap - Best lap time in ms, 0 before one.
+
+    """
+    __slots__ = ('PLID', 'Position', 'Lap', 'Node', 'Gap', 'Interval', 'SplitGap', 'LapsDone', 'LastLap',
+                 'BestLap')
+    def __init__(self, PLID, Position, Lap, Node, Gap, Interval, SplitGap, LapsDone, LastLap, BestLap):
+        self.PLID = PLID
+        self.Position = Position
+        self.Lap = Lap
+        self.Node = Node
+        self.Gap = Gap
+        self.Interval = Interval
+        self.SplitGap = SplitGap
+        self.LapsDone = LapsDone
+        self.LastLap = LastLap
+        self.BestLap = BestLap
+
+
+class _Race(object):
+    """Timing state of the race on one host.
+
+    Cars have a slot in each column, reused after they leave. Progress is
+    the number of nodes driven since the first node any car was seen at,
+    counting laps. first holds the time each point of progress was first
+    passed, by the leader, so a car's gap is the time since the leader was
+    where it is now and each update costs one lookup per car that moved.
+
+    """
+    def __init__(self, nodes=0, finish=0):
+        self.nodes = nodes
+        self.finish = finish
+        self.slots = {}
+        self.free = []
+        self.plid = array.array('B')
+        self.lap = array.array('H')
+        self.node = array.array('H')
+        self.progress = array.array('q')
+        self.passed = array.array('d')
+        self.gap = array.array('d')
+        self.split_gap = array.array('d')
+        self.laps_done = array.array('H')
+        self.last_lap = array.array('L')
+        self.best_lap = array.array('L')
+        self.first = array.array('d')
+        self.frontier = -1
+        self.base = None
+        self.official = {}
+        self.snapshot = None
+
+    def slot(self, plid):
+        slot = self.slots.get(plid)
+        if slot is None:
+            if self.free:
+                slot = self.free.pop()
+                for column, value in self._columns(plid):
+                    column[slot] = value
+            else:
+                slot = len(self.plid)
+                for column, value in self._columns(plid):
+                    column.append(value)
+            self.slots[plid] = slot
+        return slot
+
+    def _columns(self, plid):
+        return ((self.plid, plid), (self.lap, 0), (self.node, 0), (self.progress, -1 << 62), (self.passed, 0.0),
+                (self.gap, _NAN), (self.split_gap, _NAN), (self.laps_done, 0), (self.last_lap, 0),
+                (self.best_lap, 0))
+
+    def remove(self, plid):
+        slot = self.slots.pop(plid, None)
+        if slot is not None:
+            self.free.append(slot)
+            self.snapshot = None
+
+    def update(self, cars, now):
+        nodes = self.nodes
+        finish = self.finish
+        first = self.first
+        progress = self.progress
+        for plid, lap, node in cars:
+            slot = self.slots.get(plid)
+            if slot is None:
+                slot = self.slot(plid)
+            point = lap * nodes + (node - finish) % nodes
+            if self.base is None:
+                self.base = point
+            point -= self.base
+            last = progress[slot]
+            if last > -1 << 62:
+                # The lap can change a few nodes either side of the line.
+                if point - last > nodes // 2:
+                    point -= nodes
+                elif last - point > nodes // 2:
+                    point += nodes
+            if point <= last:
+                continue
+            if point > self.frontier and point >= 0:
+                self._advance(last, self.passed[slot], point, now)
+            progress[slot] = point
+            self.passed[slot] = now
+            self.lap[slot] = lap
+            self.node[slot] = node
+            self.gap[slot] = now - first[point] if point >= 0 else _NAN
+            self.snapshot = None
+
+    def _advance(self, last, then, point, now):
+        # Time the points from the frontier up to the leader, spread between
+        # the leader's last update and this one.
+        first = self.first
+        if len(first) <= point:
+            first.extend(array.array('d', [_NAN]) * (point + 1 - len(first) + self.nodes))
+        start = self.frontier + 1
+        if last < start:
+            # Taking the lead, carry on from where the last leader got to.
+            last = start - 1
+            then = first[last] if last >= 0 else now
+        span = point - last
+        for i in range(max(start, 0), point + 1):
+            first[i] = then + (now - then) * (i - last) / span
+        self.frontier = point
+
+    def checkpoint(self, plid, key, etime):
+        slot = self.slots.get(plid)
+        if slot is None:
+            return None
+        best = self.official.setdefault(key, etime)
+        self.split_gap[slot] = (etime - best) / 1000.0
+        self.snapshot = None
+        return slot
+
+    def lap_done(self, plid, laps_done, ltime, etime):
+        slot = self.checkpoint(plid, (laps_done, 0), etime)
+        if slot is not None:
+            self.laps_done[slot] = laps_done
+            self.last_lap[slot] = ltime
+            if ltime and (not self.best_lap[slot] or ltime < self.best_lap[slot]):
+                self.best_lap[slot] = ltime
+
+    def split(self, plid, split, etime):
+        slot = self.slots.get(plid)
+        if slot is not None:
+            self.checkpoint(plid, (self.laps_done[slot], split), etime)
+
+    def get_snapshot(self):
+        if self.snapshot is None:
+            progress = self.progress
+            passed = self.passed
+            order = sorted(self.slots.values(), key=lambda slot: (-progress[slot], passed[slot]))
+            cars = []
+            ahead = 0.0
+            for position, slot in enumerate(order, 1):
+                gap = self.gap[slot]
+                cars.append(CarTiming(self.plid[slot], position, self.lap[slot], self.node[slot], gap,
+                                      gap - ahead if position > 1 else 0.0, self.split_gap[slot],
+                                      self.laps_done[slot], self.last_lap[slot], self.best_lap[slot]))
+                ahead = gap
+            self.snapshot = tuple(cars)
+        return self.snapshot
+
+
+class Timing(object):
+    """Live timing and gaps for the races on one or more hosts.
+
+    Attach it to InSim connections with ISF_NLP or ISF_MCI set. It binds to
+    IS_RST, IS_NLP, IS_MCI, IS_SPX, IS_LAP, IS_PLP and IS_PLL, and requests
+    an IS_RST to learn the path of a race already in progress. Each update
+    only does work for the cars in it that moved on, and snapshot() is
+    cached until something changes.
+
+    """
+    def __init__(self, clock=time.monotonic):
+        """Create a new Timing object.
+
+        Args:
+            clock - Function returning the time in seconds that node updates
+                    are stamped with.
+
+        """
+        self.clock = clock
+        self._races = {}
+        self._handlers = ((insim_.ISP_RST, self._handle_rst), (insim_.ISP_NLP, self._handle_cars),
+                          (insim_.ISP_MCI, self._handle_cars), (insim_.ISP_SPX, self._handle_spx),
+                          (insim_.ISP_LAP, self._handle_lap), (insim_.ISP_PLP, self._handle_leave),
+                          (insim_.ISP_PLL, self._handle_leave), (core.EVT_INIT, self._request))
+
+    def attach(self, insim):
+        """Start timing the race on a connection.
+
+        Args:
+            insim - The InSim connection.
+
+        """
+        if insim in self._races:
+            return
+        self._races[insim] = _Race()
+        for evt, callback in self._handlers:
+            insim.bind(evt, callback)
+        if insim.connected:
+            self._request(insim)
+
+    def detach(self, insim):
+        """Stop timing the race on a connection.
+
+        Args:
+            insim - The InSim connection.
+
+        """
+        if self._races.pop(insim, None) is not None:
+            for evt, callback in self._handlers:
+                insim.unbind(evt, callback)
+
+    def snapshot(self, insim):
+        """Get the timing of every car on a connection, in road order.
+
+        Args:
+            insim - The InSim connection.
+
+        Returns:
+            A tuple of CarTiming objects, shared with other callers until the
+            next change.
+
+        """
+        return self._races[insim].get_snapshot()
+
+    def snapshots(self):
+        """Get the snapshot of every attached connection, by connection."""
+        return dict((insim, race.get_snapshot()) for insim, race in self._races.items())
+
+    def _request(self, insim):
+        insim.send(insim_.ISP_TINY, ReqI=_REQI, SubT=insim_.TINY_RST)
+
+    def _handle_rst(self, insim, rst):
+        self._races[insim] = _Race(rst.NumNodes, rst.Finish)
+
+    def _handle_cars(self, insim, packet):
+        race = self._races[insim]
+        if not race.nodes:
+            return
+        info = packet.Info
+        if hasattr(info, 'dtype'):
+            cars = zip(info['PLID'].tolist(), info['Lap'].tolist(), info['Node'].tolist())
+        else:
+            cars = [(car.PLID, car.Lap, car.Node) for car in info]
+        race.update(cars, self.clock())
+
+    def _handle_spx(self, insim, spx):
+        self._races[insim].split(spx.PLID, spx.Split, spx.ETime)
+
+    def _handle_lap(self, insim, lap):
+        self._races[insim].lap_done(lap.PLID, lap.LapsDone, lap.LTime, lap.ETime)
+
+    def _handle_leave(self, insim, packet):
+        self._races[insim].remove(packet.PLID)
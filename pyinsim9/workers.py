@@ -0,0 +1,238 @@
+# workers.py - multi-process OutSim2 decoding for pyinsim
+#
+# This software may be used and distributed according to the terms of the
+# GNU Lesser General Public License version 3 or any later version.
+#
+
+# Dependencies
+import multiprocessing
+import os
+import queue
+import socket
+import threading
+import traceback
+from multiprocessing import shared_memory
+
+# Libraries
+import pyinsim9.core as core
+from pyinsim9.core import insim_ # pyinsim9.insim is shadowed by core.insim()
+
+__all__ = [
+    'outsim2_pool',
+]
+
+# Constants.
+_BATCH_SIZE = 64
+_LATENCY = 0.05
+
+
+def outsim2_pool(host='127.0.0.1', port=30000, callback=None, mode=1, workers=None,
+                 batch=_BATCH_SIZE, reduce=None, name=b'localhost'):
+    """Initialize a new OutSim2 connection that decodes packets in worker processes.
+
+    Datagrams are received on a background thread and copied into batches in
+    shared memory, which worker processes decode. Callbacks are called on a
+    collector thread, in the order the packets were received.
+
+    Args:
+        host - The host to connect to.
+        port - The port to connect to the host through, or None to only
+               receive packets passed to feed().
+        callback - An optional function to call with each OutSim2 packet, or
+                   with each batch result if reduce is set.
+        mode - The OutSim Opts value set in the LFS cfg.txt.
+        workers - The number of worker processes (defaults to the CPU count).
+        batch - The number of packets in each batch.
+        reduce - An optional module level function that is called in the
+                 worker with each batch as a list of packets. Its return value
+                 is passed to the callbacks instead of the packets, so only
+                 the result is sent back to this process.
+        name - An optional name for the connection.
+
+    Returns:
+        The started OutSim2 pool.
+
+    """
+    pool = _OutSimPool(name, mode, workers, batch, reduce)
+    if callback:
+        pool.bind(core.EVT_OUTSIM2, callback)
+    pool.start(host, port)
+    return pool
+
+
+def _worker(shm_name, mode, size, batch, tasks, results, reduce):
+    shm = shared_memory.SharedMemory(shm_name)
+    try:
+        for seq, slot, count in iter(tasks.get, None):
+            start = slot * batch * size
+            try:
+                packets = [insim_.OutSimPack2(mode).unpack(shm.buf[offset:offset + size])
+                           for offset in range(start, start + count * size, size)]
+                result = reduce(packets) if reduce else packets
+            except Exception:
+                results.put((seq, slot, None, traceback.format_exc()))
+            else:
+                results.put((seq, slot, result, None))
+    finally:
+        shm.close()
+
+
+class _OutSimPool(core._Binding):
+    """Class to decode OutSim2 packets in a pool of worker processes."""
+    def __init__(self, name=b'localhost', mode=1, workers=None, batch=_BATCH_SIZE, reduce=None, slots=None):
+        """Create a new OutSim2 pool object.
+
+        Args:
+            name - An optional name for the connection.
+            mode - The OutSim Opts value set in the LFS cfg.txt.
+            workers - The number of worker processes.
+            batch - The number of packets in each batch.
+            reduce - An optional function to call in the worker with each batch.
+            slots - The number of batches in shared memory (defaults to four
+                    per worker). Receiving waits when they are all in use.
+
+        """
+        core._Binding.__init__(self)
+        self.name = name
+        self.hostaddr = ()
+        self.mode = mode
+        self.size = insim_.OutSimPack2(mode).pack_s.size
+        self.batch = batch
+        self.workers = workers or os.cpu_count() or 1
+        self.received = 0
+        self.dropped = 0
+        self._reduce = reduce
+        self._closed = False
+        self._seq = 0
+        self._slot = None
+        self._count = 0
+        self._sock = None
+        self._receiver = None
+        self._collector = None
+        self._procs = []
+        slots = slots or self.workers * 4
+        self._shm = shared_memory.SharedMemory(create=True, size=slots * batch * self.size)
+        self._free = queue.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+        self._tasks = multiprocessing.SimpleQueue()
+        self._results = multiprocessing.SimpleQueue()
+
+    def start(self, host='127.0.0.1', port=None):
+        """Start the worker processes and, if a port is given, receiving.
+
+        Args:
+            host - The host to connect to.
+            port - The port to connect to the host through.
+
+        """
+        for _ in range(self.workers):
+            proc = multiprocessing.Process(target=_worker, daemon=True,
+                                           args=(self._shm.name, self.mode, self.size, self.batch,
+                                                 self._tasks, self._results, self._reduce))
+            proc.start()
+            self._procs.append(proc)
+        self._collector = threading.Thread(target=self._collect, name='pyinsim-collect', daemon=True)
+        self._collector.start()
+        if port is not None:
+            self.hostaddr = (host, port)
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sock.bind(self.hostaddr)
+            self._sock.settimeout(_LATENCY)
+            self._receiver = threading.Thread(target=self._receive, name='pyinsim-receive', daemon=True)
+            self._receiver.start()
+
+    def feed(self, data):
+        """Add an OutSim2 datagram to the current batch. Packets that are not
+        the size set by the mode are counted in dropped and ignored.
+
+        Args:
+            data - The datagram.
+
+        """
+        if len(data) != self.size:
+            self.dropped += 1
+            return
+        if self._slot is None:
+            self._slot = self._free.get()
+            self._count = 0
+        offset = (self._slot * self.batch + self._count) * self.size
+        self._shm.buf[offset:offset + self.size] = data
+        self._count += 1
+        self.received += 1
+        if self._count == self.batch:
+            self.flush()
+
+    def flush(self):
+        """Send the current batch to the workers, even if it is not full."""
+        if self._slot is not None:
+            self._tasks.put((self._seq, self._slot, self._count))
+            self._seq += 1
+            self._slot = None
+
+    def close(self):
+        """Stop receiving, wait for the received packets to be dispatched and
+        stop the worker processes. When called from a callback it returns at
+        once and the pool closes on another thread."""
+        if self._closed:
+            return
+        self._closed = True
+        if threading.current_thread() is self._collector:
+            # The workers and the receiver wait on the collector to take
+            # their results and free slots, so it can't wait on them.
+            threading.Thread(target=self._shutdown, name='pyinsim-close', daemon=False).start()
+        else:
+            self._shutdown()
+
+    def _shutdown(self):
+        if self._receiver is not None:
+            self._receiver.join()
+            self._sock.close()
+        self.flush()
+        for _ in self._procs:
+            self._tasks.put(None)
+        for proc in self._procs:
+            proc.join()
+        self._results.put(None)
+        if self._collector is not None:
+            self._collector.join()
+        self._shm.close()
+        self._shm.unlink()
+        self.dispatch(core.EVT_CLOSE)
+
+    def _receive(self):
+        buff = bytearray(core._UDP_BUFFER_SIZE)
+        view = memoryview(buff)
+        while not self._closed:
+            try:
+                nbytes = self._sock.recv_into(buff)
+            except socket.timeout:
+                # Don't hold back a partial batch while the stream is idle.
+                self.flush()
+                continue
+            self.feed(view[:nbytes])
+
+    def _collect(self):
+        # Batches finish out of order, so hold results until their turn.
+        pending = {}
+        next_seq = 0
+        for seq, slot, result, error in iter(self._results.get, None):
+            self._free.put(slot)
+            pending[seq] = (result, error)
+            while next_seq in pending:
+                result, error = pending.pop(next_seq)
+                next_seq += 1
+                try:
+                    if error is not None:
+                        raise core.InSimError('OutSim2 worker failed\n' + error)
+                    if self._reduce:
+                        self.dispatch(core.EVT_OUTSIM2, result)
+                    else:
+                        for packet in result:
+                            self.dispatch(core.EVT_OUTSIM2, packet)
+                except Exception:
+                    self._handle_error()
+
+    def _handle_error(self):
+        self.dispatch(core.EVT_ERROR)
+        traceback.print_exc()